@@ -1,3 +1,4 @@
+from collections import defaultdict
 from datetime import datetime
 
 
@@ -375,3 +376,243 @@ class Imaging:
         time_to_check = datetime.strptime(time_to_check, '%Y-%m-%d %H:%M:%S')
         order_time = datetime.strptime(self._date_time, '%Y-%m-%d %H:%M:%S')
         return time_to_check >= order_time
+
+
+class ADTCache:
+    """Holds the arrival, departure, admission and disposition columns of
+    every visit read from the demographics table in one query, so every ADT
+    consumer of a visit is served without querying the table again.
+
+    Args:
+        adt_rows (list): STUDYID, CSN, arrival time, departure time,
+            admission time and disposition of each visit in table order from
+            the form's adt_rows
+    """
+
+    def __init__(self, adt_rows):
+        self._visits = dict()
+        self._first_visits = dict()
+        for subject_id, csn, arrival_time, departure_time, admission_time, dispo in adt_rows:
+            # The linking logs hold CSNs as text
+            visit = (subject_id, None if csn is None else str(csn))
+            self._first_visits.setdefault(subject_id, visit)
+            self._visits.setdefault(visit, (arrival_time, departure_time, admission_time, dispo))
+
+    def subset(self, subject_ids):
+        """Gets a cache of only some subjects' visits, small enough to send to
+        a worker process with the subjects it pulls
+
+        Args:
+            subject_ids (iterable): ids of the subjects to keep
+
+        Returns:
+            :obj: `ADTCache`: ADT times of the subjects' visits
+        """
+        subject_ids = set(subject_ids)
+        adt_cache = ADTCache([])
+        adt_cache._visits = {visit: columns for visit, columns in self._visits.items() if visit[0] in subject_ids}
+        adt_cache._first_visits = {subject_id: visit for subject_id, visit in self._first_visits.items()
+                                   if subject_id in subject_ids}
+        return adt_cache
+
+    def _visit_columns(self, subject_id, csn):
+        if csn is None:
+            return self._visits[self._first_visits[subject_id]]
+        return self._visits[(subject_id, str(csn))]
+
+    def arrival(self, subject_id, csn=None):
+        """Gets the arrival of a visit
+
+        Args:
+            subject_id (str): id of the subject
+            csn (str): id of the visit, defaults to the subject's first visit
+
+        Returns:
+            :obj: `ADT`: arrival date, time and final disposition
+        """
+        arrival_time, departure_time, admission_time, dispo = self._visit_columns(subject_id, csn)
+        date, time = arrival_time.split(" ")
+        return ADT(date, time, 'arrival', dispo)
+
+    def discharge(self, subject_id, csn=None):
+        """Gets the discharge of a visit. When the visit has no departure
+        time the hospital admission time of the subject's first visit is
+        used, or None when that is missing too
+
+        Args:
+            subject_id (str): id of the subject
+            csn (str): id of the visit, defaults to the subject's first visit
+
+        Returns:
+            :obj: `ADT`: discharge date, time and final disposition
+        """
+        arrival_time, departure_time, admission_time, dispo = self._visit_columns(subject_id, csn)
+        if departure_time:
+            date, time = departure_time.split(" ")
+            return ADT(date, time, 'discharge', dispo)
+        arrival_time, departure_time, admission_time, dispo = self._visit_columns(subject_id, None)
+        if admission_time:
+            date, time = admission_time.split(" ")
+            return ADT(date, time, 'discharge', dispo)
+
+    def discharge_time(self, subject_id, csn=None):
+        """Gets the discharge date and time of a visit like discharge
+
+        Args:
+            subject_id (str): id of the subject
+            csn (str): id of the visit, defaults to the subject's first visit
+
+        Returns:
+            str: discharge date and time, or None when it was not recorded
+        """
+        discharge_info = self.discharge(subject_id, csn)
+        if discharge_info:
+            return "{} {}".format(discharge_info.date, discharge_info.time)
+
+
+class SubjectBundle:
+    """Holds every row the data pull reads for a visit so each table is
+    queried once instead of once per value searched for. Rows are grouped by
+    the values the data pull searches on and stay in table order. Labs and
+    medications only hold the rows counted up to discharge, within the
+    limits in the form's datapull sql module, while found tells whether any
+    were recorded.
+
+    Args:
+        table_rows (dict): rows of each table for the visit from the form's
+            subject_rows
+        arrival_info (:obj: `ADT`): arrival of the visit from ADTCache
+        discharge_info (:obj: `ADT`): discharge of the visit from ADTCache
+        first_observations (dict): first row of each measure of the visit from
+            the form's first_observations
+    """
+
+    def __init__(self, table_rows, arrival_info, discharge_info, first_observations):
+        self._arrival_info = arrival_info
+        self._discharge_info = discharge_info
+        self._first_observations = first_observations
+        self._vitals = defaultdict(list)
+        for row in table_rows['Flowsheets']:
+            self._vitals[row[1]].append(row[1:])
+        # LAB, Medication and MedAdminName rows start with their group and
+        # whether they are counted, the first row of a group is returned even
+        # when it is not so groups recorded only after discharge are found
+        self._found = set()
+        self._labs = defaultdict(list)
+        self._medications = defaultdict(list)
+        self._medication_admins = defaultdict(list)
+        for table_title, grouped_rows in (('LAB', self._labs), ('Medication', self._medications),
+                                          ('MedAdminName', self._medication_admins)):
+            for row in table_rows[table_title]:
+                self._found.add((table_title, row[1]))
+                if row[2]:
+                    grouped_rows[row[1]].append(row[3:])
+        self._procedures = [row[1:] for row in table_rows['Procedures']]
+        self._diagnoses = [row[1:] for row in table_rows['Diagnosis']]
+
+    @property
+    def arrival_info(self):
+        """:obj: `ADT`: arrival date, time and final disposition"""
+        return self._arrival_info
+
+    @property
+    def discharge_info(self):
+        """:obj: `ADT`: discharge date, time and final disposition"""
+        return self._discharge_info
+
+    def vitals(self, flowsheet_name):
+        """Gets the values of a vital sign
+
+        Args:
+            flowsheet_name (str): vital type you are searching for: BP, Temp, etc
+
+        Returns:
+            :obj: `list` of :obj: `tuple`: name, date and time, and value of
+                each vital sign found
+        """
+        return self._vitals.get(flowsheet_name, [])
+
+    def first_observation(self, measure):
+        """Gets the earliest row of a vital in FIRST_VITALS or a LAB category
+        in FIRST_LABS of the form's datapull sql module
+
+        Args:
+            measure (str): the vital or lab you are searching for: Temp, bun
+
+        Returns:
+            tuple: the earliest row of the measure, or None when it was not
+                recorded
+        """
+        return self._first_observations.get(measure)
+
+    def found(self, table_title, row_group):
+        """Checks whether any rows of a LAB category or medication class were
+        recorded, including ones after discharge
+
+        Args:
+            table_title (str): LAB, Medication or MedAdminName
+            row_group (str): the LAB category in LAB_LIMITS or the class of the
+                medication - ANTIVIRALS, etc
+
+        Returns:
+            bool: True if any rows were recorded
+        """
+        return (table_title, row_group) in self._found
+
+    def labs(self, category):
+        """Gets the results of a LAB category collected up to discharge in
+        table order
+
+        Args:
+            category (str): the category in LAB_LIMITS you are searching for
+
+        Returns:
+            :obj: `list` of :obj: `tuple`: result, collect time, result time,
+                lab name and component name of each lab found
+        """
+        return self._labs.get(category, [])
+
+    def medication(self, theraclass):
+        """Gets discharge medications of a class ordered up to discharge
+
+        Args:
+            theraclass (str): the class of the medication - ANTIVIRALS, etc
+
+        Returns:
+            :obj: `list` of :obj: `tuple`: name, time ordered, route, class
+                and ordering mode of each medication found
+        """
+        return self._medications.get(theraclass, [])
+
+    def medication2(self, theraclass):
+        """Gets medications of a class given up to discharge by a route in
+        ED_MEDICATION_ROUTES
+
+        Args:
+            theraclass (str): the class of the medication - ANTIVIRALS, etc
+
+        Returns:
+            :obj: `list` of :obj: `tuple`: name, time given and route of each
+                medication found
+        """
+        return [row[:3] for row in self._medication_admins.get(theraclass, [])]
+
+    def chest_imaging(self):
+        """Gets completed CT and XR imaging
+
+        Returns:
+            :obj: `list` of :obj: `tuple`: name, time ordered and status of
+                each imaging found
+        """
+        return [procedure for procedure in self._procedures
+                if procedure[2] == 'Completed'
+                and ('CT' in str(procedure[0]).upper() or 'XR' in str(procedure[0]).upper())
+                ]
+
+    def final_diagnoses(self):
+        """Gets the final diagnoses
+
+        Returns:
+            :obj: `list` of :obj: `tuple`: name of each diagnosis found
+        """
+        return self._diagnoses
@@ -0,0 +1,792 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import closing
+
+from Common import tablebuilder
+from Common.datapullclasses import ADTCache, SubjectBundle
+
+# Number of processes pulling visits at the same time, 1 pulls them in this
+# process one after another
+EXTRACT_WORKERS = 1
+# Number of visits sent to a worker process at a time
+EXTRACT_CHUNK_SIZE = 25
+# Number of threads pulling visits at the same time, and the most visits each
+# thread may have waiting in the work queue
+EXTRACT_THREADS = 1
+QUEUE_VISITS_PER_THREAD = 4
+# Number of visits written to the REDCap files before they are flushed to disk
+# and the visits are recorded in the checkpoint journal
+REDCAP_FLUSH_ROWS = 100
+# Columns of the checkpoint journal after the visit key: where the visit's rows
+# end in the REDCap files
+CHECKPOINT_OFFSET_FIELDS = ['labeled_offset', 'raw_offset']
+
+
+class OrderedDefaultDict(OrderedDict):
+    def __init__(self, *a, **kw):
+        default_factory = kw.pop('default_factory', self.__class__)
+        OrderedDict.__init__(self, *a, **kw)
+        self.default_factory = default_factory
+
+    def __missing__(self, key):
+        self[key] = value = self.default_factory()
+        return value
+
+
+class PullForm:
+    """What the data pull needs to know about a form to pull its visits and
+    write its coordinator and REDCap files
+
+    Args:
+        profile (:obj: `tablebuilder.FormProfile`): the form's tables
+        datapull_sql (:obj: `module`): the form's datapull sql module
+        datapull_functions (:obj: `module`): the form's datapull functions
+            module, whose get_*_info functions fill in the REDCap fields
+        edvisit (function): the form's edvisit, called with the values of
+            visit_fields, the connection, the visit's rows from each table or
+            None to read them with subject_rows, the ADTCache of the visits to
+            pull and the first vitals and labs of the visits to pull
+        visit_fields (list): columns of the linking log that identify a visit,
+            in the order edvisit takes them
+        record_fields (dict): labeled and raw value of each REDCap field the
+            form sets on every visit before the get_*_info fields
+        headers_file (str): name of the REDCap headers file in Patient_Data
+        labeled_file (str): name of the labeled REDCap file in Patient_Data
+        subject_file_name (str): format of the name of a visit's coordinator
+            file, filled in with the values of visit_fields and the subject id
+            in lower case first
+        description (str): description of the form's data pull command
+        repeat_instrument (str): REDCap repeating instrument of the form's
+            visits, None if each subject has one record
+        repeat_instance_field (str): column of visit_fields that numbers the
+            repeat instances of a subject's visits
+    """
+
+    def __init__(self, profile, datapull_sql, datapull_functions, edvisit, visit_fields, record_fields, headers_file,
+                 labeled_file, subject_file_name, description, repeat_instrument=None, repeat_instance_field=None):
+        self.profile = profile
+        self.datapull_sql = datapull_sql
+        self.datapull_functions = datapull_functions
+        self.edvisit = edvisit
+        self.visit_fields = visit_fields
+        self.record_fields = record_fields
+        self.repeat_instrument = repeat_instrument
+        self.repeat_instance_field = repeat_instance_field
+        self.headers_file = headers_file
+        self.labeled_file = labeled_file
+        self.subject_file_name = subject_file_name
+        self.description = description
+
+    def observation_key(self, visit):
+        """Gets the key of a visit in the dict from the datapull sql module's
+        first_observations
+
+        Args:
+            visit (tuple): values of visit_fields from the linking log
+
+        Returns:
+            str or tuple: the subject id when the profile's visit_key is the
+                subject id alone, otherwise the visit_key values as text
+        """
+        key = tuple(str(value) for value in visit[:len(self.profile.visit_key)])
+        return key[0] if len(key) == 1 else key
+
+
+def pull_visit(form, visit, conn, table_rows=None, adt_cache=None, first_observations=None):
+    """Gets available ED visit data of a form's visit from CEIRS Tables
+
+    Args:
+        form (:obj: `PullForm`): the form the visit is pulled for
+        visit (tuple): values of the form's visit_fields from the linking log
+        conn (:obj: `database connection`): connection to the database that
+            contains the data
+        table_rows (dict): the visit's rows from each table when they have
+            already been read, otherwise they are read with subject_rows
+        adt_cache (:obj: `ADTCache`): ADT times of the visits to pull,
+            otherwise they are read for the subject with adt_rows
+        first_observations (dict): first vitals and labs of the visits to pull,
+            otherwise they are read for the visit with first_observations
+
+    Returns:
+        :obj: `OrderedDefaultDict`
+        returns three ordered default dictionaires with data for writing to
+        file, one with coordinator readable data, and labeled and raw REDCap
+        data
+    """
+    datapull_sql = form.datapull_sql
+    functions = form.datapull_functions
+    coordinator = OrderedDefaultDict()
+    redcap_label = OrderedDefaultDict()
+    redcap_raw = OrderedDefaultDict()
+    subject_id = visit[0]
+    visit_key = visit[:len(form.profile.visit_key)]
+    subject_id_for_file = subject_id.lower()
+    coordinator['Study ID'] = subject_id_for_file
+    redcap_label['ec_id'] = subject_id_for_file
+    redcap_raw['ec_id'] = subject_id_for_file
+    # Gather Repeating Instrument Variables
+    if form.repeat_instrument is not None:
+        repeat_instance = visit[form.visit_fields.index(form.repeat_instance_field)]
+        for redcap_data in (redcap_label, redcap_raw):
+            redcap_data['redcap_repeat_instrument'] = form.repeat_instrument
+            redcap_data['redcap_repeat_instance'] = repeat_instance
+    for field, (label_value, raw_value) in form.record_fields.items():
+        redcap_label[field] = label_value
+        redcap_raw[field] = raw_value
+
+    # Get all of the visit's rows from each table
+    if adt_cache is None:
+        adt_cache = ADTCache(datapull_sql.adt_rows(conn, subject_id))
+    if first_observations is None:
+        first_observations = datapull_sql.first_observations(conn, *visit_key)
+    # Get Discharge time for time checking
+    dc_info = adt_cache.discharge(*visit_key)
+    # Get Dispo Status for checking
+    dispo = dc_info.dispo
+    dc_time = "{} {}".format(dc_info.date, dc_info.time)
+    if table_rows is None:
+        table_rows = datapull_sql.subject_rows(*visit_key, conn, dc_time)
+    bundle = SubjectBundle(table_rows, adt_cache.arrival(*visit_key), dc_info,
+                           first_observations.get(form.observation_key(visit), {}))
+    data = coordinator, redcap_label, redcap_raw
+    data = functions.get_arrival_info(*data, bundle)
+    data = functions.get_discharge_info(*data, bundle)
+    data = functions.get_dispo_info(*data, bundle)
+    data = functions.get_vitals_info(*data, bundle)
+    data = functions.get_oxygen_info(*data, bundle)
+    data = functions.get_lab_info(*data, bundle)
+    data = functions.get_flutesting_info(*data, bundle, dc_time)
+    data = functions.get_othervir_info(*data, bundle, dc_time)
+    data = functions.get_antiviral_info(*data, bundle, dc_time)
+    data = functions.get_dc_antiviral_info(*data, bundle, dc_time, dispo)
+    data = functions.get_antibiotic_info(*data, bundle, dc_time)
+    data = functions.get_dc_abx_info(*data, bundle, dc_time, dispo)
+    data = functions.get_imaging_info(*data, bundle)
+    data = functions.get_diagnosis_info(*data, bundle)
+    return data
+
+
+def cohort_rows(conn, form, discharge_time):
+    """Gets the rows of every visit in the form's linking log whose data pull
+    is not complete, with one query per table for the whole cohort. Python
+    reads the queries together and splits them into visits, holding one
+    visit's rows at a time, but SQLite sorts and numbers the matching rows of
+    the whole cohort for the window queries before the first row comes back,
+    so the cohort's rows are materialized in its temporary store.
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            contains the patient data
+        form (:obj: `PullForm`): the form to pull
+        discharge_time (function): gets the discharge time of a visit from the
+            values of the profile's visit_key, rows after it are not counted
+
+    Yields:
+        tuple: values of the form's visit_fields from the linking log, and a
+            :obj: `dict` of the visit's rows from each table like subject_rows
+    """
+    cur = conn.cursor()
+    # The cohort queries read each visit's discharge time from a temporary table
+    cur.execute("""CREATE TEMP TABLE IF NOT EXISTS DischargeTimes (LogRowid INTEGER PRIMARY KEY, DischargeTime TEXT)""")
+    cur.execute("""DELETE FROM DischargeTimes""")
+    cur.execute("""SELECT rowid, {} FROM {} WHERE DataPullComplete = 'No'""".format(
+        ", ".join(form.profile.visit_key), form.profile.visit_log_table))
+    cur.executemany("""INSERT INTO DischargeTimes VALUES (?, ?)""",
+                    [(log_rowid, discharge_time(*visit)) for log_rowid, *visit in cur.fetchall()])
+    conn.commit()
+    cur.execute("""SELECT rowid, {} FROM {}
+          WHERE DataPullComplete = 'No'
+          ORDER BY rowid""".format(", ".join(form.visit_fields), form.profile.visit_log_table))
+    table_cursors = dict()
+    for table_title, sql in form.datapull_sql.COHORT_TABLE_SQL.items():
+        table_cursors[table_title] = conn.cursor().execute(sql, form.datapull_sql.BOUND_PARAMETERS)
+    next_rows = {table_title: table_cursor.fetchone() for table_title, table_cursor in table_cursors.items()}
+    for log_row in cur:
+        table_rows = dict()
+        for table_title, table_cursor in table_cursors.items():
+            table_rows[table_title] = list()
+            while next_rows[table_title] is not None and next_rows[table_title][0] == log_row[0]:
+                table_rows[table_title].append(next_rows[table_title][1:])
+                next_rows[table_title] = table_cursor.fetchone()
+        yield tuple(log_row[1:]), table_rows
+
+
+def checkpoint_redcap_files(form, journal, labeled_redcap_file, raw_redcap_file, pulled, conn=None):
+    """Flushes the REDCap files and records the visits written to them since
+    the last checkpoint in the journal, and in the pull status table when a
+    connection is given
+
+    Args:
+        form (:obj: `PullForm`): the form being pulled
+        journal (:obj: `CheckpointJournal`): journal of the run
+        labeled_redcap_file (:obj: `RedcapFile`): labeled REDCap file
+        raw_redcap_file (:obj: `RedcapFile`): raw REDCap file
+        pulled (list): values of the form's visit_fields of each visit
+            written since the last checkpoint as a tuple and the hash of its
+            coordinator file
+        conn (:obj: `database connection`): connection to the database that
+            holds the pull status table, None to leave it alone
+    """
+    journal.checkpoint([key for key, output_hash in pulled], labeled_redcap_file.flush(), raw_redcap_file.flush())
+    if conn is not None:
+        tablebuilder.mark_pulled(conn, form.profile, pulled)
+
+
+def with_cached_results(subjects, pulled_subjects, cached_results):
+    """Puts the cached output of visits back in between the visits that were
+    pulled, keeping the order of subjects
+
+    Args:
+        subjects (list): values of the visit_fields of each visit to write as
+            a tuple, in order
+        pulled_subjects (iterator): visit and edvisit output of each visit
+            not in cached_results, in order
+        cached_results (dict): coordinator file text, labeled and raw REDCap
+            rows of the visits whose source rows have not changed
+
+    Yields:
+        tuple: visit, its coordinator file text, labeled and raw REDCap
+            rows, and True if they came from cached_results
+    """
+    pulled_subjects = iter(pulled_subjects)
+    for subject in subjects:
+        if subject in cached_results:
+            yield subject, cached_results[subject], True
+            continue
+        pulled_subject, (coordinator_readable_data, redcap_label_data, redcap_raw_data) = next(pulled_subjects)
+        coordinator_text = "".join("{}: {}\n".format(key, value) for key, value in coordinator_readable_data.items())
+        yield pulled_subject, (coordinator_text, redcap_label_data, redcap_raw_data), False
+
+
+def output_version(form, redcap_headers):
+    """Hashes what the output of a visit is built from besides its rows: the
+    form's FINGERPRINT_VERSION, queries, row limits and REDCap headers, so
+    output cached before any of them changed is not reused
+
+    Args:
+        form (:obj: `PullForm`): the form being pulled
+        redcap_headers (list): REDCap headers of the form
+
+    Returns:
+        str: hex digest of the sha1 hash of the form's output code
+    """
+    datapull_sql = form.datapull_sql
+    output_code = json.dumps([datapull_sql.FINGERPRINT_VERSION, datapull_sql.SUBJECT_TABLE_SQL,
+                              datapull_sql.COHORT_TABLE_SQL, datapull_sql.FIRST_OBSERVATION_SQL,
+                              datapull_sql.FIRST_VITALS, datapull_sql.FIRST_LABS, datapull_sql.BOUND_PARAMETERS,
+                              redcap_headers], sort_keys=True)
+    return hashlib.sha1(output_code.encode()).hexdigest()
+
+
+def subject_fingerprints(conn, form, version):
+    """Hashes the rows each subject with a visit in the linking log whose data
+    pull is not complete has in the form's FINGERPRINT_TABLES, in table
+    order, together with the output version. The hash of a subject's rows in
+    a table is kept in the result cache's fingerprint table until the
+    table's state from tablebuilder.table_state changes, so only tables that
+    were reloaded or reclassified, and subjects new to the cache, are read.
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            contains the patient data
+        form (:obj: `PullForm`): the form being pulled
+        version (str): hash of the form's output code from output_version
+
+    Returns:
+        :obj: `dict`: hex digest of the sha1 hash of each subject's rows by
+            STUDYID
+    """
+    tablebuilder.create_result_cache(conn, form.profile)
+    cur = conn.cursor()
+    cur.execute("""SELECT DISTINCT STUDYID FROM {} WHERE DataPullComplete = 'No'""".format(
+        form.profile.visit_log_table))
+    subject_ids = [subject_id for (subject_id,) in cur.fetchall()]
+    # The fingerprint queries only read the subjects that are not in the fingerprint table
+    cur.execute("""CREATE TEMP TABLE IF NOT EXISTS FingerprintSubjects (STUDYID TEXT PRIMARY KEY)""")
+    table_fingerprints = list()
+    for table_title in form.datapull_sql.FINGERPRINT_TABLES:
+        state = tablebuilder.table_state(conn, form.profile, table_title)
+        fingerprints = tablebuilder.stored_fingerprints(conn, form.profile, table_title, state)
+        new_fingerprints = {subject_id: hashlib.sha1() for subject_id in subject_ids
+                            if subject_id not in fingerprints}
+        if new_fingerprints:
+            cur.execute("""DELETE FROM FingerprintSubjects""")
+            cur.executemany("""INSERT INTO FingerprintSubjects VALUES (?)""",
+                            [(subject_id,) for subject_id in new_fingerprints])
+            cur.execute("""SELECT STUDYID, * FROM {}
+                  WHERE STUDYID IN (SELECT STUDYID FROM FingerprintSubjects)
+                  ORDER BY rowid""".format(table_title))
+            for row in cur:
+                new_fingerprints[row[0]].update(repr(row[1:]).encode())
+            new_fingerprints = {subject_id: fingerprint.hexdigest()
+                                for subject_id, fingerprint in new_fingerprints.items()}
+            tablebuilder.save_fingerprints(conn, form.profile, table_title, state, new_fingerprints)
+            fingerprints.update(new_fingerprints)
+            print("Fingerprinted the rows of {} subjects in {}".format(len(new_fingerprints), table_title))
+        table_fingerprints.append(fingerprints)
+    return {subject_id: hashlib.sha1("".join([version] + [fingerprints[subject_id]
+                                                          for fingerprints in table_fingerprints]).encode()).hexdigest()
+            for subject_id in subject_ids}
+
+
+def extract_chunk(edvisit, database_path, visits, adt_cache, first_observations):
+    """Runs edvisit for each visit of a chunk in a worker process, through a
+    read only connection that is closed when the chunk is done
+
+    Args:
+        edvisit (function): the form's edvisit
+        database_path (str): path of the database that contains the data
+        visits (list): values of the form's visit_fields of each visit
+        adt_cache (:obj: `ADTCache`): ADT times of the chunk's subjects
+        first_observations (dict): first vitals and labs of the chunk's visits
+
+    Returns:
+        :obj: `list` of :obj: `tuple`: coordinator, labeled and raw data of
+            each visit in the order of visits
+    """
+    with closing(tablebuilder.read_only_connection(database_path)) as conn:
+        return [edvisit(*visit, conn, None, adt_cache, first_observations) for visit in visits]
+
+
+def extract_parallel(form, database_path, visits, adt_cache, first_observations, workers=EXTRACT_WORKERS,
+                     chunk_size=EXTRACT_CHUNK_SIZE):
+    """Pulls visits with a pool of processes. The visits are split into chunks
+    that are sent to the workers with only their own ADT times and first
+    observations, and the results are put back in the order of visits as they
+    come in. A worker that dies stops the pull with BrokenProcessPool instead
+    of leaving its chunk waiting.
+
+    Args:
+        form (:obj: `PullForm`): the form to pull
+        database_path (str): path of the database that contains the data
+        visits (list): values of the form's visit_fields of each visit
+        adt_cache (:obj: `ADTCache`): ADT times of the visits to pull
+        first_observations (dict): first vitals and labs of the visits to pull
+        workers (int): number of worker processes
+        chunk_size (int): number of visits sent to a worker at a time
+
+    Yields:
+        tuple: values of the visit's visit_fields, and the coordinator,
+            labeled and raw data edvisit returns for it
+    """
+    chunks = [visits[start:start + chunk_size] for start in range(0, len(visits), chunk_size)]
+    executor = ProcessPoolExecutor(workers)
+    futures = list()
+    try:
+        for chunk in chunks:
+            chunk_observations = dict()
+            for visit in chunk:
+                key = form.observation_key(visit)
+                if key in first_observations:
+                    chunk_observations[key] = first_observations[key]
+            futures.append(executor.submit(extract_chunk, form.edvisit, database_path, chunk,
+                                           adt_cache.subset(visit[0] for visit in chunk), chunk_observations))
+        for chunk, future in zip(chunks, futures):
+            yield from zip(chunk, future.result())
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown()
+
+
+def extract_in_thread(edvisit, database_path, work_queue, adt_cache, first_observations):
+    """Runs edvisit for the visits an extraction thread takes from the work
+    queue, through a read only connection the thread opens for itself and
+    closes when it is told to stop
+
+    Args:
+        edvisit (function): the form's edvisit
+        database_path (str): path of the database that contains the data
+        work_queue (:obj: `queue.Queue`): values of the visit_fields of each
+            visit with the :obj: `Future` to set its result on, then None
+            to stop
+        adt_cache (:obj: `ADTCache`): ADT times of the visits to pull
+        first_observations (dict): first vitals and labs of the visits to pull
+    """
+    with closing(tablebuilder.read_only_connection(database_path)) as conn:
+        for visit, future in iter(work_queue.get, None):
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(edvisit(*visit, conn, None, adt_cache, first_observations))
+            except Exception as error:
+                future.set_exception(error)
+
+
+def extract_threaded(form, database_path, visits, adt_cache, first_observations, threads=EXTRACT_THREADS):
+    """Pulls visits with a pool of threads, each reading through its own read
+    only connection. SQLite releases the GIL while a query runs, so threads
+    help most when reading the database is slow. At most
+    QUEUE_VISITS_PER_THREAD visits per thread are waiting at a time and
+    results are given back in the order of visits. The threads are stopped
+    and their connections closed when the pull ends or fails.
+
+    Args:
+        form (:obj: `PullForm`): the form to pull
+        database_path (str): path of the database that contains the data
+        visits (list): values of the form's visit_fields of each visit
+        adt_cache (:obj: `ADTCache`): ADT times of the visits to pull
+        first_observations (dict): first vitals and labs of the visits to pull
+        threads (int): number of extraction threads
+
+    Yields:
+        tuple: values of the visit's visit_fields, and the coordinator,
+            labeled and raw data edvisit returns for it
+    """
+    work_queue = queue.Queue()
+    extract_threads = [threading.Thread(target=extract_in_thread, args=(form.edvisit, database_path, work_queue,
+                                                                        adt_cache, first_observations))
+                       for _ in range(threads)]
+    for extract_thread in extract_threads:
+        extract_thread.start()
+    pending = deque()
+    try:
+        for visit in visits:
+            if len(pending) >= threads * QUEUE_VISITS_PER_THREAD:
+                pending_visit, future = pending.popleft()
+                yield pending_visit, future.result()
+            future = Future()
+            work_queue.put((visit, future))
+            pending.append((visit, future))
+        while pending:
+            pending_visit, future = pending.popleft()
+            yield pending_visit, future.result()
+    finally:
+        for pending_visit, future in pending:
+            future.cancel()
+        for extract_thread in extract_threads:
+            work_queue.put(None)
+        for extract_thread in extract_threads:
+            extract_thread.join()
+
+
+class RedcapFile:
+    """REDCap CSV file written one row at a time as each visit is pulled.
+    Rows go to a temporary file next to the final one that replaces it in one
+    rename when the file is finished, so a run that stops early leaves the
+    last complete file in place and the rows written so far in the
+    temporary file.
+
+    Args:
+        file_path (str): path of the finished file
+        fieldnames (list): REDCap headers, in the order of the columns
+        resume_offset (int): position in the temporary file of a run that
+            stopped early to cut it back to and keep writing from, instead
+            of starting a new file
+
+    Attributes:
+        row_count (int): number of rows written since the file was opened
+    """
+
+    def __init__(self, file_path, fieldnames, resume_offset=None):
+        self.file_path = file_path
+        self.temp_path = file_path + '.tmp'
+        self.row_count = 0
+        if resume_offset is None:
+            self._file = open(self.temp_path, 'w')
+        else:
+            # Drop rows written after the last checkpoint
+            self._file = open(self.temp_path, 'r+')
+            self._file.seek(resume_offset)
+            self._file.truncate()
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames, restval='', lineterminator='\n')
+        if resume_offset is None:
+            self._writer.writeheader()
+
+    def writerow(self, row):
+        """Writes a row
+
+        Args:
+            row (dict): REDCap data of one visit
+        """
+        self._writer.writerow(row)
+        self.row_count += 1
+
+    def flush(self):
+        """Flushes the rows written so far to disk
+
+        Returns:
+            int: position in the temporary file after the last row
+        """
+        self._file.flush()
+        return self._file.tell()
+
+    def finish(self):
+        """Closes the temporary file and renames it over the finished file"""
+        self._file.close()
+        os.replace(self.temp_path, self.file_path)
+
+
+def read_checkpoint_journal(file_path, key_fields):
+    """Reads the visits a stopped run recorded in its checkpoint journal
+
+    Args:
+        file_path (str): path of the journal
+        key_fields (list): columns of the linking log that identify a visit
+
+    Returns:
+        :obj: `set`: key of each recorded visit as a tuple of str
+        tuple: positions in the labeled and raw REDCap files after the last
+            recorded visit, None when the journal is missing or records none
+    """
+    fields = list(key_fields) + CHECKPOINT_OFFSET_FIELDS
+    completed = set()
+    offsets = None
+    if os.path.exists(file_path):
+        with open(file_path, 'r', newline='') as journal_file:
+            for row in csv.reader(journal_file):
+                # A row cut short by the stop is left out
+                if len(row) == len(fields) and row != fields:
+                    completed.add(tuple(row[:-2]))
+                    offsets = (int(row[-2]), int(row[-1]))
+    return completed, offsets
+
+
+class CheckpointJournal:
+    """CSV file that records each visit whose rows are in the temporary
+    REDCap files, with the position in each file after its rows, so a run
+    that stops early can be resumed without pulling those visits again.
+    Visits are recorded when the REDCap files are flushed, and the journal
+    is deleted when the files are finished.
+
+    Args:
+        file_path (str): path of the journal
+        key_fields (list): columns of the linking log that identify a visit
+        resume (bool): read the visits a stopped run recorded and keep
+            adding to its journal, instead of starting a new one
+    """
+
+    def __init__(self, file_path, key_fields, resume=False):
+        self.file_path = file_path
+        if resume:
+            self._completed, self._offsets = read_checkpoint_journal(file_path, key_fields)
+        else:
+            self._completed, self._offsets = set(), None
+        if self._offsets is None:
+            self._file = open(file_path, 'w', newline='')
+            csv.writer(self._file).writerow(list(key_fields) + CHECKPOINT_OFFSET_FIELDS)
+        else:
+            self._file = open(file_path, 'a', newline='')
+        self._writer = csv.writer(self._file)
+
+    @property
+    def offsets(self):
+        """tuple: positions in the labeled and raw REDCap files after the last
+        recorded visit, None when there is nothing to resume"""
+        return self._offsets
+
+    def done(self, key):
+        """Checks if a visit was recorded by the run being resumed
+
+        Args:
+            key (tuple): values of the key_fields of the visit
+
+        Returns:
+            bool: True if the visit's rows are already in the REDCap files
+        """
+        return tuple(str(value) for value in key) in self._completed
+
+    def checkpoint(self, keys, labeled_offset, raw_offset):
+        """Records visits whose rows were just flushed to the REDCap files
+
+        Args:
+            keys (list): values of the key_fields of each visit written since
+                the last checkpoint
+            labeled_offset (int): position in the labeled file after the rows
+            raw_offset (int): position in the raw file after the rows
+        """
+        for key in keys:
+            self._writer.writerow(list(key) + [labeled_offset, raw_offset])
+        self._file.flush()
+
+    def finish(self):
+        """Closes and deletes the journal once the REDCap files are finished"""
+        self._file.close()
+        os.remove(self.file_path)
+
+
+def main(form):
+    """Runs a form's data pull from its Data Normlization folder: creates the
+    tables, pulls every visit in the linking log whose data pull is not
+    complete and writes the coordinator and REDCap files to Patient_Data
+
+    Args:
+        form (:obj: `PullForm`): the form to pull
+    """
+    parser = argparse.ArgumentParser(description=form.description)
+    parser.add_argument('--cohort', action='store_true',
+                        help="read the rows of every visit to pull with one query per table")
+    parser.add_argument('--in-memory', action='store_true',
+                        help="copy the database into memory at startup and run the data pull against the copy")
+    parser.add_argument('--write-back', action='store_true',
+                        help="with --in-memory, copy the database back to disk at the end if any tables were "
+                             "reloaded")
+    parser.add_argument('--replica', metavar='PATH',
+                        help="keep a copy of the database at this local path, refreshed only when the shared "
+                             "database changes, and run the data pull against it")
+    parser.add_argument('--publish', action='store_true',
+                        help="with --replica, copy the replica back over the shared database at the end")
+    parser.add_argument('--ingest-workers', type=int, default=tablebuilder.INGEST_WORKERS,
+                        help="number of processes parsing the text files at the same time when tables are reloaded")
+    parser.add_argument('--workers', type=int, default=EXTRACT_WORKERS,
+                        help="number of processes pulling visits at the same time")
+    parser.add_argument('--chunk-size', type=int, default=EXTRACT_CHUNK_SIZE,
+                        help="number of visits sent to a worker process at a time")
+    parser.add_argument('--threads', type=int, default=EXTRACT_THREADS,
+                        help="number of threads pulling visits at the same time")
+    parser.add_argument('--resume', action='store_true',
+                        help="skip the visits a run that stopped early already wrote and add to its REDCap files")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only pull the visits that are not complete in the pull status table and mark each "
+                             "one complete once its REDCap rows are written")
+    parser.add_argument('--cache', action='store_true',
+                        help="reuse the output of visits whose source rows have not changed since they were last "
+                             "pulled, and cache the output of the rest")
+    args = parser.parse_args()
+    if (args.workers > 1 or args.threads > 1) and (args.cohort or args.in_memory):
+        parser.error("--cohort and --in-memory pull through this process's connection, they cannot be used "
+                     "with --workers or --threads")
+    if args.workers > 1 and args.threads > 1:
+        parser.error("--workers and --threads cannot be used together")
+    if (args.incremental or args.cache) and args.in_memory and not args.write_back:
+        parser.error("--incremental and --cache with --in-memory need --write-back to keep the pull status and "
+                     "cached output")
+    tablebuilder.check_requirements()
+    # Get File Path for Database and Patient data
+    # Get Base File Path
+    os.chdir("..")
+    base_path = os.getcwd()
+    sep = os.sep
+    patient_data_path = base_path + sep + "Patient_Data"
+    database_path = r"{}{}CEIRS.db".format(base_path, sep)
+    checkpoint_path = patient_data_path + sep + "redcap_checkpoint.csv"
+    # Refuse before touching the database, the visits a stopped incremental run
+    # checkpointed are already marked complete in it
+    if args.incremental and not args.resume and read_checkpoint_journal(checkpoint_path,
+                                                                        form.visit_fields)[1] is not None:
+        parser.error("{} records visits a stopped run already marked complete, continue it with "
+                     "--resume".format(checkpoint_path))
+    if args.replica:
+        # Work against the local replica, copying the shared database only if it changed
+        tablebuilder.refresh_replica(database_path, args.replica)
+        conn = sqlite3.connect(args.replica)
+    else:
+        conn = sqlite3.connect(database_path)
+    # Path of the database the workers read
+    extract_path = args.replica or database_path
+    if args.in_memory:
+        disk_conn, conn = conn, tablebuilder.memory_snapshot(conn)
+    # Create Tables that will hold data
+    reloaded_tables = tablebuilder.create_tables(conn, form.profile, workers=args.ingest_workers,
+                                                 incremental=args.incremental)
+    # Read the ADT times of every visit to pull at once
+    adt_cache = ADTCache(form.datapull_sql.adt_rows(conn))
+    # Read the first vitals and labs of every visit to pull at once
+    first_observations = form.datapull_sql.first_observations(conn)
+    # Get subject IDs
+    cur = conn.cursor()
+    cur.execute("""SELECT {}, DataPullComplete FROM {}""".format(", ".join(form.visit_fields),
+                                                                  form.profile.visit_log_table))
+    subjects = cur.fetchall()
+    # Get REDCap Headers
+    with open(r"{}{}{}".format(patient_data_path, sep, form.headers_file), 'r') as header_file:
+        redcap_headers = csv.DictReader(header_file).fieldnames
+    # Write each visit's REDCap rows as soon as it is pulled
+    journal = CheckpointJournal(checkpoint_path, form.visit_fields, args.resume)
+    labeled_offset, raw_offset = journal.offsets or (None, None)
+    if journal.offsets:
+        print("Resuming the REDCap files from the last checkpoint")
+    labeled_redcap_file = RedcapFile(patient_data_path + sep + form.labeled_file, redcap_headers, labeled_offset)
+    raw_redcap_file = RedcapFile(patient_data_path + sep + "redcap_raw_data.csv", redcap_headers, raw_offset)
+    pulled = list()
+
+    start_time = time.time()
+    # The workers and threads open the database file themselves, so they have to see the tables created above
+    conn.commit()
+    pending_subjects = [subject[:-1] for subject in subjects if subject[-1] == "No" and not journal.done(subject[:-1])]
+    if args.cache:
+        # Reuse the output of visits whose subject's source rows have not changed
+        fingerprints = subject_fingerprints(conn, form, output_version(form, redcap_headers))
+        cached_results = tablebuilder.cached_results(conn, form.profile, fingerprints)
+        print("Reusing the cached output of {} of {} visits".format(
+            len(set(pending_subjects) & set(cached_results)), len(pending_subjects)))
+    else:
+        cached_results = dict()
+    changed_subjects = [subject for subject in pending_subjects if subject not in cached_results]
+    if args.workers > 1:
+        # Pull the visits in worker processes
+        pulled_subjects = extract_parallel(form, extract_path, changed_subjects, adt_cache, first_observations,
+                                           args.workers, args.chunk_size)
+    elif args.threads > 1:
+        # Pull the visits in threads
+        pulled_subjects = extract_threaded(form, extract_path, changed_subjects, adt_cache, first_observations,
+                                           args.threads)
+    else:
+        if args.cohort:
+            # Read every visit to pull with one query per table
+            changed_subject_set = set(changed_subjects)
+            changed_rows = ((subject, table_rows) for subject, table_rows in cohort_rows(conn, form,
+                                                                                         adt_cache.discharge_time)
+                            if subject in changed_subject_set)
+        else:
+            changed_rows = ((subject, None) for subject in changed_subjects)
+        pulled_subjects = ((subject, form.edvisit(*subject, conn, table_rows, adt_cache, first_observations))
+                           for subject, table_rows in changed_rows)
+    new_results = list()
+    for subject, (coordinator_text, redcap_label_data, redcap_raw_data), cached in with_cached_results(
+            pending_subjects, pulled_subjects, cached_results):
+        subject_id_for_file = form.subject_file_name.format(subject[0].lower(), *subject)
+        with open(patient_data_path + sep + "{}_data.txt".format(subject_id_for_file), 'w') as outfile1:
+            # Write Files for Coordinators to Read
+            print("Writing coordinator Data File for Subject {}".format(subject_id_for_file))
+            outfile1.write(coordinator_text)
+            # Data to import into redcap
+            labeled_redcap_file.writerow(redcap_label_data)
+            raw_redcap_file.writerow(redcap_raw_data)
+        # Flush the REDCap files and record the visits written to them
+        pulled.append((subject, hashlib.sha1(coordinator_text.encode()).hexdigest()))
+        if len(pulled) == REDCAP_FLUSH_ROWS:
+            checkpoint_redcap_files(form, journal, labeled_redcap_file, raw_redcap_file, pulled,
+                                    conn if args.incremental else None)
+            pulled = list()
+        # Cache the output of visits that were pulled
+        if args.cache and not cached:
+            new_results.append((subject, fingerprints[subject[0]], coordinator_text, redcap_label_data,
+                                redcap_raw_data))
+            if len(new_results) == REDCAP_FLUSH_ROWS:
+                tablebuilder.save_results(conn, form.profile, new_results)
+                new_results = list()
+    if pulled:
+        checkpoint_redcap_files(form, journal, labeled_redcap_file, raw_redcap_file, pulled,
+                                conn if args.incremental else None)
+    if new_results:
+        tablebuilder.save_results(conn, form.profile, new_results)
+    elapsed = time.time() - start_time
+    print("Finished writing all coordinator files - {} visits at {:.1f} visits/sec".format(
+        raw_redcap_file.row_count, raw_redcap_file.row_count / elapsed if elapsed else 0))
+    labeled_redcap_file.finish()
+    print("Finished writing labeled REDCap data file")
+    raw_redcap_file.finish()
+    journal.finish()
+    print("Finished writing raw REDCap data file")
+    if args.in_memory:
+        if args.write_back and (reloaded_tables or args.incremental or args.cache):
+            tablebuilder.write_back(conn, disk_conn)
+        disk_conn.close()
+    if args.replica and args.publish:
+        conn.close()
+        tablebuilder.publish_replica(args.replica, database_path)
+    # create comparison file to compare manual data to auto data
+    ##    print("Writing Comparison File")
+    ##    comparedata.compare()
+    ##    print("Finished writing compare file")
+    print("All Done!")
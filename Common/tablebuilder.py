@@ -0,0 +1,1549 @@
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import re
+import sqlite3
+import sys
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from datetime import datetime
+from urllib.request import pathname2url
+
+# Oldest Python and SQLite the data pull runs on. Python 3.7 adds the backup
+# API the in-memory mode copies the database with, SQLite 3.25 adds the window
+# functions the bundle and first observation queries number rows with, and
+# the queries read their row limits with json_each from the JSON1 extension.
+MINIMUM_PYTHON_VERSION = (3, 7)
+MINIMUM_SQLITE_VERSION = (3, 25, 0)
+
+# Number of rows handed to executemany at a time when loading a table
+BATCH_SIZE = 10000
+# Approximate number of bytes of rows to hold in memory before inserting them
+MEMORY_CEILING = 64 * 1024 * 1024
+# Table recording the source file each table was last loaded from
+MANIFEST_TABLE = 'INGEST_MANIFEST'
+# Suffix of the table next to a form's result cache that keeps the hash of each
+# subject's rows in each table, with the state of the table they were read from
+FINGERPRINT_SUFFIX = '_FINGERPRINTS'
+# Suffix of the file kept next to a local replica of the database that records
+# the size, modified time and hash the shared database had when it was copied
+REPLICA_SOURCE_SUFFIX = '.source.json'
+# Increase whenever the way tables are built changes so existing tables get
+# rebuilt even though their source files have not changed
+SCHEMA_VERSION = 4
+# Number of rows read from each text file to decide the type of its columns
+SAMPLE_SIZE = 1000
+# Number of processes parsing text files at the same time, 1 loads the files
+# one after another in this process
+INGEST_WORKERS = 1
+# Number of parsed batches each worker may have waiting for the writer
+QUEUE_BATCHES_PER_WORKER = 2
+# Suffix of the table a reload is built into before it replaces the table
+STAGING_SUFFIX = '_STAGING'
+# Journal mode kept on a database on local disk. WAL lets the data pull keep
+# reading the previous tables while a reload is written, but it needs shared
+# memory and is not supported on a network share, so a database on a network
+# share (a \\server\share path) is kept in SHARED_JOURNAL_MODE.
+LOCAL_JOURNAL_MODE = 'WAL'
+SHARED_JOURNAL_MODE = 'DELETE'
+# Settings used on the connection while loading and put back afterwards
+BULK_LOAD_PRAGMAS = [
+    ('synchronous', 'NORMAL'),
+    ('cache_size', -256 * 1024),
+    ('temp_store', 'MEMORY'),
+]
+# Suffix of the column holding a numeric column with the type inferred for it
+NUMBER_SUFFIX = '_NUMBER'
+INTEGER_PATTERN = re.compile(r'^-?(0|[1-9][0-9]{0,17})$')
+REAL_PATTERN = re.compile(r'^-?(0|[1-9][0-9]{0,8})\.[0-9]{0,5}[1-9]$')
+# Table holding the rules that replace the class and route of medications
+# whose name matches a pattern when MedAdminName is built. Each form has its
+# own, named with the form's table suffix, and MedAdminName is rebuilt when
+# the rules saved in it change.
+MEDICATION_OVERRIDES_TABLE = 'MedicationOverrides'
+# Name pattern, class and route of each rule. When more than one pattern
+# matches a medication name the rule listed last wins
+MEDICATION_OVERRIDES = [
+    ('%ampicillin-sulbactam%', 'ANTIBIOTICS', 'IV'),
+    ('%azithromycin%', 'ANTIBIOTICS', 'IV'),
+    ('%peramivir%', 'ANTIVIRALS', 'IV'),
+]
+# Indexes matching the WHERE clause of each query in datapull_sql and
+# datapull_subsequent_sql. Each index is prefixed with the visit_key columns
+# of the form, so the _ActiveLaterVisits tables get CSN-qualified versions.
+TABLE_INDEXES = [
+    ('DEMOGRAPHICS', [()]),
+    ('Flowsheets', [('FlowsheetDisplayName',)]),
+    ('LAB', [('LabComponentName',), ('PROC_NAME',), ('category',)]),
+    ('Medication', [('THERACLASS', 'OrderingMode')]),
+    ('MedAdminName', [('THERACLASS',)]),
+    ('Procedures', [('OrderStatus',), ('category',)]),
+    ('Diagnosis', [()]),
+]
+
+# Rows of LAB and Procedures are sorted into the categories the data pull reads
+# as they are loaded, so it looks them up by category instead of matching names.
+# The rules are saved in CATEGORY_RULES_TABLE, named with the form's table
+# suffix, so the tables are classified again when the form's rules change.
+CATEGORY_RULES_TABLE = 'CategoryRules'
+CATEGORY_COLUMN = 'category'
+# Column of each table whose value decides the category of a row
+CATEGORY_SOURCES = {
+    'LAB': 'LabComponentName',
+    'Procedures': 'PROC_NAME',
+}
+# Table without the form's table suffix, name pattern and category of each
+# rule. When more than one pattern
+# matches a name the rule listed last wins, rows no pattern matches have no
+# category
+CATEGORY_RULES = [
+    ('LAB', 'INFLUENZA A NAT', 'flu_pcr'),
+    ('LAB', 'INFLUENZA B NAT', 'flu_pcr'),
+    ('LAB', 'INFLUENZA A PCR', 'flu_pcr'),
+    ('LAB', 'INFLUENZA B PCR', 'flu_pcr'),
+    ('LAB', 'PARAINFLUENZAE 3 NAT', 'other_resp_virus'),
+    ('LAB', 'ADENOVIRUS NAT', 'other_resp_virus'),
+    ('LAB', 'RHINOVIRUS NAT', 'other_resp_virus'),
+    ('LAB', 'PARAINFLUENZAE 2 NAT', 'other_resp_virus'),
+    ('LAB', 'METAPNEUMO NAT', 'other_resp_virus'),
+    ('LAB', 'RSV NAT', 'other_resp_virus'),
+    ('LAB', 'ADENOVIRUS PCR', 'other_resp_virus'),
+    ('LAB', 'RHINOVIRUS PCR', 'other_resp_virus'),
+    ('LAB', 'PARAINFLUENZAE 2 PCR', 'other_resp_virus'),
+    ('LAB', 'METAPNEUMOVIRUS PCR', 'other_resp_virus'),
+    ('LAB', 'RSV PCR', 'other_resp_virus'),
+    ('LAB', 'PH SPECIMEN', 'ph'),
+    ('LAB', 'BLOOD UREA NITROGEN', 'bun'),
+    ('LAB', 'UREA NITROGEN', 'bun'),
+    ('LAB', 'SODIUM', 'sodium'),
+    ('LAB', 'GLUCOSE', 'glucose'),
+    ('LAB', 'HEMATOCRIT', 'hematocrit'),
+    ('Procedures', '%CT%', 'chest_imaging'),
+    ('Procedures', '%XR%', 'chest_imaging'),
+]
+
+
+class FormProfile:
+    """Represents the tables and keys of the form the tables are built for,
+    the values that differ between the ED enrollment form and the subsequent
+    ED visit form. Each form's createtables module gives its profile.
+
+    Args:
+        table_suffix (str): suffix of the names of the tables loaded from the
+            form's extract
+        visit_key (list): columns of the extract tables that identify the
+            visit a row belongs to
+        visit_log_table (str): name of the linking log table
+        visit_log_file (str): name of the CSV the linking log is loaded from
+        pull_status_key (list): columns that identify one row of the linking
+            log
+        pull_status_table (str): name of the table that keeps the data pull
+            status of every row of the linking log from run to run, since the
+            log table is rebuilt from its CSV
+        result_cache_table (str): name of the table holding the output of
+            every visit pulled with the fingerprint of the source rows it was
+            built from
+        medication_admin_name_fields (str): comma separated columns of the
+            MedAdminName table, the medication admin fields followed by the
+            name, route and class of the medication
+        database_path (str): path of the database the form's tables are built
+            in
+
+    Attributes:
+        table_suffix (str): suffix of the names of the form's tables
+        visit_key (list): columns that identify the visit a row belongs to
+        visit_log_table (str): name of the linking log table
+        visit_log_file (str): name of the CSV of the linking log
+        pull_status_key (list): columns that identify one row of the linking
+            log
+        pull_status_table (str): name of the pull status table
+        result_cache_table (str): name of the result cache table
+        medication_admin_name_fields (str): columns of the MedAdminName table
+        database_path (str): path of the form's database
+        table_indexes (dict): TABLE_INDEXES of each of the form's tables,
+            each index starting with the visit_key columns
+        category_sources (dict): CATEGORY_SOURCES of each of the form's tables
+        category_rules (list): CATEGORY_RULES for the form's tables
+        category_rules_table (str): name of the form's CATEGORY_RULES_TABLE
+        medication_overrides_table (str): name of the form's
+            MEDICATION_OVERRIDES_TABLE
+    """
+
+    def __init__(self, table_suffix, visit_key, visit_log_table, visit_log_file, pull_status_key, pull_status_table,
+                 result_cache_table, medication_admin_name_fields, database_path):
+        self._table_suffix = table_suffix
+        self._visit_key = list(visit_key)
+        self._visit_log_table = visit_log_table
+        self._visit_log_file = visit_log_file
+        self._pull_status_key = list(pull_status_key)
+        self._pull_status_table = pull_status_table
+        self._result_cache_table = result_cache_table
+        self._medication_admin_name_fields = medication_admin_name_fields
+        self._database_path = database_path
+
+    @property
+    def table_suffix(self):
+        """str: suffix of the names of the tables loaded from the form's extract"""
+        return self._table_suffix
+
+    @property
+    def visit_key(self):
+        """list: columns of the extract tables that identify the visit a row belongs to"""
+        return self._visit_key
+
+    @property
+    def visit_log_table(self):
+        """str: name of the linking log table"""
+        return self._visit_log_table
+
+    @property
+    def visit_log_file(self):
+        """str: name of the CSV the linking log is loaded from"""
+        return self._visit_log_file
+
+    @property
+    def pull_status_key(self):
+        """list: columns that identify one row of the linking log"""
+        return self._pull_status_key
+
+    @property
+    def pull_status_table(self):
+        """str: name of the table that keeps the data pull status of the linking log"""
+        return self._pull_status_table
+
+    @property
+    def result_cache_table(self):
+        """str: name of the table holding the output of every visit pulled"""
+        return self._result_cache_table
+
+    @property
+    def medication_admin_name_fields(self):
+        """str: comma separated columns of the MedAdminName table"""
+        return self._medication_admin_name_fields
+
+    @property
+    def database_path(self):
+        """str: path of the database the form's tables are built in"""
+        return self._database_path
+
+    @property
+    def table_indexes(self):
+        """dict: indexes of each of the form's tables, each starting with the visit_key columns"""
+        return {table_title + self._table_suffix: [tuple(self._visit_key) + index_columns
+                                                   for index_columns in table_indexes]
+                for table_title, table_indexes in TABLE_INDEXES}
+
+    @property
+    def category_sources(self):
+        """dict: column whose value decides the category of a row by each of the form's tables"""
+        return {table_title + self._table_suffix: name_column
+                for table_title, name_column in CATEGORY_SOURCES.items()}
+
+    @property
+    def category_rules(self):
+        """list: table, name pattern and category of each rule for the form's tables"""
+        return [(table_title + self._table_suffix, name_pattern, category)
+                for table_title, name_pattern, category in CATEGORY_RULES]
+
+    @property
+    def category_rules_table(self):
+        """str: name of the table the form's category_rules are saved in"""
+        return CATEGORY_RULES_TABLE + self._table_suffix
+
+    @property
+    def medication_overrides_table(self):
+        """str: name of the table the form's medication override rules are saved in"""
+        return MEDICATION_OVERRIDES_TABLE + self._table_suffix
+
+
+def check_requirements():
+    """Stops the program with a message naming what is missing when Python or
+    SQLite is older than the data pull needs, or SQLite was built without
+    window functions or JSON1
+    """
+    missing = list()
+    if sys.version_info < MINIMUM_PYTHON_VERSION:
+        missing.append("Python {} or later, found {}".format(
+            ".".join(map(str, MINIMUM_PYTHON_VERSION)), sys.version.split()[0]))
+    if sqlite3.sqlite_version_info < MINIMUM_SQLITE_VERSION:
+        missing.append("SQLite {} or later, found {}".format(
+            ".".join(map(str, MINIMUM_SQLITE_VERSION)), sqlite3.sqlite_version))
+    with closing(sqlite3.connect(':memory:')) as probe_conn:
+        # SQLite can be built without window functions whatever its version
+        try:
+            probe_conn.execute("""SELECT ROW_NUMBER() OVER (ORDER BY 1)""")
+        except sqlite3.OperationalError:
+            missing.append("SQLite built with window functions")
+        try:
+            probe_conn.execute("""SELECT json_valid('{}')""")
+        except sqlite3.OperationalError:
+            missing.append("SQLite built with the JSON1 extension")
+    if missing:
+        sys.exit("The data pull needs {}".format("; ".join(missing)))
+
+
+def sanitize_value(item):
+    """Strips the characters the original string built inserts could not store
+
+    Args:
+        item (str): value read from a text file or table
+
+    Returns:
+        str: the value without single quotes or commas
+    """
+    return item.replace("'", "").replace(",", "")
+
+
+def infer_column_types(sample_rows, field_count):
+    """Decides the type of each column from a sample of rows. A column is only
+    given a numeric type when every non blank value in the sample reads back
+    exactly as it was written. The type only decides the extra column
+    load_table adds next to the source column, which always stores the
+    values as text, since rows after the sample may not fit the type. Columns
+    of YYYY-MM-DD HH:MM:SS values stay TEXT: the text already compares and
+    sorts in time order, so the time predicates, MIN() and ORDER BY of the
+    data pull queries read the source column as it is.
+
+    Args:
+        sample_rows (list): rows read from the start of a text file
+        field_count (int): number of columns in the file
+
+    Returns:
+        :obj: `list` of str: INTEGER, REAL, NUMERIC or TEXT for each column
+    """
+    column_types = list()
+    for column in range(field_count):
+        values = [sanitize_value(row[column])
+                  for row in sample_rows
+                  if column < len(row) and row[column] != ''
+                  ]
+        is_integer = [bool(INTEGER_PATTERN.match(value)) for value in values]
+        is_real = [bool(REAL_PATTERN.match(value)) for value in values]
+        if not values:
+            column_types.append('TEXT')
+        elif all(is_integer):
+            column_types.append('INTEGER')
+        elif all(is_real):
+            column_types.append('REAL')
+        elif all(integer or real for integer, real in zip(is_integer, is_real)):
+            column_types.append('NUMERIC')
+        else:
+            column_types.append('TEXT')
+    return column_types
+
+
+def table_column_types(conn, table_title):
+    """Gets the source columns of a table and the types they were loaded with,
+    leaving out the number columns load_table adds
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the table
+        table_title (str): name of the table
+
+    Returns:
+        :obj: `list` of :obj: `tuple`: name and type of each source column,
+            the type of the number column for the columns that have one and
+            TEXT for the rest
+    """
+    cur = conn.cursor()
+    cur.execute("""PRAGMA table_info({})""".format(table_title))
+    column_types = OrderedDict((column[1], column[2] or 'TEXT') for column in cur.fetchall())
+    return [(name, column_types.get(name + NUMBER_SUFFIX, 'TEXT'))
+            for name in column_types
+            if not name.endswith(NUMBER_SUFFIX)
+            ]
+
+
+def table_definition(table_fields, column_types=None):
+    """Builds the column definitions and insert values for a table
+
+    Args:
+        table_fields (str): comma separated column names for the table
+        column_types (list): type of each column from infer_column_types, when
+            left out every column is created without a type
+
+    Returns:
+        str: column definitions to use in a CREATE TABLE statement
+        :obj: `list` of str: value for each column to use in an INSERT
+            statement, numbered parameters for the fields followed by the
+            value of each numeric field, in field order
+    """
+    field_names = [field.strip() for field in table_fields.split(",")]
+    value_params = ["?{}".format(position) for position in range(1, len(field_names) + 1)]
+    if column_types is None:
+        return table_fields, value_params
+    # Source columns are TEXT so every value is kept exactly as it was read
+    column_definitions = ["{} TEXT".format(name) for name in field_names]
+    for name, column_type, value_param in zip(field_names, column_types, list(value_params)):
+        if column_type != 'TEXT':
+            # The column's affinity converts the values that fit its type
+            # and keeps the rest as they are
+            column_definitions.append("{}{} {}".format(name, NUMBER_SUFFIX, column_type))
+            value_params.append("NULLIF({}, '')".format(value_param))
+    return ", ".join(column_definitions), value_params
+
+
+def load_table(conn, profile, table_title, table_fields, table_rows, batch_size=BATCH_SIZE,
+               memory_ceiling=MEMORY_CEILING, column_types=None):
+    """Bulk loads rows into a staging table using bound parameters then swaps
+    it in for the table. Rows are read from table_rows as they are needed so
+    only one batch is ever held in memory.
+
+    Args:
+        conn (:obj: `database connection`): connection to the database to
+            save the table
+        profile (:obj: `FormProfile`): tables of the form the table belongs
+            to
+        table_title (str): name of the table to create
+        table_fields (str): comma separated column names for the table
+        table_rows (iterable): rows to insert, each row a sequence of values
+        batch_size (int): number of rows sent to the database per executemany
+            call
+        memory_ceiling (int): approximate number of bytes a batch may hold
+            before it is sent to the database even if it has fewer than
+            batch_size rows
+        column_types (list): type of each column from infer_column_types,
+            when left out every column is created without a type. Otherwise
+            every column is TEXT, and INTEGER, REAL and NUMERIC columns get an
+            extra column of that type named with NUMBER_SUFFIX at the end of
+            the table
+
+    Returns:
+        int: number of rows inserted into the table
+    """
+    cur = conn.cursor()
+    insert_sql = recreate_table(conn, table_title, table_fields, column_types)
+    start_time = time.time()
+    row_count = 0
+    for batch in row_batches(table_rows, batch_size, memory_ceiling):
+        cur.executemany(insert_sql, batch)
+        row_count += len(batch)
+    swap_table(conn, profile, table_title)
+    print_load_rate(table_title, row_count, start_time)
+    return row_count
+
+
+def recreate_table(conn, table_title, table_fields, column_types=None):
+    """Drops and creates an empty staging table for a table. The table itself
+    is left alone until swap_table is called.
+
+    Args:
+        conn (:obj: `database connection`): connection to the database to
+            save the table
+        table_title (str): name of the table to create
+        table_fields (str): comma separated column names for the table
+        column_types (list): type of each column from infer_column_types
+
+    Returns:
+        str: statement inserting one row of bound parameters into the staging
+            table
+    """
+    cur = conn.cursor()
+    staging_title = table_title + STAGING_SUFFIX
+    column_definitions, value_params = table_definition(table_fields, column_types)
+    drop_table_sql = """DROP TABLE IF EXISTS {}""".format(staging_title)
+    create_table_sql = """CREATE TABLE {} ({})""".format(
+        staging_title, column_definitions)
+    print("Creating table {}".format(table_title))
+    cur.execute(drop_table_sql)
+    cur.execute(create_table_sql)
+
+    # Insert Values Statement
+    return """INSERT INTO {} VALUES ({})""".format(
+        staging_title, ",".join(value_params))
+
+
+def swap_table(conn, profile, table_title):
+    """Replaces a table with its staging table and creates its indexes in one
+    transaction, so a reader sees either the old table or the finished new one.
+    The rows of tables in the profile's category_sources are classified
+    before the swap.
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables
+        profile (:obj: `FormProfile`): tables of the form the table belongs
+            to
+        table_title (str): name of the table to replace
+    """
+    cur = conn.cursor()
+    if table_title in profile.category_sources:
+        classify_table(conn, profile, table_title, table_title + STAGING_SUFFIX)
+    if not conn.in_transaction:
+        cur.execute("""BEGIN""")
+    cur.execute("""DROP TABLE IF EXISTS {}""".format(table_title))
+    cur.execute("""ALTER TABLE {} RENAME TO {}""".format(table_title + STAGING_SUFFIX, table_title))
+    # Commits the transaction
+    create_indexes(conn, profile, [table_title])
+
+
+def apply_pragmas(conn, pragmas):
+    """Sets PRAGMA values on a connection
+
+    Args:
+        conn (:obj: `database connection`): connection to the database
+        pragmas (list): (name, value) of each PRAGMA to set
+
+    Returns:
+        :obj: `list` of tuple: (name, value) of each PRAGMA before it was set
+    """
+    cur = conn.cursor()
+    previous_pragmas = list()
+    for name, value in pragmas:
+        cur.execute("""PRAGMA {}""".format(name))
+        previous_pragmas.append((name, cur.fetchone()[0]))
+        cur.execute("""PRAGMA {} = {}""".format(name, value))
+    return previous_pragmas
+
+
+def in_memory(conn):
+    """Checks whether a connection's main database is in memory, like the
+    copy from memory_snapshot, rather than in a file
+
+    Args:
+        conn (:obj: `database connection`): connection to the database
+
+    Returns:
+        bool: True if the main database has no file
+    """
+    cur = conn.cursor()
+    cur.execute("""PRAGMA database_list""")
+    return any(name == 'main' and not file_path for seq, name, file_path in cur.fetchall())
+
+
+def on_network_share(conn):
+    """Checks whether a connection's main database file is on a network share,
+    going by its \\\\server\\share path
+
+    Args:
+        conn (:obj: `database connection`): connection to the database
+
+    Returns:
+        bool: True if the path of the main database file is a UNC path
+    """
+    cur = conn.cursor()
+    cur.execute("""PRAGMA database_list""")
+    return any(name == 'main' and file_path.replace('/', '\\').startswith('\\\\')
+               for seq, name, file_path in cur.fetchall())
+
+
+def read_only_connection(database_path):
+    """Opens a connection that can only read a database, through a file: URI
+    with mode=ro, for extraction workers that must not write to it
+
+    Args:
+        database_path (str): path of the database
+
+    Returns:
+        :obj: `database connection`: read only connection to the database
+    """
+    return sqlite3.connect('file:{}?mode=ro'.format(pathname2url(database_path)), uri=True)
+
+
+def memory_snapshot(conn):
+    """Copies a database into a new in-memory database with the sqlite3
+    backup API, so the data pull reads its pages from RAM instead of the
+    file, which may be on a network share
+
+    Args:
+        conn (:obj: `database connection`): connection to the database to copy
+
+    Returns:
+        :obj: `database connection`: connection to the in-memory copy
+    """
+    print("Copying database into memory")
+    start_time = time.time()
+    memory_conn = sqlite3.connect(':memory:')
+    conn.backup(memory_conn)
+    print("Copied database into memory in {:.2f} s".format(time.time() - start_time))
+    return memory_conn
+
+
+def write_back(memory_conn, conn):
+    """Copies an in-memory database from memory_snapshot back over the
+    database it was copied from, so tables built in memory are kept
+
+    Args:
+        memory_conn (:obj: `database connection`): connection to the
+            in-memory copy
+        conn (:obj: `database connection`): connection to the database to
+            overwrite
+    """
+    print("Writing database back from memory")
+    start_time = time.time()
+    memory_conn.backup(conn)
+    print("Wrote database back from memory in {:.2f} s".format(time.time() - start_time))
+
+
+def copy_database(source_path, target_path):
+    """Copies one database file over another with the sqlite3 backup API, so
+    the copy is consistent even if the source is being written to. The target
+    keeps its own journal mode, so a local WAL database copied to a network
+    share does not put the share in WAL.
+
+    Args:
+        source_path (str): path of the database to copy
+        target_path (str): path of the database to overwrite
+    """
+    with closing(sqlite3.connect(source_path)) as source_conn, closing(sqlite3.connect(target_path)) as target_conn:
+        journal_mode = target_conn.execute("""PRAGMA journal_mode""").fetchone()[0]
+        source_conn.backup(target_conn)
+        apply_pragmas(target_conn, [('journal_mode', journal_mode)])
+
+
+def record_replica_source(shared_path, replica_path, source_hash=None):
+    """Records the size, modified time and hash of the shared database next to
+    its local replica
+
+    Args:
+        shared_path (str): path of the database on the share
+        replica_path (str): path of the local replica
+        source_hash (str): hash of the shared database if it is already known
+    """
+    if source_hash is None:
+        source_hash = file_hash(shared_path)
+    file_stat = os.stat(shared_path)
+    with open(replica_path + REPLICA_SOURCE_SUFFIX, 'w') as source_file:
+        json.dump({'file_size': file_stat.st_size, 'file_mtime': file_stat.st_mtime, 'file_hash': source_hash},
+                  source_file)
+
+
+def replica_current(shared_path, replica_path):
+    """Checks if a local replica was copied from the shared database as it is
+    now. The size and modified time are compared first and the shared database
+    is only hashed when they differ from the ones recorded, like
+    source_changed. Changes made to the replica itself are kept until the
+    shared database changes.
+
+    Args:
+        shared_path (str): path of the database on the share
+        replica_path (str): path of the local replica
+
+    Returns:
+        bool: True if the replica can be used without copying the shared
+            database again
+    """
+    source_path = replica_path + REPLICA_SOURCE_SUFFIX
+    if not os.path.exists(replica_path) or not os.path.exists(source_path):
+        return False
+    with open(source_path, 'r') as source_file:
+        recorded = json.load(source_file)
+    file_stat = os.stat(shared_path)
+    if file_stat.st_size == recorded['file_size'] and file_stat.st_mtime == recorded['file_mtime']:
+        return True
+    if file_stat.st_size == recorded['file_size'] and file_hash(shared_path) == recorded['file_hash']:
+        record_replica_source(shared_path, replica_path, recorded['file_hash'])
+        return True
+    return False
+
+
+def refresh_replica(shared_path, replica_path):
+    """Makes sure a local replica holds a copy of the shared database, copying
+    it only when the shared database changed since the replica was made. The
+    data pull then reads and writes the replica on local disk.
+
+    Args:
+        shared_path (str): path of the database on the share
+        replica_path (str): path of the local replica
+    """
+    if not os.path.exists(shared_path):
+        print("No database at {} yet, starting from the replica".format(shared_path))
+        return
+    if replica_current(shared_path, replica_path):
+        print("Replica {} is up to date".format(replica_path))
+        return
+    print("Copying {} to {}".format(shared_path, replica_path))
+    start_time = time.time()
+    copy_database(shared_path, replica_path)
+    record_replica_source(shared_path, replica_path)
+    print("Copied database in {:.2f} s".format(time.time() - start_time))
+
+
+def publish_replica(replica_path, shared_path):
+    """Copies a local replica back over the shared database and records the
+    new shared database so the next refresh_replica does not copy it again
+
+    Args:
+        replica_path (str): path of the local replica
+        shared_path (str): path of the database on the share
+    """
+    print("Publishing {} to {}".format(replica_path, shared_path))
+    start_time = time.time()
+    copy_database(replica_path, shared_path)
+    record_replica_source(shared_path, replica_path)
+    print("Published database in {:.2f} s".format(time.time() - start_time))
+
+
+def row_batches(table_rows, batch_size=BATCH_SIZE, memory_ceiling=MEMORY_CEILING):
+    """Sanitizes rows and groups them into batches for executemany
+
+    Args:
+        table_rows (iterable): rows to group, each row a sequence of values
+        batch_size (int): largest number of rows in a batch
+        memory_ceiling (int): approximate number of bytes a batch may hold
+            before it is yielded even if it has fewer than batch_size rows
+
+    Yields:
+        :obj: `list` of list: a batch of sanitized rows
+    """
+    batch = list()
+    batch_bytes = 0
+    for table_row in table_rows:
+        table_row = [sanitize_value(item) for item in table_row]
+        batch.append(table_row)
+        batch_bytes += sys.getsizeof(table_row) + sum(sys.getsizeof(item) for item in table_row)
+        if len(batch) >= batch_size or batch_bytes >= memory_ceiling:
+            yield batch
+            batch = list()
+            batch_bytes = 0
+    if batch:
+        yield batch
+
+
+def print_load_rate(table_title, row_count, start_time):
+    """Prints the number of rows loaded into a table and how fast they loaded
+
+    Args:
+        table_title (str): name of the table that was loaded
+        row_count (int): number of rows inserted into the table
+        start_time (float): time.time() when loading started
+    """
+    elapsed = time.time() - start_time
+    rows_per_second = row_count / elapsed if elapsed > 0 else float(row_count)
+    print("Done Creating table {} - {} rows at {:.0f} rows/sec".format(
+        table_title, row_count, rows_per_second))
+
+
+def read_text_file(text_file):
+    """Reads the header of a tab delimited text file and infers the type of
+    its columns from the first SAMPLE_SIZE rows
+
+    Args:
+        text_file (:obj: `file`): open text file
+
+    Returns:
+        str: comma separated column names
+        :obj: `list` of str: type of each column
+        iterable: every row of the file after the header, read as needed
+    """
+    csvreader = csv.reader(text_file, delimiter='\t')
+    table_fields = ",".join(next(csvreader))
+    sample_rows = list(itertools.islice(csvreader, SAMPLE_SIZE))
+    column_types = infer_column_types(sample_rows, len(table_fields.split(",")))
+    return table_fields, column_types, itertools.chain(sample_rows, csvreader)
+
+
+def init_ingest_worker(batch_queue, stop_event):
+    """Gives a worker process the queue it sends parsed batches through, and
+    the event the writer sets when the workers should stop. A
+    multiprocessing.Queue can only be handed to a worker as it starts.
+
+    Args:
+        batch_queue (:obj: `multiprocessing.Queue`): queue read by the writer
+        stop_event (:obj: `multiprocessing.Event`): set when the load stops
+            early
+    """
+    global ingest_queue, ingest_stop_event
+    ingest_queue = batch_queue
+    ingest_stop_event = stop_event
+
+
+def parse_text_file(task):
+    """Parses and sanitizes a text file in a worker process. Puts a message
+    with the columns of the table on the queue, then one message per batch of
+    rows, then a message saying the file is done. Any error is put on the
+    queue for the writer to raise. Stops between batches once the writer
+    sets the stop event.
+
+    Args:
+        task (tuple): table title, file path, batch size and memory ceiling
+    """
+    table_title, file_path, batch_size, memory_ceiling = task
+    try:
+        with open(file_path, 'r') as text_file:
+            table_fields, column_types, table_rows = read_text_file(text_file)
+            ingest_queue.put(('table', table_title, (table_fields, column_types)))
+            for batch in row_batches(table_rows, batch_size, memory_ceiling):
+                if ingest_stop_event.is_set():
+                    return
+                ingest_queue.put(('rows', table_title, batch))
+        ingest_queue.put(('done', table_title, None))
+    except Exception:
+        ingest_queue.put(('error', table_title, traceback.format_exc()))
+
+
+def load_text_files_parallel(conn, profile, text_files, workers, batch_size=BATCH_SIZE,
+                             memory_ceiling=MEMORY_CEILING):
+    """Loads text files into tables with a pool of processes parsing the
+    files while this process writes the parsed batches to the database. The
+    queue between them is bounded so parsing cannot get more than a few
+    batches ahead of the writer. A worker that dies breaks the pool, and the
+    BrokenProcessPool is raised instead of waiting for its files.
+
+    Args:
+        conn (:obj: `database connection`): connection to the database to
+            save the tables
+        profile (:obj: `FormProfile`): tables of the form the files belong
+            to
+        text_files (list): (table title, file path) of each file to load
+        workers (int): number of processes parsing files
+        batch_size (int): number of rows sent to the database per executemany
+            call
+        memory_ceiling (int): approximate number of bytes each batch may hold
+
+    Returns:
+        :obj: `list` of str: names of the tables that were loaded
+    """
+    cur = conn.cursor()
+    file_paths = dict(text_files)
+    insert_sqls = dict()
+    row_counts = dict()
+    start_times = dict()
+    loaded_tables = list()
+    batch_queue = multiprocessing.Queue(maxsize=workers * QUEUE_BATCHES_PER_WORKER)
+    stop_event = multiprocessing.Event()
+    executor = ProcessPoolExecutor(workers, initializer=init_ingest_worker, initargs=(batch_queue, stop_event))
+    futures = list()
+    try:
+        for table_title, file_path in text_files:
+            futures.append(executor.submit(parse_text_file, (table_title, file_path, batch_size, memory_ceiling)))
+        while len(loaded_tables) < len(text_files):
+            try:
+                message, table_title, payload = batch_queue.get(timeout=1)
+            except queue.Empty:
+                # Raises BrokenProcessPool if a worker died without reporting
+                for future in futures:
+                    if future.done():
+                        future.result()
+                continue
+            if message == 'table':
+                table_fields, column_types = payload
+                insert_sqls[table_title] = recreate_table(conn, table_title, table_fields, column_types)
+                row_counts[table_title] = 0
+                start_times[table_title] = time.time()
+            elif message == 'rows':
+                cur.executemany(insert_sqls[table_title], payload)
+                row_counts[table_title] += len(payload)
+            elif message == 'done':
+                swap_table(conn, profile, table_title)
+                print_load_rate(table_title, row_counts[table_title], start_times[table_title])
+                record_source(conn, table_title, file_paths[table_title])
+                loaded_tables.append(table_title)
+            else:
+                raise RuntimeError("Could not load table {}\n{}".format(table_title, payload))
+    finally:
+        stop_event.set()
+        for future in futures:
+            future.cancel()
+        # Workers waiting on a full queue only see the stop event once the
+        # queue has room
+        while not all(future.done() for future in futures):
+            try:
+                batch_queue.get(timeout=1)
+            except queue.Empty:
+                pass
+        executor.shutdown()
+    return loaded_tables
+
+
+def create_manifest(conn):
+    """Creates the manifest table that records the source file of every table
+    if it does not already exist
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables
+    """
+    cur = conn.cursor()
+    create_table_sql = """CREATE TABLE IF NOT EXISTS {} (
+                       table_name TEXT PRIMARY KEY, file_name TEXT,
+                       file_size INTEGER, file_mtime REAL, file_hash TEXT,
+                       schema_version INTEGER, loaded_at TEXT)""".format(MANIFEST_TABLE)
+    cur.execute(create_table_sql)
+    conn.commit()
+
+
+def file_hash(file_path):
+    """Calculates a hash of a files contents
+
+    Args:
+        file_path (str): path of the file to hash
+
+    Returns:
+        str: hex digest of the sha1 hash of the file
+    """
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as source_file:
+        for chunk in iter(lambda: source_file.read(1024 * 1024), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def table_exists(conn, table_title):
+    """Checks if a table exists in the database
+
+    Args:
+        conn (:obj: `database connection`): connection to the database
+        table_title (str): name of the table
+
+    Returns:
+        bool: True if the table exists
+    """
+    cur = conn.cursor()
+    cur.execute("""SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?""", (table_title,))
+    return cur.fetchone() is not None
+
+
+def source_changed(conn, table_title, file_path):
+    """Checks if a table needs to be reloaded from its source file. The file
+    size and modified time are compared first and the contents are only hashed
+    when they differ from the manifest. A file that was touched but whose
+    contents did not change has its new size and modified time recorded.
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables and manifest
+        table_title (str): name of the table loaded from the file
+        file_path (str): path of the source file
+
+    Returns:
+        bool: True if the table is missing or its source file has changed
+    """
+    cur = conn.cursor()
+    cur.execute("""SELECT file_size, file_mtime, file_hash, schema_version FROM {}
+                WHERE table_name = ?""".format(MANIFEST_TABLE), (table_title,))
+    manifest_entry = cur.fetchone()
+    if manifest_entry is None or not table_exists(conn, table_title):
+        return True
+    size, mtime, source_hash, schema_version = manifest_entry
+    if schema_version != SCHEMA_VERSION:
+        return True
+    file_stat = os.stat(file_path)
+    if file_stat.st_size == size and file_stat.st_mtime == mtime:
+        return False
+    if file_stat.st_size == size and file_hash(file_path) == source_hash:
+        record_source(conn, table_title, file_path, source_hash)
+        return False
+    return True
+
+
+def record_source(conn, table_title, file_path, source_hash=None):
+    """Records the size, modified time and hash of the file a table was loaded
+    from in the manifest
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables and manifest
+        table_title (str): name of the table loaded from the file
+        file_path (str): path of the source file
+        source_hash (str): hash of the file if it is already known
+    """
+    if source_hash is None:
+        source_hash = file_hash(file_path)
+    file_stat = os.stat(file_path)
+    cur = conn.cursor()
+    cur.execute("""INSERT OR REPLACE INTO {} VALUES (?, ?, ?, ?, ?, ?, ?)""".format(MANIFEST_TABLE),
+                (table_title, os.path.basename(file_path), file_stat.st_size, file_stat.st_mtime, source_hash,
+                 SCHEMA_VERSION, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    conn.commit()
+
+
+def create_indexes(conn, profile, tables=None):
+    """Creates the indexes in the profile's table_indexes so the per subject
+    queries can look up rows instead of scanning whole tables. Tables that do
+    not exist and indexes on columns a table does not have are skipped.
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables
+        profile (:obj: `FormProfile`): tables of the form the tables are
+            built for
+        tables (iterable): names of the tables to index, defaults to every
+            table of the profile's table_indexes
+
+    Returns:
+        :obj: `list` of str: names of the indexes that were created
+    """
+    cur = conn.cursor()
+    created_indexes = list()
+    table_indexes = profile.table_indexes
+    for table_title in tables or table_indexes:
+        if table_title not in table_indexes or not table_exists(conn, table_title):
+            continue
+        cur.execute("""PRAGMA table_info({})""".format(table_title))
+        table_columns = set(column[1].lower() for column in cur.fetchall())
+        for index_columns in table_indexes[table_title]:
+            if not all(column.lower() in table_columns for column in index_columns):
+                print("Skipping index on {} ({}) - missing columns".format(table_title, ", ".join(index_columns)))
+                continue
+            index_name = "idx_{}_{}".format(table_title, "_".join(index_columns))
+            create_index_sql = """CREATE INDEX IF NOT EXISTS {} ON {} ({})""".format(
+                index_name, table_title, ", ".join(index_columns))
+            cur.execute(create_index_sql)
+            created_indexes.append(index_name)
+    conn.commit()
+    return created_indexes
+
+
+def create_category_rules(conn, profile):
+    """Saves the profile's category_rules in its category_rules_table if they
+    differ from the rules saved there
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables
+        profile (:obj: `FormProfile`): tables of the form the tables are
+            built for
+
+    Returns:
+        bool: True if the rules changed since they were last saved
+    """
+    cur = conn.cursor()
+    rules_table = profile.category_rules_table
+    cur.execute("""CREATE TABLE IF NOT EXISTS {} (TableTitle TEXT, name_pattern TEXT, category TEXT,
+                priority INTEGER)""".format(rules_table))
+    cur.execute("""SELECT TableTitle, name_pattern, category FROM {} ORDER BY priority""".format(rules_table))
+    category_rules = profile.category_rules
+    if cur.fetchall() == category_rules:
+        return False
+    cur.execute("""DELETE FROM {}""".format(rules_table))
+    cur.executemany("""INSERT INTO {} VALUES (?, ?, ?, ?)""".format(rules_table),
+                    [rule + (priority,) for priority, rule in enumerate(category_rules)])
+    conn.commit()
+    return True
+
+
+def classify_table(conn, profile, table_title, target_title=None):
+    """Sets the category column of every row of a table from the rules for it
+    in the profile's category_rules_table, adding the column if the table does not have it.
+    Each distinct name is matched against the rules once and the rows then
+    look up the category of their name. The changes are not committed.
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables
+        profile (:obj: `FormProfile`): tables of the form the tables are
+            built for
+        table_title (str): name of the table in the profile's
+            category_sources whose rules are used
+        target_title (str): name of the table to classify, defaults to
+            table_title. swap_table gives the staging table
+    """
+    create_category_rules(conn, profile)
+    target_title = target_title or table_title
+    name_column = profile.category_sources[table_title]
+    cur = conn.cursor()
+    cur.execute("""PRAGMA table_info({})""".format(target_title))
+    if CATEGORY_COLUMN not in [column[1] for column in cur.fetchall()]:
+        cur.execute("""ALTER TABLE {} ADD COLUMN {} TEXT""".format(target_title, CATEGORY_COLUMN))
+    print("Classifying rows of {}".format(table_title))
+    cur.execute("""DROP TABLE IF EXISTS temp.NameCategories""")
+    cur.execute("""CREATE TEMP TABLE NameCategories (name PRIMARY KEY, category TEXT)""")
+    cur.execute("""INSERT INTO NameCategories
+                SELECT n.name, (SELECT category FROM {rules_table}
+                                WHERE TableTitle = ? AND n.name LIKE name_pattern
+                                ORDER BY priority DESC LIMIT 1)
+                FROM (SELECT DISTINCT {name_column} AS name FROM {target_title}
+                      WHERE {name_column} IS NOT NULL) n""".format(
+        rules_table=profile.category_rules_table, name_column=name_column, target_title=target_title), (table_title,))
+    cur.execute("""UPDATE {target_title} SET {category_column} = (SELECT category FROM NameCategories
+                WHERE name = {target_title}.{name_column})""".format(
+        target_title=target_title, category_column=CATEGORY_COLUMN, name_column=name_column))
+    cur.execute("""DROP TABLE temp.NameCategories""")
+
+
+def create_medication_overrides(conn, profile):
+    """Saves MEDICATION_OVERRIDES in the profile's medication_overrides_table
+    if they differ from the rules saved there
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables
+        profile (:obj: `FormProfile`): tables of the form the tables are
+            built for
+
+    Returns:
+        bool: True if the rules changed since they were last saved
+    """
+    cur = conn.cursor()
+    overrides_table = profile.medication_overrides_table
+    cur.execute("""CREATE TABLE IF NOT EXISTS {} (name_pattern TEXT, theraclass TEXT, medroute TEXT,
+                priority INTEGER)""".format(overrides_table))
+    cur.execute("""SELECT name_pattern, theraclass, medroute FROM {} ORDER BY priority""".format(overrides_table))
+    if cur.fetchall() == MEDICATION_OVERRIDES:
+        return False
+    cur.execute("""DELETE FROM {}""".format(overrides_table))
+    cur.executemany("""INSERT INTO {} VALUES (?, ?, ?, ?)""".format(overrides_table),
+                    [override + (priority,) for priority, override in enumerate(MEDICATION_OVERRIDES)])
+    conn.commit()
+    return True
+
+
+def create_medication_admin_table(conn, profile):
+    """Builds the MedAdminName table of medication administrations with the
+    name, route and class of the medication given in a single
+    INSERT ... SELECT. Each administration is joined to the last row of the
+    Medication table that has a route for its medication id, the override
+    rules are applied to the medication name, and administrations that were
+    canceled, missed, refused or had no dose are left out.
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables
+        profile (:obj: `FormProfile`): tables of the form the tables are
+            built for
+
+    Returns:
+        int: number of rows inserted into the table
+    """
+    cur = conn.cursor()
+    table_title = 'MedAdminName' + profile.table_suffix
+    medication_table = 'Medication' + profile.table_suffix
+    medication_admin_table = 'MEDADMINS' + profile.table_suffix
+    create_medication_overrides(conn, profile)
+    # Leave out the number columns so the admin fields line up with
+    # the MedAdminName fields. The admin fields are used by position like the
+    # rest of the data pull: medication id, action taken and dose.
+    medication_admin_columns = table_column_types(conn, medication_admin_table)
+    column_names = [name for name, column_type in medication_admin_columns]
+    column_types = [column_type for name, column_type in medication_admin_columns] + ['TEXT'] * 3
+    med_id, action_taken, med_dose = column_names[2], column_names[4], column_names[7]
+    select_columns = ["a.{}".format(name) for name in column_names]
+    select_columns += ["m.MedIndexName",
+                       "COALESCE(o.medroute, m.MedRoute)",
+                       "COALESCE(o.theraclass, m.THERACLASS)"]
+    select_columns += ["a.{}{}".format(name, NUMBER_SUFFIX)
+                       for name, column_type in medication_admin_columns
+                       if column_type != 'TEXT'
+                       ]
+
+    start_time = time.time()
+    recreate_table(conn, table_title, profile.medication_admin_name_fields, column_types)
+    insert_sql = """INSERT INTO {staging_title}
+                 SELECT {select_columns}
+                 FROM {medication_admin_table} a
+                 JOIN (SELECT MEDICATION_ID, MedIndexName, MedRoute, THERACLASS, MAX(rowid)
+                       FROM {medication_table}
+                       WHERE MedRoute != ''
+                       GROUP BY MEDICATION_ID) m
+                 ON a.{med_id} = m.MEDICATION_ID
+                 LEFT JOIN {overrides_table} o
+                 ON o.priority = (SELECT MAX(priority) FROM {overrides_table}
+                                  WHERE lower(m.MedIndexName) LIKE name_pattern)
+                 WHERE a.{action_taken} NOT IN ('Canceled Entry', 'Missed', 'Refused')
+                 AND a.{med_dose} NOT IN ('', '0')
+                 ORDER BY a.rowid""".format(
+        staging_title=table_title + STAGING_SUFFIX, select_columns=", ".join(select_columns),
+        medication_admin_table=medication_admin_table, medication_table=medication_table, med_id=med_id,
+        overrides_table=profile.medication_overrides_table, action_taken=action_taken, med_dose=med_dose)
+    cur.execute(insert_sql)
+    row_count = cur.rowcount
+    swap_table(conn, profile, table_title)
+    print_load_rate(table_title, row_count, start_time)
+    return row_count
+
+
+def create_pull_status(conn, profile):
+    """Creates the table that records the data pull status of every visit if
+    it does not already exist. LogMarked is 1 for the visits merge_pull_status
+    marked complete in the log table that its CSV still says are not.
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables
+        profile (:obj: `FormProfile`): tables and keys of the form the
+            tables are built for
+    """
+    cur = conn.cursor()
+    key_columns = ", ".join("{} TEXT".format(column) for column in profile.pull_status_key)
+    cur.execute("""CREATE TABLE IF NOT EXISTS {} ({}, DataPullComplete TEXT, pulled_at TEXT, output_hash TEXT,
+                LogMarked INTEGER DEFAULT 0, PRIMARY KEY ({}))""".format(profile.pull_status_table, key_columns,
+                                                                        ", ".join(profile.pull_status_key)))
+    conn.commit()
+
+
+def log_marked(conn, profile):
+    """Checks if merge_pull_status marked visits complete in the log table
+    that its CSV says are not, so the log table no longer matches the CSV
+    its manifest entry records
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables
+        profile (:obj: `FormProfile`): tables and keys of the form the
+            tables are built for
+
+    Returns:
+        bool: True if the log table has to be loaded again to match its CSV
+    """
+    if not table_exists(conn, profile.pull_status_table):
+        return False
+    cur = conn.cursor()
+    cur.execute("""SELECT 1 FROM {} WHERE LogMarked = 1 LIMIT 1""".format(profile.pull_status_table))
+    return cur.fetchone() is not None
+
+
+def merge_pull_status(conn, profile):
+    """Adds the visits of the linking log table that are new to the pull
+    status table and marks the ones the log says are complete, then marks
+    every visit that is complete in the pull status table complete in the log
+    table, so the data pull only reads the new visits. The visits marked in
+    the log table are recorded with LogMarked, so a run that is not
+    incremental loads the log table from its CSV again.
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables
+        profile (:obj: `FormProfile`): tables and keys of the form the
+            tables are built for
+
+    Returns:
+        int: number of visits added to the pull status table
+    """
+    create_pull_status(conn, profile)
+    table_title = profile.visit_log_table
+    key_columns = ", ".join(profile.pull_status_key)
+    cur = conn.cursor()
+    cur.execute("""INSERT OR IGNORE INTO {status_table} ({key_columns}, DataPullComplete)
+                SELECT {key_columns}, DataPullComplete FROM {table_title} ORDER BY rowid""".format(
+        status_table=profile.pull_status_table, key_columns=key_columns, table_title=table_title))
+    new_count = cur.rowcount
+    cur.execute("""UPDATE {status_table} SET DataPullComplete = 'Yes'
+                WHERE DataPullComplete <> 'Yes'
+                AND ({key_columns}) IN (SELECT {key_columns} FROM {table_title}
+                                        WHERE DataPullComplete = 'Yes')""".format(
+        status_table=profile.pull_status_table, key_columns=key_columns, table_title=table_title))
+    cur.execute("""UPDATE {status_table} SET LogMarked = 1
+                WHERE DataPullComplete = 'Yes'
+                AND ({key_columns}) IN (SELECT {key_columns} FROM {table_title}
+                                        WHERE DataPullComplete <> 'Yes')""".format(
+        status_table=profile.pull_status_table, key_columns=key_columns, table_title=table_title))
+    cur.execute("""UPDATE {table_title} SET DataPullComplete = 'Yes'
+                WHERE DataPullComplete <> 'Yes'
+                AND ({key_columns}) IN (SELECT {key_columns} FROM {status_table}
+                                        WHERE DataPullComplete = 'Yes')""".format(
+        status_table=profile.pull_status_table, key_columns=key_columns, table_title=table_title))
+    conn.commit()
+    print("Merged {} into {} - {} new visits".format(table_title, profile.pull_status_table, new_count))
+    return new_count
+
+
+def mark_pulled(conn, profile, pulled):
+    """Marks visits complete in the pull status table once their data has
+    been written. The log table is left alone, so the data pull's cursors on
+    it are not disturbed, and the next merge_pull_status marks the visits
+    there.
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables
+        profile (:obj: `FormProfile`): tables and keys of the form the
+            tables are built for
+        pulled (list): pull_status_key values of each visit as a tuple and
+            the hash of its output
+    """
+    pulled_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    key_match = " AND ".join("{} = ?".format(column) for column in profile.pull_status_key)
+    cur = conn.cursor()
+    cur.executemany("""UPDATE {} SET DataPullComplete = 'Yes', pulled_at = ?, output_hash = ?
+                    WHERE {}""".format(profile.pull_status_table, key_match),
+                    [(pulled_at, output_hash) + tuple(key) for key, output_hash in pulled])
+    conn.commit()
+
+
+def create_result_cache(conn, profile):
+    """Creates the table that holds the output of every visit pulled, and the
+    table of the fingerprints of each subject's rows in each table, if they
+    do not already exist
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables
+        profile (:obj: `FormProfile`): tables and keys of the form the
+            tables are built for
+    """
+    cur = conn.cursor()
+    key_columns = ", ".join("{} TEXT".format(column) for column in profile.pull_status_key)
+    cur.execute("""CREATE TABLE IF NOT EXISTS {} ({}, fingerprint TEXT, coordinator_text TEXT, labeled_row TEXT,
+                raw_row TEXT, cached_at TEXT, PRIMARY KEY ({}))""".format(
+        profile.result_cache_table, key_columns, ", ".join(profile.pull_status_key)))
+    cur.execute("""CREATE TABLE IF NOT EXISTS {} (TableTitle TEXT, STUDYID TEXT, table_state TEXT, fingerprint TEXT,
+                PRIMARY KEY (TableTitle, STUDYID))""".format(profile.result_cache_table + FINGERPRINT_SUFFIX))
+    conn.commit()
+
+
+def table_state(conn, profile, table_title):
+    """Hashes what a table's rows were built from: the manifest entries of the
+    files it was loaded from, and the rules that classified or overrode its
+    rows. The hash only changes when the table's rows may have changed, so
+    the fingerprints of its rows can be kept until then.
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables
+        profile (:obj: `FormProfile`): tables and keys of the form the
+            tables are built for
+        table_title (str): name of the table
+
+    Returns:
+        str: hex digest of the sha1 hash of the table's sources
+    """
+    cur = conn.cursor()
+    state = hashlib.sha1(table_title.encode())
+    if table_title == 'MedAdminName' + profile.table_suffix:
+        source_tables = ['Medication' + profile.table_suffix, 'MEDADMINS' + profile.table_suffix]
+        state.update(repr(MEDICATION_OVERRIDES).encode())
+    else:
+        source_tables = [table_title]
+    for source_title in source_tables:
+        cur.execute("""SELECT file_hash, schema_version FROM {} WHERE table_name = ?""".format(
+            MANIFEST_TABLE), (source_title,))
+        state.update(repr(cur.fetchone()).encode())
+    if table_title in profile.category_sources:
+        state.update(repr(profile.category_rules).encode())
+    return state.hexdigest()
+
+
+def stored_fingerprints(conn, profile, table_title, state):
+    """Gets the fingerprints of each subject's rows in a table that were read
+    while the table had the state it has now, and drops the ones read from
+    an older state
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables
+        profile (:obj: `FormProfile`): tables and keys of the form the
+            tables are built for
+        table_title (str): name of the table
+        state (str): the table's state from table_state
+
+    Returns:
+        :obj: `dict`: fingerprint of each subject's rows by STUDYID
+    """
+    fingerprint_table = profile.result_cache_table + FINGERPRINT_SUFFIX
+    cur = conn.cursor()
+    cur.execute("""DELETE FROM {} WHERE TableTitle = ? AND table_state <> ?""".format(fingerprint_table),
+                (table_title, state))
+    conn.commit()
+    cur.execute("""SELECT STUDYID, fingerprint FROM {} WHERE TableTitle = ?""".format(fingerprint_table),
+                (table_title,))
+    return dict(cur.fetchall())
+
+
+def save_fingerprints(conn, profile, table_title, state, fingerprints):
+    """Saves the fingerprints of each subject's rows in a table read while it
+    had a state
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables
+        profile (:obj: `FormProfile`): tables and keys of the form the
+            tables are built for
+        table_title (str): name of the table
+        state (str): the table's state from table_state
+        fingerprints (dict): fingerprint of each subject's rows by STUDYID
+    """
+    cur = conn.cursor()
+    cur.executemany("""INSERT OR REPLACE INTO {} VALUES (?, ?, ?, ?)""".format(
+        profile.result_cache_table + FINGERPRINT_SUFFIX),
+                    [(table_title, subject_id, state, fingerprint) for subject_id, fingerprint in fingerprints.items()])
+    conn.commit()
+
+
+def cached_results(conn, profile, fingerprints):
+    """Gets the cached output of the visits whose subject's source rows have
+    the fingerprint they had when the output was cached
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables
+        profile (:obj: `FormProfile`): tables and keys of the form the
+            tables are built for
+        fingerprints (dict): fingerprint of the source rows of each subject
+            by STUDYID
+
+    Returns:
+        :obj: `dict`: coordinator file text, labeled and raw REDCap rows of
+            each visit by tuple of the pull_status_key values
+    """
+    create_result_cache(conn, profile)
+    key_length = len(profile.pull_status_key)
+    cur = conn.cursor()
+    cur.execute("""SELECT {}, fingerprint, coordinator_text, labeled_row, raw_row FROM {}""".format(
+        ", ".join(profile.pull_status_key), profile.result_cache_table))
+    results = dict()
+    for row in cur:
+        fingerprint, coordinator_text, labeled_row, raw_row = row[key_length:]
+        if fingerprints.get(row[0]) == fingerprint:
+            results[tuple(row[:key_length])] = (coordinator_text, json.loads(labeled_row), json.loads(raw_row))
+    return results
+
+
+def save_results(conn, profile, results):
+    """Saves the output of visits in the result cache table, replacing any
+    output cached for them before
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            holds the tables
+        profile (:obj: `FormProfile`): tables and keys of the form the
+            tables are built for
+        results (list): pull_status_key values of each visit as a tuple, the
+            fingerprint of its subject's source rows, its coordinator file text
+            and its labeled and raw REDCap rows
+    """
+    cached_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    cur = conn.cursor()
+    cur.executemany("""INSERT OR REPLACE INTO {} VALUES ({})""".format(
+        profile.result_cache_table, ", ".join(["?"] * (len(profile.pull_status_key) + 5))),
+                    [tuple(key) + (fingerprint, coordinator_text, json.dumps(labeled_row), json.dumps(raw_row),
+                                   cached_at)
+                     for key, fingerprint, coordinator_text, labeled_row, raw_row in results])
+    conn.commit()
+
+
+def create_tables(conn, profile, batch_size=BATCH_SIZE, memory_ceiling=MEMORY_CEILING, force=False,
+                  workers=INGEST_WORKERS, bulk_load=True, incremental=False, local_database=None):
+    """Create database tables for each text file provided by Matt
+
+    Args:
+       conn (:obj: `database connection`): connection to the database to
+           save the tables
+       profile (:obj: `FormProfile`): tables of the form the tables are
+           built for
+       batch_size (int): number of rows sent to the database per executemany
+           call when loading each table
+       memory_ceiling (int): approximate number of bytes of rows held in
+           memory at once while loading each table
+       force (bool): reload every table even if its source file has not
+           changed since it was last loaded
+       workers (int): number of processes parsing text files at the same
+           time, 1 loads them one after another
+       bulk_load (bool): set the journal mode and use BULK_LOAD_PRAGMAS while
+           loading
+       incremental (bool): merge the linking log into the pull status table and
+           mark the visits already pulled complete in the log table
+       local_database (bool): the database is on local disk, so it can be
+           kept in LOCAL_JOURNAL_MODE instead of SHARED_JOURNAL_MODE. When
+           left out it is on local disk unless on_network_share says
+           otherwise. The journal mode of an in-memory database is left as
+           it is
+
+    Returns:
+        :obj: `list` of str: names of the tables that were reloaded
+    """
+    # Get Text Files Matt Stored
+    sep = os.sep
+    datafilespath = os.getcwd() + sep + 'Linking_Log_For_Matt' + sep + 'Matt_Place_Text_Files_Here'
+    current_files = os.listdir(datafilespath)
+    current_files = [filename
+                     for filename in current_files
+                     if filename.endswith('.txt')
+                     ]
+
+    if bulk_load:
+        if not in_memory(conn):
+            if local_database is None:
+                local_database = not on_network_share(conn)
+            journal_mode = LOCAL_JOURNAL_MODE if local_database else SHARED_JOURNAL_MODE
+            apply_pragmas(conn, [('journal_mode', journal_mode)])
+        connection_pragmas = apply_pragmas(conn, BULK_LOAD_PRAGMAS)
+    # The connection settings are put back even if a load fails
+    try:
+        create_manifest(conn)
+        rules_changed = create_category_rules(conn, profile)
+        overrides_changed = create_medication_overrides(conn, profile)
+        reloaded_tables = list()
+        changed_files = list()
+        for filename in current_files:
+            table_title = filename.replace(".txt", "")
+            file_path = datafilespath + sep + filename
+            if not force and not source_changed(conn, table_title, file_path):
+                print("Table {} is up to date".format(table_title))
+                continue
+            changed_files.append((table_title, file_path))
+        if workers > 1 and changed_files:
+            reloaded_tables += load_text_files_parallel(conn, profile, changed_files, workers, batch_size,
+                                                        memory_ceiling)
+        else:
+            for table_title, file_path in changed_files:
+                with open(file_path, 'r') as text_file:
+                    table_fields, column_types, table_rows = read_text_file(text_file)
+                    load_table(conn, profile, table_title, table_fields, table_rows, batch_size, memory_ceiling,
+                               column_types)
+                record_source(conn, table_title, file_path)
+                reloaded_tables.append(table_title)
+
+        # Create MedAdminName Table from Medication Table and MedicationAdmin tables
+        # Only rebuilt when one of the tables it is made from was reloaded or
+        # the override rules changed
+        table_title = 'MedAdminName' + profile.table_suffix
+        medication_tables = ('Medication' + profile.table_suffix, 'MEDADMINS' + profile.table_suffix)
+        if (force or overrides_changed or not table_exists(conn, table_title)
+                or set(medication_tables) & set(reloaded_tables)):
+            create_medication_admin_table(conn, profile)
+            reloaded_tables.append(table_title)
+
+        # Create the linking log table of the visits to pull
+        visit_log_path = os.getcwd() + sep + 'Linking_Log_For_Matt'
+        table_title = profile.visit_log_table
+        file_path = visit_log_path + sep + profile.visit_log_file
+        # A log table an incremental run marked is loaded again unless this run is incremental too
+        if force or source_changed(conn, table_title, file_path) or (not incremental and log_marked(conn, profile)):
+            with open(file_path, 'r') as visit_log:
+                csvreader = csv.reader(visit_log, delimiter=',')
+                table_fields = ",".join(next(csvreader))
+                load_table(conn, profile, table_title, table_fields, csvreader, batch_size, memory_ceiling)
+            record_source(conn, table_title, file_path)
+            if table_exists(conn, profile.pull_status_table):
+                conn.execute("""UPDATE {} SET LogMarked = 0""".format(profile.pull_status_table))
+                conn.commit()
+            reloaded_tables.append(table_title)
+        else:
+            print("Table {} is up to date".format(table_title))
+        if incremental:
+            merge_pull_status(conn, profile)
+        # Classify the rows of tables that were not reloaded when the category
+        # rules changed or they were loaded before rows had a category
+        for table_title in profile.category_sources:
+            if table_title in reloaded_tables or not table_exists(conn, table_title):
+                continue
+            table_columns = [name for name, column_type in table_column_types(conn, table_title)]
+            if rules_changed or CATEGORY_COLUMN not in table_columns:
+                classify_table(conn, profile, table_title)
+                conn.commit()
+        # Index tables that were not reloaded but are missing an index
+        create_indexes(conn, profile)
+    except BaseException:
+        # The settings cannot be changed inside the failed load's transaction
+        conn.rollback()
+        raise
+    finally:
+        if bulk_load:
+            apply_pragmas(conn, connection_pragmas)
+    print("Done Creating tables")
+    return reloaded_tables
+
+
+def main(profile):
+    """Loads the text files of a form into the form's database
+
+    Args:
+        profile (:obj: `FormProfile`): tables of the form to load
+    """
+    parser = argparse.ArgumentParser(description="Loads the text files provided by Matt into the database")
+    parser.add_argument('--ingest-workers', type=int, default=INGEST_WORKERS,
+                        help="number of processes parsing the text files at the same time")
+    args = parser.parse_args()
+    check_requirements()
+    conn = sqlite3.connect(profile.database_path)
+    create_tables(conn, profile, workers=args.ingest_workers)
@@ -0,0 +1,386 @@
+import argparse
+import csv
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import datapull_sql
+from Common import rundatapull, tablebuilder
+from Common.datapullclasses import ADTCache
+from createtables import PROFILE
+from rundatapull_ed_enrollment import FORM, edvisit
+
+SYNTHETIC_TABLE_FIELDS = {
+    'DEMOGRAPHICS': "STUDYID,CSN,ADT_ARRIVAL_TIME,ED_DEPARTURE_TIME,HOSP_ADMSN_TIME,EDDisposition",
+    'Flowsheets': "STUDYID,CSN,FlowsheetDisplayName,RECORDED_TIME,FlowsheetValue",
+    'LAB': "STUDYID,CSN,PROC_NAME,LabComponentName,ORD_VALUE,SPECIMN_TAKEN_TIME,RESULT_TIME",
+    'Medication': "STUDYID,CSN,MEDICATION_ID,MedIndexName,MedRoute,THERACLASS,OrderingMode,TimeOrdered",
+    'MEDADMINS': "studyid,order_med_id,medication_id,TimeActionTaken,ActionTaken,MAR_ORIG_DUE_TM,SCHEDULED_TIME,"
+                 "Dose,AdminSite,INFUSION_RATE,InfusionRateUnit,DurationToInfuse,Duration_Infuse_Unit",
+    'Procedures': "STUDYID,CSN,PROC_NAME,ORDER_TIME,OrderStatus",
+    'Diagnosis': "STUDYID,CSN,EpicInternalDiagnosisName",
+    'STUDY_IDS_TO_PULL': "STUDYID,DataPullComplete",
+}
+
+FLOWSHEET_NAMES = ['Temp', 'Resp', 'BP', 'Pulse', 'SpO2', 'O2 Device', 'Pain Score', 'Weight']
+LAB_COMPONENTS = ['PH SPECIMEN', 'BLOOD UREA NITROGEN', 'SODIUM', 'GLUCOSE', 'HEMATOCRIT', 'INFLUENZA A NAT',
+                  'INFLUENZA B NAT', 'RSV NAT', 'RHINOVIRUS NAT', 'POTASSIUM', 'CHLORIDE', 'WBC']
+MEDICATIONS = [('1', 'Oseltamivir 75 MG capsule', 'Oral', 'ANTIVIRALS'),
+               ('2', 'Ceftriaxone 1 g injection', 'Intravenous', 'ANTIBIOTICS'),
+               ('3', 'Azithromycin 500 mg tablet', 'Oral', 'MACROLIDES'),
+               ('4', 'Acetaminophen 500 mg tablet', 'Oral', 'ANALGESICS')]
+def synthetic_rows(table_title, subjects, rows_per_subject):
+    """Yields random rows shaped like the text files Matt provides
+
+    Args:
+        table_title (str): name of the table to make rows for
+        subjects (int): number of subjects to make rows for
+        rows_per_subject (int): number of Flowsheets and LAB rows per subject,
+            the other tables get a fraction of this
+
+    Yields:
+        list: a row of values for the table
+    """
+    randomizer = random.Random(table_title)
+    for subject_number in range(subjects):
+        subject_id = 'CEIRS{:06d}'.format(subject_number)
+        csn = str(100000000 + subject_number)
+        arrival = datetime(2017, 1, 1) + timedelta(minutes=subject_number * 37)
+
+        def timestamp(minutes):
+            return (arrival + timedelta(minutes=minutes)).strftime('%Y-%m-%d %H:%M:%S')
+
+        if table_title == 'DEMOGRAPHICS':
+            yield [subject_id, csn, timestamp(0), timestamp(300), timestamp(320),
+                   randomizer.choice(['Discharge', 'Admit', 'Hospitalized Observation'])]
+        elif table_title == 'STUDY_IDS_TO_PULL':
+            yield [subject_id, 'No']
+        elif table_title == 'Flowsheets':
+            for _ in range(rows_per_subject):
+                name = randomizer.choice(FLOWSHEET_NAMES)
+                value = '120/80' if name == 'BP' else 'Nasal cannula' if name == 'O2 Device' else '98.6'
+                yield [subject_id, csn, name, timestamp(randomizer.randint(1, 2000)), value]
+        elif table_title == 'LAB':
+            for _ in range(rows_per_subject):
+                component = randomizer.choice(LAB_COMPONENTS)
+                value = 'No RNA Detected' if component.endswith('NAT') else '7.35'
+                collected = randomizer.randint(1, 2000)
+                yield [subject_id, csn, 'PANEL', component, value, timestamp(collected), timestamp(collected + 45)]
+        elif table_title in ('Medication', 'MEDADMINS'):
+            for _ in range(max(1, rows_per_subject // 10)):
+                med_id, med_name, med_route, med_class = randomizer.choice(MEDICATIONS)
+                if table_title == 'Medication':
+                    yield [subject_id, csn, med_id, med_name, med_route, med_class,
+                           randomizer.choice(['Inpatient', 'Outpatient']), timestamp(randomizer.randint(1, 600))]
+                else:
+                    yield [subject_id, '5' + csn, med_id, timestamp(randomizer.randint(1, 600)), 'Given', '', '',
+                           '1', '', '', '', '', '']
+        elif table_title == 'Procedures':
+            for _ in range(max(1, rows_per_subject // 10)):
+                yield [subject_id, csn, randomizer.choice(['XR CHEST 2 VIEWS', 'CT HEAD', 'US ABDOMEN']),
+                       timestamp(randomizer.randint(1, 600)), 'Completed']
+        elif table_title == 'Diagnosis':
+            for _ in range(3):
+                yield [subject_id, csn, randomizer.choice(['Influenza', 'Viral syndrome', 'Cough'])]
+
+
+def build_synthetic_database(conn, subjects, rows_per_subject, **load_options):
+    """Loads a synthetic copy of every table create_tables builds
+
+    Args:
+        conn (:obj: `database connection`): connection to the database to
+            save the tables
+        subjects (int): number of subjects to make
+        rows_per_subject (int): number of Flowsheets and LAB rows per subject
+        **load_options: extra keyword arguments passed to load_table
+
+    Returns:
+        :obj: `list` of str: study ids of the synthetic subjects
+    """
+    for table_title, table_fields in SYNTHETIC_TABLE_FIELDS.items():
+        tablebuilder.load_table(conn, PROFILE, table_title, table_fields,
+                                synthetic_rows(table_title, subjects, rows_per_subject), **load_options)
+    tablebuilder.create_medication_admin_table(conn, PROFILE)
+    return ['CEIRS{:06d}'.format(subject_number) for subject_number in range(subjects)]
+
+
+def write_synthetic_text_files(base_path, subjects, rows_per_subject):
+    """Writes synthetic text files and linking log laid out the way
+    create_tables expects to find them
+
+    Args:
+        base_path (str): folder to write Linking_Log_For_Matt into
+        subjects (int): number of subjects to make
+        rows_per_subject (int): number of Flowsheets and LAB rows per subject
+    """
+    sep = os.sep
+    linking_log_path = base_path + sep + 'Linking_Log_For_Matt'
+    text_files_path = linking_log_path + sep + 'Matt_Place_Text_Files_Here'
+    os.makedirs(text_files_path)
+    for table_title, table_fields in SYNTHETIC_TABLE_FIELDS.items():
+        if table_title == 'STUDY_IDS_TO_PULL':
+            file_path, delimiter = linking_log_path + sep + 'Prospective_Linking_Log.csv', ','
+        else:
+            file_path, delimiter = text_files_path + sep + table_title + '.txt', '\t'
+        with open(file_path, 'w', newline='') as text_file:
+            writer = csv.writer(text_file, delimiter=delimiter)
+            writer.writerow(table_fields.split(","))
+            writer.writerows(synthetic_rows(table_title, subjects, rows_per_subject))
+
+
+def latency_summary(latencies):
+    """Formats per subject latencies for printing
+
+    Args:
+        latencies (list): seconds taken for each subject
+
+    Returns:
+        str: mean, median and 95th percentile latency in milliseconds
+    """
+    latencies = sorted(latencies)
+    mean = sum(latencies) / len(latencies)
+    median = latencies[len(latencies) // 2]
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return "mean {:.2f} ms, median {:.2f} ms, p95 {:.2f} ms".format(mean * 1000, median * 1000, p95 * 1000)
+
+
+def time_subjects(conn, subject_ids):
+    """Runs edvisit for each subject and times it
+
+    Args:
+        conn (:obj: `database connection`): connection to the database that
+            contains the patient data
+        subject_ids (list): study ids of the subjects to pull
+
+    Returns:
+        :obj: `list` of float: seconds taken for each subject
+    """
+    latencies = list()
+    for subject_id in subject_ids:
+        start_time = time.perf_counter()
+        edvisit(subject_id, conn)
+        latencies.append(time.perf_counter() - start_time)
+    return latencies
+
+
+def benchmark_indexes(subjects, rows_per_subject, sample):
+    """Compares per subject extraction latency without and with the indexes
+    from tablebuilder.create_indexes
+
+    Args:
+        subjects (int): number of subjects in the synthetic database
+        rows_per_subject (int): number of Flowsheets and LAB rows per subject
+        sample (int): number of subjects to time
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        conn = sqlite3.connect(os.path.join(temp_dir, 'CEIRS.db'))
+        subject_ids = build_synthetic_database(conn, subjects, rows_per_subject)
+        subject_ids = random.Random(0).sample(subject_ids, min(sample, len(subject_ids)))
+        # Loading a table creates its indexes, drop them to time the scans
+        cur = conn.cursor()
+        cur.execute("""SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'""")
+        for index_name, in cur.fetchall():
+            cur.execute("""DROP INDEX {}""".format(index_name))
+        conn.commit()
+        before = time_subjects(conn, subject_ids)
+        start_time = time.perf_counter()
+        tablebuilder.create_indexes(conn, PROFILE)
+        index_time = time.perf_counter() - start_time
+        after = time_subjects(conn, subject_ids)
+        conn.close()
+    print("Without indexes: {}".format(latency_summary(before)))
+    print("Building indexes took {:.2f} s".format(index_time))
+    print("With indexes:    {}".format(latency_summary(after)))
+
+
+def benchmark_ingest(subjects, rows_per_subject, workers):
+    """Compares the wall clock time of create_tables loading the text files
+    one after another and with a pool of parsing processes
+
+    Args:
+        subjects (int): number of subjects in the synthetic text files
+        rows_per_subject (int): number of Flowsheets and LAB rows per subject
+        workers (int): number of parsing processes for the parallel load
+    """
+    current_path = os.getcwd()
+    timings = list()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_synthetic_text_files(temp_dir, subjects, rows_per_subject)
+        os.chdir(temp_dir)
+        try:
+            for load_workers in (1, workers):
+                conn = sqlite3.connect(os.path.join(temp_dir, 'CEIRS_{}.db'.format(load_workers)))
+                start_time = time.perf_counter()
+                tablebuilder.create_tables(conn, PROFILE, workers=load_workers, local_database=True)
+                timings.append((load_workers, time.perf_counter() - start_time))
+                conn.close()
+        finally:
+            os.chdir(current_path)
+    for load_workers, elapsed in timings:
+        print("create_tables with {} worker(s): {:.2f} s".format(load_workers, elapsed))
+
+
+def benchmark_cohort(subjects, rows_per_subject):
+    """Compares the wall clock time of pulling every subject with the per
+    subject queries and with the cohort queries from rundatapull.cohort_rows
+
+    Args:
+        subjects (int): number of subjects in the synthetic database
+        rows_per_subject (int): number of Flowsheets and LAB rows per subject
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        conn = sqlite3.connect(os.path.join(temp_dir, 'CEIRS.db'))
+        subject_ids = build_synthetic_database(conn, subjects, rows_per_subject)
+        start_time = time.perf_counter()
+        for subject_id in subject_ids:
+            edvisit(subject_id, conn)
+        per_subject_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        adt_cache = ADTCache(datapull_sql.adt_rows(conn))
+        first_observations = datapull_sql.first_observations(conn)
+        for (subject_id,), table_rows in rundatapull.cohort_rows(conn, FORM, adt_cache.discharge_time):
+            edvisit(subject_id, conn, table_rows, adt_cache, first_observations)
+        cohort_time = time.perf_counter() - start_time
+        conn.close()
+    # Both add one query for the ADT times and two for the first vitals and
+    # labs, the cohort adds one for the linking log
+    query_count = len(datapull_sql.SUBJECT_TABLE_SQL) + 3
+    print("Per subject: {:.2f} s, {} queries".format(per_subject_time, query_count * len(subject_ids)))
+    print("Cohort:      {:.2f} s, {} queries".format(cohort_time, len(datapull_sql.COHORT_TABLE_SQL) + 4))
+
+
+def benchmark_memory(subjects, rows_per_subject, sample):
+    """Compares per subject extraction latency reading a database file on
+    local disk against reading the in-memory copy from
+    tablebuilder.memory_snapshot. The file is read through the operating
+    system's cache, so a database on a network share gains more than this
+    shows.
+
+    Args:
+        subjects (int): number of subjects in the synthetic database
+        rows_per_subject (int): number of Flowsheets and LAB rows per subject
+        sample (int): number of subjects to time
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database_path = os.path.join(temp_dir, 'CEIRS.db')
+        conn = sqlite3.connect(database_path)
+        subject_ids = build_synthetic_database(conn, subjects, rows_per_subject)
+        subject_ids = random.Random(0).sample(subject_ids, min(sample, len(subject_ids)))
+        conn.close()
+        conn = sqlite3.connect(database_path)
+        on_disk = time_subjects(conn, subject_ids)
+        start_time = time.perf_counter()
+        memory_conn = tablebuilder.memory_snapshot(conn)
+        snapshot_time = time.perf_counter() - start_time
+        in_memory = time_subjects(memory_conn, subject_ids)
+        memory_conn.close()
+        conn.close()
+    print("On disk:   {}".format(latency_summary(on_disk)))
+    print("Copying into memory took {:.2f} s".format(snapshot_time))
+    print("In memory: {}".format(latency_summary(in_memory)))
+
+
+def benchmark_workers(subjects, rows_per_subject, workers):
+    """Compares the throughput of pulling every subject in this process
+    against pulling them with a pool of processes from
+    rundatapull.extract_parallel and a pool of threads from
+    rundatapull.extract_threaded
+
+    Args:
+        subjects (int): number of subjects in the synthetic database
+        rows_per_subject (int): number of Flowsheets and LAB rows per subject
+        workers (int): number of worker processes and of threads
+    """
+    timings = list()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database_path = os.path.join(temp_dir, 'CEIRS.db')
+        conn = sqlite3.connect(database_path)
+        subject_ids = build_synthetic_database(conn, subjects, rows_per_subject)
+        adt_cache = ADTCache(datapull_sql.adt_rows(conn))
+        first_observations = datapull_sql.first_observations(conn)
+        start_time = time.perf_counter()
+        for subject_id in subject_ids:
+            edvisit(subject_id, conn, None, adt_cache, first_observations)
+        timings.append(('1 process', time.perf_counter() - start_time))
+        conn.close()
+        start_time = time.perf_counter()
+        visits = [(subject_id,) for subject_id in subject_ids]
+        for pulled_subject in rundatapull.extract_parallel(FORM, database_path, visits, adt_cache, first_observations,
+                                                           workers):
+            pass
+        timings.append(('{} processes'.format(workers), time.perf_counter() - start_time))
+        start_time = time.perf_counter()
+        for pulled_subject in rundatapull.extract_threaded(FORM, database_path, visits, adt_cache, first_observations,
+                                                           workers):
+            pass
+        timings.append(('{} threads'.format(workers), time.perf_counter() - start_time))
+    for extract_pool, elapsed in timings:
+        print("{}: {:.2f} s, {:.1f} subjects/sec".format(extract_pool, elapsed, len(subject_ids) / elapsed))
+
+
+def benchmark_statements(subjects, rows_per_subject, sample):
+    """Compares statements per second running datapull_sql.SUBJECT_TABLE_SQL
+    with bound parameters against the same statements with the values pasted
+    into the SQL text, which have to be compiled on every call
+
+    Args:
+        subjects (int): number of subjects in the synthetic database
+        rows_per_subject (int): number of Flowsheets and LAB rows per subject
+        sample (int): number of subjects to run every statement for
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        conn = sqlite3.connect(os.path.join(temp_dir, 'CEIRS.db'))
+        subject_ids = build_synthetic_database(conn, subjects, rows_per_subject)
+        subject_ids = random.Random(0).sample(subject_ids, min(sample, len(subject_ids)))
+        adt_cache = ADTCache(datapull_sql.adt_rows(conn))
+        calls = [(sql, dict(datapull_sql.BOUND_PARAMETERS, subject_id=subject_id,
+                            discharge_time=adt_cache.discharge_time(subject_id)))
+                 for subject_id in subject_ids
+                 for sql in datapull_sql.SUBJECT_TABLE_SQL.values()
+                 ]
+        cur = conn.cursor()
+        start_time = time.perf_counter()
+        for sql, parameters in calls:
+            cur.execute(re.sub(r':(\w+)', lambda name: "'{}'".format(str(parameters[name.group(1)]).replace("'", "''")),
+                               sql))
+            cur.fetchall()
+        formatted_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        for sql, parameters in calls:
+            cur.execute(sql, parameters)
+            cur.fetchall()
+        bound_time = time.perf_counter() - start_time
+        conn.close()
+    print("Values in SQL text: {:.0f} statements/sec".format(len(calls) / formatted_time))
+    print("Bound parameters:   {:.0f} statements/sec".format(len(calls) / bound_time))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the ED enrollment data pull")
+    parser.add_argument('benchmark', choices=['indexes', 'ingest', 'cohort', 'memory', 'workers', 'statements'])
+    parser.add_argument('--subjects', type=int, default=2000)
+    parser.add_argument('--rows-per-subject', type=int, default=200)
+    parser.add_argument('--sample', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    tablebuilder.check_requirements()
+    if args.benchmark == 'indexes':
+        benchmark_indexes(args.subjects, args.rows_per_subject, args.sample)
+    elif args.benchmark == 'ingest':
+        benchmark_ingest(args.subjects, args.rows_per_subject, args.workers)
+    elif args.benchmark == 'cohort':
+        benchmark_cohort(args.subjects, args.rows_per_subject)
+    elif args.benchmark == 'memory':
+        benchmark_memory(args.subjects, args.rows_per_subject, args.sample)
+    elif args.benchmark == 'workers':
+        benchmark_workers(args.subjects, args.rows_per_subject, args.workers)
+    elif args.benchmark == 'statements':
+        benchmark_statements(args.subjects, args.rows_per_subject, args.sample)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,8 @@
-import datapull_sql as ed
-from datapullclasses import ADT, Vitals, Lab, Medication, Medication2, Imaging
+from Common.datapullclasses import Vitals, Lab, Medication, Medication2, Imaging
 from collections import defaultdict
-from datetime import datetime
 
 
-def get_arrival_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
+def get_arrival_info(coordinator, redcap_label, redcap_raw, bundle):
     """Stores subjects arrival info in dictionaies to use for file writing
     Args:
         coordinator (:obj: `OrderedDefaultDict`): collection of coordinator readable data
@@ -12,9 +10,7 @@ def get_arrival_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
         redcap_raw (:obj: `OrderedDefaultDict`): collection of redcap_raw machine readable data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
 
     Returns:
         :obj: `OrderedDefaultDict`):
@@ -22,7 +18,7 @@ def get_arrival_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         contain data to write to file
     """
 
-    arrival_info = ADT(*ed.arrival_date_time(subject_id, conn))
+    arrival_info = bundle.arrival_info
     coordinator['Arrival Date'] = arrival_info.date
     coordinator['Arrival Time'] = arrival_info.time
     redcap_label['edenrollchart_arrivaldate'] = arrival_info.date
@@ -33,7 +29,7 @@ def get_arrival_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
     return coordinator, redcap_label, redcap_raw
 
 
-def get_discharge_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
+def get_discharge_info(coordinator, redcap_label, redcap_raw, bundle):
     """Stores subjects discharge info in dictionaies to use for file writing
     Args:
         coordinator (:obj: `OrderedDefaultDict`): collection of coordinator readable data
@@ -41,16 +37,14 @@ def get_discharge_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
         redcap_raw (:obj: `OrderedDefaultDict`): collection of redcap_raw machine readable data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
 
     Returns:
         :obj: `OrderedDefaultDict`):
         returns two ordered default dictionaries - coordinator and redcap_label that
         contain data to write to file
     """
-    discharge_info = ADT(*ed.discharge_date_time(subject_id, conn))
+    discharge_info = bundle.discharge_info
     coordinator['Discharge Date'] = discharge_info.date
     coordinator['Discharge Time'] = discharge_info.time
     redcap_label['edenrollchart_departtime'] = discharge_info.time[:5]
@@ -61,7 +55,7 @@ def get_discharge_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
     return coordinator, redcap_label, redcap_raw
 
 
-def get_dispo_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
+def get_dispo_info(coordinator, redcap_label, redcap_raw, bundle):
     """Stores subjects disposition info in dictionaies to use for file writing
     Args:
         coordinator (:obj: `OrderedDefaultDict`): collection of coordinator readable data
@@ -69,16 +63,14 @@ def get_dispo_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
         redcap_raw (:obj: `OrderedDefaultDict`): collection of redcap_raw machine readable data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
 
     Returns:
         :obj: `OrderedDefaultDict`):
         returns two ordered default dictionaries - coordinator and redcap_label that
         contain data to write to file
     """
-    dispo_info = ADT(*ed.arrival_date_time(subject_id, conn))
+    dispo_info = bundle.arrival_info
     coordinator['Disposition'] = dispo_info.dispo
     if dispo_info.dispo == "Discharge":
         redcap_label['edenrollchart_dispo'] = dispo_info.dispo
@@ -107,7 +99,7 @@ def get_dispo_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
     return coordinator, redcap_label, redcap_raw
 
 
-def get_vitals_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
+def get_vitals_info(coordinator, redcap_label, redcap_raw, bundle):
     """Stores subjects vitals info in dictionaies to use for file writing
     Args:
         coordinator (:obj: `OrderedDefaultDict`): collection of coordinator readable data
@@ -115,22 +107,17 @@ def get_vitals_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
         redcap_raw (:obj: `OrderedDefaultDict`): collection of redcap_raw machine readable data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
 
     Returns:
         :obj: `OrderedDefaultDict`):
         returns two ordered default dictionaries - coordinator and redcap_label that
         contain data to write to file
     """
-    # Function to find minimums
-    min_lab = lambda x: datetime.strptime(x[1], '%Y-%m-%d %H:%M:%S')
-
     # Temp
-    temp = ed.vitals(subject_id, conn, "'Temp'")
+    temp = bundle.first_observation('Temp')
     if temp:
-        temp = min(temp, key=min_lab)[2]
+        temp = temp[2]
         coordinator['temp'] = temp
         redcap_label['edenrollchart_temperature'] = temp
         redcap_raw['edenrollchart_temperature'] = temp
@@ -140,9 +127,9 @@ def get_vitals_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         redcap_raw['edenrollchart_temperature'] = '999'
 
     # Resp
-    resp = ed.vitals(subject_id, conn, "'Resp'")
+    resp = bundle.first_observation('Resp')
     if resp:
-        resp = min(resp, key=min_lab)[2]
+        resp = resp[2]
         coordinator['resp'] = resp
         redcap_label['edenrollchart_respiratoryrate'] = resp
         redcap_raw['edenrollchart_respiratoryrate'] = resp
@@ -151,9 +138,9 @@ def get_vitals_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         redcap_label['edenrollchart_respiratoryrate'] = 'Not Recorded'
         redcap_raw['edenrollchart_respiratoryrate'] = '999'
     # Blood Pressure
-    bp = ed.vitals(subject_id, conn, "'BP'")
+    bp = bundle.first_observation('BP')
     if bp:
-        bp = min(bp, key=min_lab)[2]
+        bp = bp[2]
         bp = bp.split("/")[0]
         coordinator['bp'] = bp
         redcap_label['edenrollchart_systolicbloodpressure'] = bp
@@ -163,9 +150,9 @@ def get_vitals_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         redcap_label['edenrollchart_systolicbloodpressure'] = 'Not Recorded'
         redcap_raw['edenrollchart_systolicbloodpressure'] = '999'
     # Pulse
-    pulse = ed.vitals(subject_id, conn, "'Pulse'")
+    pulse = bundle.first_observation('Pulse')
     if pulse:
-        pulse = min(pulse, key=min_lab)[2]
+        pulse = pulse[2]
         coordinator['pulse'] = pulse
         redcap_label['edenrollchart_pulse'] = pulse
         redcap_raw['edenrollchart_pulse'] = pulse
@@ -174,9 +161,9 @@ def get_vitals_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         redcap_label['edenrollchart_pulse'] = 'Not Recorded'
         redcap_raw['edenrollchart_pulse'] = '999'
     # O2 SAT
-    oxygen_sat = ed.vitals(subject_id, conn, "'SpO2'")
+    oxygen_sat = bundle.first_observation('SpO2')
     if oxygen_sat:
-        oxygen_sat = min(oxygen_sat, key=min_lab)[2]
+        oxygen_sat = oxygen_sat[2]
         coordinator['Oxgyen Saturation'] = oxygen_sat
         redcap_label['edenrollchart_o2sat'] = oxygen_sat
         redcap_raw['edenrollchart_o2sat'] = oxygen_sat
@@ -188,7 +175,7 @@ def get_vitals_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
     return coordinator, redcap_label, redcap_raw
 
 
-def get_oxygen_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
+def get_oxygen_info(coordinator, redcap_label, redcap_raw, bundle):
     """Stores subjects oxygen info in dictionaies to use for file writing
     Args:
         coordinator (:obj: `OrderedDefaultDict`): collection of coordinator readable data
@@ -196,9 +183,7 @@ def get_oxygen_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
         redcap_raw (:obj: `OrderedDefaultDict`): collection of redcap_raw machine readable data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
 
     Returns:
         :obj: `OrderedDefaultDict`):
@@ -206,7 +191,7 @@ def get_oxygen_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         contain data to write to file
     """
     # Find relevant O2 devices
-    oxygen_info = ed.vitals(subject_id, conn, "'O2 Device'")
+    oxygen_info = bundle.vitals('O2 Device')
     oxygen_type_codes = {'Nasal cannula': "1",
                          'High flow nasal cannula': '1',
                          'Non-rebreather mask': '2',
@@ -244,7 +229,7 @@ def get_oxygen_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
     return coordinator, redcap_label, redcap_raw
 
 
-def get_lab_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
+def get_lab_info(coordinator, redcap_label, redcap_raw, bundle):
     """Stores subjects arrival info in dictionaies to use for file writing
     Args:
         coordinator (:obj: `OrderedDefaultDict`): collection of coordinator readable data
@@ -252,9 +237,7 @@ def get_lab_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
         redcap_raw (:obj: `OrderedDefaultDict`): collection of redcap_raw machine readable data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
 
     Returns:
         :obj: `OrderedDefaultDict`):
@@ -262,12 +245,10 @@ def get_lab_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         contain data to write to file
     """
 
-    # Function to find minimums
-    min_lab = lambda x: datetime.strptime(x[1], '%Y-%m-%d %H:%M:%S')
     # PH
-    ph = ed.lab(subject_id, conn, "'PH SPECIMEN'")
-    if ph and min(ph, key=min_lab)[0] != 'see below':
-        ph = min(ph, key=min_lab)[0]
+    ph = bundle.first_observation('ph')
+    if ph and ph[0] != 'see below':
+        ph = ph[0]
         coordinator['ph'] = ph
         redcap_label['edenrollchart_ph'] = ph
         redcap_raw['edenrollchart_ph'] = ph
@@ -276,11 +257,9 @@ def get_lab_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         redcap_label['edenrollchart_ph'] = 'Not Done'
         redcap_raw['edenrollchart_ph'] = '999'
     # BUN
-    bun_compnames = """LabComponentName = 'BLOOD UREA NITROGEN'
-                    OR LabComponentName = 'UREA NITROGEN'"""
-    bun = ed.lab2(subject_id, conn, bun_compnames)
-    if bun and min(bun, key=min_lab)[0] != 'see below':
-        bun = min(bun, key=min_lab)[0]
+    bun = bundle.first_observation('bun')
+    if bun and bun[0] != 'see below':
+        bun = bun[0]
         coordinator['bun'] = bun
         redcap_label['edenrollchart_bun'] = bun
         redcap_raw['edenrollchart_bun'] = bun
@@ -289,9 +268,9 @@ def get_lab_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         redcap_label['edenrollchart_bun'] = 'Not Done'
         redcap_raw['edenrollchart_bun'] = '999'
     # Sodium
-    sodium = ed.lab(subject_id, conn, "'SODIUM'")
-    if sodium and min(sodium, key=min_lab)[0] != 'see below':
-        sodium = min(sodium, key=min_lab)[0]
+    sodium = bundle.first_observation('sodium')
+    if sodium and sodium[0] != 'see below':
+        sodium = sodium[0]
         coordinator['sodium'] = sodium
         redcap_label['edenrollchart_sodium'] = sodium
         redcap_raw['edenrollchart_sodium'] = sodium
@@ -300,9 +279,9 @@ def get_lab_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         redcap_label['edenrollchart_sodium'] = 'Not Done'
         redcap_raw['edenrollchart_sodium'] = '999'
     # Glucose
-    glucose = ed.lab(subject_id, conn, "'GLUCOSE'")
-    if glucose and min(glucose, key=min_lab)[0] != 'see below':
-        glucose = min(glucose, key=min_lab)[0]
+    glucose = bundle.first_observation('glucose')
+    if glucose and glucose[0] != 'see below':
+        glucose = glucose[0]
         coordinator['glucose'] = glucose
         redcap_label['edenrollchart_glucose'] = glucose
         redcap_raw['edenrollchart_glucose'] = glucose
@@ -311,9 +290,9 @@ def get_lab_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         redcap_label['edenrollchart_glucose'] = 'Not Done'
         redcap_raw['edenrollchart_glucose'] = '999'
     # Hematocrit
-    hematocrit = ed.lab(subject_id, conn, "'HEMATOCRIT'")
-    if hematocrit and min(hematocrit, key=min_lab)[0] != 'see below':
-        hematocrit = min(hematocrit, key=min_lab)[0]
+    hematocrit = bundle.first_observation('hematocrit')
+    if hematocrit and hematocrit[0] != 'see below':
+        hematocrit = hematocrit[0]
         coordinator['hematocrit'] = hematocrit
         redcap_label['edenrollchart_hematocrit'] = hematocrit
         redcap_raw['edenrollchart_hematocrit'] = hematocrit
@@ -325,7 +304,7 @@ def get_lab_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
     return coordinator, redcap_label, redcap_raw
 
 
-def get_flutesting_info(coordinator, redcap_label, redcap_raw, subject_id, conn, dc_time):
+def get_flutesting_info(coordinator, redcap_label, redcap_raw, bundle, dc_time):
     """Stores subjects flu testing info in dictionaies to use for file writing
     Args:
         coordinator (:obj: `OrderedDefaultDict`): collection of coordinator readable data
@@ -333,9 +312,7 @@ def get_flutesting_info(coordinator, redcap_label, redcap_raw, subject_id, conn,
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
         redcap_raw (:obj: `OrderedDefaultDict`): collection of redcap_raw machine readable data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
         dc_time (str): subjects discharge time
 
     Returns:
@@ -345,52 +322,47 @@ def get_flutesting_info(coordinator, redcap_label, redcap_raw, subject_id, conn,
     """
     # Influenza Testing
     influenza_count = 0
-    influenza_compnames = """LabComponentName = 'INFLUENZA A NAT'
-                  OR LabComponentName = 'INFLUENZA B NAT'
-                  OR LabComponentName = 'INFLUENZA A PCR'
-                  OR LabComponentName = 'INFLUENZA B PCR'"""
-    influneza_tests = ed.lab2(subject_id, conn, influenza_compnames)
+    influneza_tests = bundle.labs('flu_pcr')
     influenza_testing = defaultdict(str)
-    if influneza_tests:
+    if bundle.found('LAB', 'flu_pcr'):
 
         for test_result in influneza_tests:
             influenza_lab = Lab(*test_result)
-            if influenza_lab.check_time(dc_time) is True:
-                influenza_count += 1
-                if influenza_count < 5:
-                    # Find first test for patient
-                    redcap_label['edenrollchart_flutest'] = 'Yes'
-                    redcap_raw['edenrollchart_flutest'] = '1'
-                    # Record Number of Influenza Test Done
-                    redcap_label['edenrollchart_numberflutests'] = influenza_count
-                    redcap_raw['edenrollchart_numberflutests'] = influenza_count
-                if influenza_count >= 5:
-                    break
-                result = influenza_lab.value
-                test_name = influenza_lab.labname
-                result_type = influenza_lab.componentname
-                collect_time = influenza_lab.collect_date_time
-                result_time = influenza_lab.result_date_time
-                if result in ('No RNA Detected', 'No DNA Detected'):
-                    result = 'negative'
-                if result in ('DNA Detected', 'RNA Detected'):
-                    result = "{} {}".format(result_type, result)
-                result_id = "{}|{}|{}".format(test_name, collect_time, result_time)
-                # Negative Results
-                if result == 'negative':
-                    if not influenza_testing.get(result_id):
-                        influenza_testing[result_id] = result
-                        continue
-                    if influenza_testing[result_id] != 'negative':
-                        continue
-                # Positive Results
-                if result:
-                    if influenza_testing.get(result_id) == 'negative':
-                        influenza_testing[result_id] = result
-                        continue
-                    else:
-                        influenza_testing[result_id] += "{}".format(result)
-                        continue
+            influenza_count += 1
+            if influenza_count < 5:
+                # Find first test for patient
+                redcap_label['edenrollchart_flutest'] = 'Yes'
+                redcap_raw['edenrollchart_flutest'] = '1'
+                # Record Number of Influenza Test Done
+                redcap_label['edenrollchart_numberflutests'] = influenza_count
+                redcap_raw['edenrollchart_numberflutests'] = influenza_count
+            if influenza_count >= 5:
+                break
+            result = influenza_lab.value
+            test_name = influenza_lab.labname
+            result_type = influenza_lab.componentname
+            collect_time = influenza_lab.collect_date_time
+            result_time = influenza_lab.result_date_time
+            if result in ('No RNA Detected', 'No DNA Detected'):
+                result = 'negative'
+            if result in ('DNA Detected', 'RNA Detected'):
+                result = "{} {}".format(result_type, result)
+            result_id = "{}|{}|{}".format(test_name, collect_time, result_time)
+            # Negative Results
+            if result == 'negative':
+                if not influenza_testing.get(result_id):
+                    influenza_testing[result_id] = result
+                    continue
+                if influenza_testing[result_id] != 'negative':
+                    continue
+            # Positive Results
+            if result:
+                if influenza_testing.get(result_id) == 'negative':
+                    influenza_testing[result_id] = result
+                    continue
+                else:
+                    influenza_testing[result_id] += "{}".format(result)
+                    continue
 
         # Write Influenza Results to file
         influenza_count = 0
@@ -439,7 +411,7 @@ def get_flutesting_info(coordinator, redcap_label, redcap_raw, subject_id, conn,
     return coordinator, redcap_label, redcap_raw
 
 
-def get_othervir_info(coordinator, redcap_label, redcap_raw, subject_id, conn, dc_time):
+def get_othervir_info(coordinator, redcap_label, redcap_raw, bundle, dc_time):
     """Stores subjects other virus info in dictionaies to use for file
     writing
 
@@ -449,9 +421,7 @@ def get_othervir_info(coordinator, redcap_label, redcap_raw, subject_id, conn, d
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
         redcap_raw (:obj: `OrderedDefaultDict`): collection of redcap_raw machine readable data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
         dc_time (str): subjects discharge time
 
     Returns:
@@ -460,48 +430,36 @@ def get_othervir_info(coordinator, redcap_label, redcap_raw, subject_id, conn, d
         contain data to write to file
     """
     # Other Virus Testing
-    othervirus_compnames = """LabComponentName = 'PARAINFLUENZAE 3 NAT'
-                  OR LabComponentName = 'ADENOVIRUS NAT'
-                  OR LabComponentName = 'RHINOVIRUS NAT'
-                  OR LabComponentName = 'PARAINFLUENZAE 2 NAT'
-                  OR LabComponentName = 'METAPNEUMO NAT'
-                  OR LabComponentName = 'RSV NAT'
-                  OR LabComponentName = 'ADENOVIRUS PCR'
-                  OR LabComponentName = 'RHINOVIRUS PCR'
-                  OR LabComponentName = 'PARAINFLUENZAE 2 PCR'
-                  OR LabComponentName = 'METAPNEUMOVIRUS PCR'
-                  OR LabComponentName = 'RSV PCR'"""
-    other_virus_tests = ed.lab2(subject_id, conn, othervirus_compnames)
-    if other_virus_tests:
+    other_virus_tests = bundle.labs('other_resp_virus')
+    if bundle.found('LAB', 'other_resp_virus'):
         othervirus_testing = defaultdict(str)
         for test_result in other_virus_tests:
             othervirus_lab = Lab(*test_result)
-            if othervirus_lab.check_time(dc_time) is True:
-                redcap_label['edenrollchart_otherrespviruses'] = 'Yes'
-                redcap_raw['edenrollchart_otherrespviruses'] = '1'
-                result = othervirus_lab.value
-                collect_time = othervirus_lab.collect_date_time
-                result_type = othervirus_lab.componentname
-                if result in ('No RNA Detected', 'No DNA Detected'):
-                    result = 'negative'
-                if result in ('DNA Detected', 'RNA Detected'):
-                    result = result_type + " {}".format(result)
-                result_id = "{}|{}".format(result_type, collect_time)
-                # Negative Results
-                if result == 'negative':
-                    if not othervirus_testing.get(result_id):
-                        othervirus_testing[result_id] = result
-                        continue
-                    if othervirus_testing[result_id] != 'negative':
-                        continue
-                # Positive Results
-                if result:
-                    if othervirus_testing.get(result_id) == 'negative':
-                        othervirus_testing[result_id] = result
-                        continue
-                    else:
-                        othervirus_testing[result_id] += " {}".format(result)
-                        continue
+            redcap_label['edenrollchart_otherrespviruses'] = 'Yes'
+            redcap_raw['edenrollchart_otherrespviruses'] = '1'
+            result = othervirus_lab.value
+            collect_time = othervirus_lab.collect_date_time
+            result_type = othervirus_lab.componentname
+            if result in ('No RNA Detected', 'No DNA Detected'):
+                result = 'negative'
+            if result in ('DNA Detected', 'RNA Detected'):
+                result = result_type + " {}".format(result)
+            result_id = "{}|{}".format(result_type, collect_time)
+            # Negative Results
+            if result == 'negative':
+                if not othervirus_testing.get(result_id):
+                    othervirus_testing[result_id] = result
+                    continue
+                if othervirus_testing[result_id] != 'negative':
+                    continue
+            # Positive Results
+            if result:
+                if othervirus_testing.get(result_id) == 'negative':
+                    othervirus_testing[result_id] = result
+                    continue
+                else:
+                    othervirus_testing[result_id] += " {}".format(result)
+                    continue
 
         # Write Other Virus Tested Results to file
         for othervirus_result_name, othervirus_result in othervirus_testing.items():
@@ -534,7 +492,7 @@ def get_othervir_info(coordinator, redcap_label, redcap_raw, subject_id, conn, d
     return coordinator, redcap_label, redcap_raw
 
 
-def get_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, conn, dc_time):
+def get_antiviral_info(coordinator, redcap_label, redcap_raw, bundle, dc_time):
     """Stores subjects antiviral info in dictionaies to use for file
     writing
 
@@ -544,9 +502,7 @@ def get_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, conn,
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
         redcap_raw (:obj: `OrderedDefaultDict`): collection of redcap_raw machine readable data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
         dc_time (str): subjects discharge time
 
     Returns:
@@ -556,9 +512,8 @@ def get_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, conn,
     """
     # ED Antivirals
     ed_antiviral_count = 0
-    ed_antivirals = ed.medication2(
-        subject_id, conn, "'ANTIVIRALS'")
-    if ed_antivirals:
+    ed_antivirals = bundle.medication2('ANTIVIRALS')
+    if bundle.found('MedAdminName', 'ANTIVIRALS'):
         med_route_codes = {'IV': '3',
                            'Intravenous': '3',
                            'Oral': '1',
@@ -571,7 +526,7 @@ def get_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, conn,
             antiviral_lab = Medication2(*antiviral)
             med_route = antiviral_lab.route
             # Skip meds without proper routes and give after dishcarge from the ED
-            if antiviral_lab.check_time(dc_time) is True and med_route_codes.get(med_route):
+            if med_route_codes.get(med_route):
                 ed_antiviral_count += 1
                 if ed_antiviral_count < 3:
                     redcap_label['edenrollchart_antiviral'] = 'Yes'
@@ -604,7 +559,7 @@ def get_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, conn,
     return coordinator, redcap_label, redcap_raw
 
 
-def get_dc_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, conn, dc_time, dispo):
+def get_dc_antiviral_info(coordinator, redcap_label, redcap_raw, bundle, dc_time, dispo):
     """Stores subjects discharge antiviral info in dictionaies to use for file
     writing
 
@@ -614,9 +569,7 @@ def get_dc_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, con
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
         redcap_raw (:obj: `OrderedDefaultDict`): collection of redcap_raw machine readable data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
         dc_time (str): subjects discharge time
         dispo (str): subjects final disposition
 
@@ -632,28 +585,26 @@ def get_dc_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, con
 
     # Discharge Antivirals
     discharge_antiviral_count = 0
-    discharge_antivirals = ed.medication(
-        subject_id, conn, "'ANTIVIRALS'", "'Outpatient'")
-    if discharge_antivirals:
+    discharge_antivirals = bundle.medication('ANTIVIRALS')
+    if bundle.found('Medication', 'ANTIVIRALS'):
 
         for antiviral in discharge_antivirals:
             dc_antiviral_lab = Medication(*antiviral)
-            if dc_antiviral_lab.check_time(dc_time) is True:
-                discharge_antiviral_count += 1
-                if discharge_antiviral_count < 3:
-                    redcap_label['edenrollchart_antiviraldischarge'] = 'Yes'
-                    redcap_raw['edenrollchart_antiviraldischarge'] = '1'
-                    # Record number of Dishcarged Antivirals
-                    redcap_label['edenrollchart_numberantiviralsdischarge'] = discharge_antiviral_count
-                    redcap_raw['edenrollchart_numberantiviralsdischarge'] = discharge_antiviral_count
-                if discharge_antiviral_count >= 3:
-                    break
-                med_name = dc_antiviral_lab.name.split(" ")[0]
-                med_route = dc_antiviral_lab.route
-                coordinator["Discharge Antiviral #{}".format(discharge_antiviral_count)] = "{} {}".format(
-                    med_name, med_route)
-                redcap_label['edenrollchart_antiviraldischarge{}'.format(discharge_antiviral_count)] = med_name
-                redcap_raw['edenrollchart_antiviraldischarge{}'.format(discharge_antiviral_count)] = med_name
+            discharge_antiviral_count += 1
+            if discharge_antiviral_count < 3:
+                redcap_label['edenrollchart_antiviraldischarge'] = 'Yes'
+                redcap_raw['edenrollchart_antiviraldischarge'] = '1'
+                # Record number of Dishcarged Antivirals
+                redcap_label['edenrollchart_numberantiviralsdischarge'] = discharge_antiviral_count
+                redcap_raw['edenrollchart_numberantiviralsdischarge'] = discharge_antiviral_count
+            if discharge_antiviral_count >= 3:
+                break
+            med_name = dc_antiviral_lab.name.split(" ")[0]
+            med_route = dc_antiviral_lab.route
+            coordinator["Discharge Antiviral #{}".format(discharge_antiviral_count)] = "{} {}".format(
+                med_name, med_route)
+            redcap_label['edenrollchart_antiviraldischarge{}'.format(discharge_antiviral_count)] = med_name
+            redcap_raw['edenrollchart_antiviraldischarge{}'.format(discharge_antiviral_count)] = med_name
 
     else:
         coordinator['Discharged Antiviral'] = 'No antivirals given at Discharge'
@@ -663,7 +614,7 @@ def get_dc_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, con
     return coordinator, redcap_label, redcap_raw
 
 
-def get_antibiotic_info(coordinator, redcap_label, redcap_raw, subject_id, conn, dc_time):
+def get_antibiotic_info(coordinator, redcap_label, redcap_raw, bundle, dc_time):
     """Stores subjects antibiotic info in dictionaies to use for file
     writing
 
@@ -673,9 +624,7 @@ def get_antibiotic_info(coordinator, redcap_label, redcap_raw, subject_id, conn,
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
         redcap_raw (:obj: `OrderedDefaultDict`): collection of redcap_raw machine readable data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
         dc_time (str): subjects discharge time
 
     Returns:
@@ -685,9 +634,8 @@ def get_antibiotic_info(coordinator, redcap_label, redcap_raw, subject_id, conn,
     """
     # ED Antibiotics
     ed_antibiotics_count = 0
-    ed_antibiotics = ed.medication2(
-        subject_id, conn, "'ANTIBIOTICS'")
-    if ed_antibiotics:
+    ed_antibiotics = bundle.medication2('ANTIBIOTICS')
+    if bundle.found('MedAdminName', 'ANTIBIOTICS'):
         med_route_codes = {'IV': '3',
                            'Intravenous': '3',
                            'Oral': '1',
@@ -699,7 +647,7 @@ def get_antibiotic_info(coordinator, redcap_label, redcap_raw, subject_id, conn,
         for antibiotic in ed_antibiotics:
             abx_med = Medication2(*antibiotic)
             med_route = abx_med.route
-            if abx_med.check_time(dc_time) is True and med_route_codes.get(med_route):
+            if med_route_codes.get(med_route):
                 # Record number of ED Antibiotics
                 ed_antibiotics_count += 1
                 if ed_antibiotics_count < 5:
@@ -732,7 +680,7 @@ def get_antibiotic_info(coordinator, redcap_label, redcap_raw, subject_id, conn,
     return coordinator, redcap_label, redcap_raw
 
 
-def get_dc_abx_info(coordinator, redcap_label, redcap_raw, subject_id, conn, dc_time, dispo):
+def get_dc_abx_info(coordinator, redcap_label, redcap_raw, bundle, dc_time, dispo):
     """Stores subjects discharge antibiotic info in dictionaies to use for file
     writing
 
@@ -742,9 +690,7 @@ def get_dc_abx_info(coordinator, redcap_label, redcap_raw, subject_id, conn, dc_
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
         redcap_raw (:obj: `OrderedDefaultDict`): collection of redcap_raw machine readable data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
         dc_time (str): subjects discharge time
         dispo (str): subjects final disposition
 
@@ -760,29 +706,27 @@ def get_dc_abx_info(coordinator, redcap_label, redcap_raw, subject_id, conn, dc_
         return coordinator, redcap_label, redcap_raw
     # Discharge Antibiotics
     discharge_antibiotics_count = 0
-    discharge_antibiotics = ed.medication(
-        subject_id, conn, "'ANTIBIOTICS'", "'Outpatient'")
-    if discharge_antibiotics:
+    discharge_antibiotics = bundle.medication('ANTIBIOTICS')
+    if bundle.found('Medication', 'ANTIBIOTICS'):
 
         for antibiotic in discharge_antibiotics:
             dc_abx_med = Medication(*antibiotic)
-            if dc_abx_med.check_time(dc_time) is True:
-                discharge_antibiotics_count += 1
-                if discharge_antibiotics_count < 3:
-                    redcap_label['edenrollchart_antibioticdischarge'] = 'Yes'
-                    redcap_raw['edenrollchart_antibioticdischarge'] = '1'
-                    # Record number of Discharge Abx
-                    redcap_label['edenrollchart_numberantibioticsdischarge'] = discharge_antibiotics_count
-                    redcap_raw['edenrollchart_numberantibioticsdischarge'] = discharge_antibiotics_count
-                if discharge_antibiotics_count >= 3:
-                    break
-                med_name = dc_abx_med.name.split(" ")[0]
-                time_ordered = dc_abx_med.date_time
-                med_route = dc_abx_med.route
-                coordinator["Discharge Antibiotics #{}".format(discharge_antibiotics_count)] = "{} {} {}".format(
-                    med_name, med_route, time_ordered)
-                redcap_label['edenrollchart_antibioticdischarge{}_name'.format(discharge_antibiotics_count)] = med_name
-                redcap_raw['edenrollchart_antibioticdischarge{}_name'.format(discharge_antibiotics_count)] = med_name
+            discharge_antibiotics_count += 1
+            if discharge_antibiotics_count < 3:
+                redcap_label['edenrollchart_antibioticdischarge'] = 'Yes'
+                redcap_raw['edenrollchart_antibioticdischarge'] = '1'
+                # Record number of Discharge Abx
+                redcap_label['edenrollchart_numberantibioticsdischarge'] = discharge_antibiotics_count
+                redcap_raw['edenrollchart_numberantibioticsdischarge'] = discharge_antibiotics_count
+            if discharge_antibiotics_count >= 3:
+                break
+            med_name = dc_abx_med.name.split(" ")[0]
+            time_ordered = dc_abx_med.date_time
+            med_route = dc_abx_med.route
+            coordinator["Discharge Antibiotics #{}".format(discharge_antibiotics_count)] = "{} {} {}".format(
+                med_name, med_route, time_ordered)
+            redcap_label['edenrollchart_antibioticdischarge{}_name'.format(discharge_antibiotics_count)] = med_name
+            redcap_raw['edenrollchart_antibioticdischarge{}_name'.format(discharge_antibiotics_count)] = med_name
 
     else:
         coordinator['Discharge Antibiotics'] = 'No antibiotics given at discharge'
@@ -792,7 +736,7 @@ def get_dc_abx_info(coordinator, redcap_label, redcap_raw, subject_id, conn, dc_
     return coordinator, redcap_label, redcap_raw
 
 
-def get_imaging_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
+def get_imaging_info(coordinator, redcap_label, redcap_raw, bundle):
     """Stores subjects imaging info in dictionaies to use for file
     writing
 
@@ -802,9 +746,7 @@ def get_imaging_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
         redcap_raw (:obj: `OrderedDefaultDict`): collection of redcap_raw machine readable data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
 
     Returns:
         :obj: `OrderedDefaultDict`):
@@ -812,7 +754,7 @@ def get_imaging_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         contain data to write to file
     """
     # Chest Imaging
-    chest_xray_ct = ed.chest_imaging(subject_id, conn)
+    chest_xray_ct = bundle.chest_imaging()
     if chest_xray_ct:
         chest_xray_ct = [Imaging(*item) for item in chest_xray_ct]
         coordinator["Chest Imaging"] = chest_xray_ct[0].name
@@ -826,7 +768,7 @@ def get_imaging_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
     return coordinator, redcap_label, redcap_raw
 
 
-def get_diagnosis_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
+def get_diagnosis_info(coordinator, redcap_label, redcap_raw, bundle):
     """Stores subjects diagnosis info in dictionaies to use for file
     writing
 
@@ -836,9 +778,7 @@ def get_diagnosis_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
         redcap_raw (:obj: `OrderedDefaultDict`): collection of redcap_raw machine readable data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
 
     Returns:
         :obj: `OrderedDefaultDict`):
@@ -861,7 +801,7 @@ def get_diagnosis_info(coordinator, redcap_label, redcap_raw, subject_id, conn):
 
     # Final Diagnoses
     diagnosis_count = 0
-    diagnoses = ed.final_diagnoses(subject_id, conn)
+    diagnoses = bundle.final_diagnoses()
     coordinator['Diagnoses'] = diagnoses
     for diagnosis in diagnoses:
         diagnosis_count += 1
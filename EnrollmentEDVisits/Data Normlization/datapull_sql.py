@@ -1,160 +1,247 @@
-import sqlite3
-
-
-def arrival_date_time(subject_id, conn):
-    """Gets arrival date and time from the demographics table
-    Args:
-        subject_id (str): the id of the subject whose data you are searching for
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
-
-    Returns:
-        date (str): subjects arrival date
-        time (str): subjects arrival time
-        arrival (str): used in ADT object to indicate the object is for an
-            arrrival
-        dispo (str): subjects final disposition
-    """
-    cur = conn.cursor()
-    sql = """SELECT ADT_ARRIVAL_TIME, EDDisposition FROM DEMOGRAPHICS
-          WHERE STUDYID = {}""".format(subject_id)
-    cur.execute(sql)
-    data = cur.fetchall()
-    if data:
-        date, time = data[0][0].split(" ")
-        dispo = data[0][1]
-    return date, time, 'arrival', dispo
-
-
-def discharge_date_time(subject_id, conn):
-    """Gets discharge date and time from the demographics table
-    Args:
-        subject_id (str): the id of the subject whose data you are searching for
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
-
-    Returns:
-        date (str): subjects discharge date
-        time (str): subjects discharge time
-        arrival (str): used in ADT object to indicate the object is for an
-            discharge
-        dispo (str): subjects final disposition
-    """
-    cur = conn.cursor()
-    sql = """SELECT ED_DEPARTURE_TIME, EDDisposition FROM DEMOGRAPHICS
-          WHERE STUDYID = {}""".format(subject_id)
-    cur.execute(sql)
-    data = cur.fetchall()
-    if data[0][0]:
-        date, time = data[0][0].split(" ")
-        dispo = data[0][1]
-        return date, time, 'discharge', dispo
-    else:
-        sql = """SELECT HOSP_ADMSN_TIME, EDDisposition FROM DEMOGRAPHICS
-          WHERE STUDYID = {}""".format(subject_id)
-        cur.execute(sql)
-        data = cur.fetchall()
-        if data[0][0]:
-            date, time = data[0][0].split(" ")
-            dispo = data[0][1]
-            return date, time, 'discharge', dispo
-
-
-def vitals(subject_id, conn, flowsheet_name):
-    """Gets a vitals sign value from the Flowsheets table
-
-    Args:
-        subject_id (str): id of subject
-        conn: (:obj: `database connectoin`): connection to the database that
-            contains the patient data
-        flowsheet_name (str): vital type you are searching for: BP, Temp, etc
-
-    Returns:
-        :obj: `list` of :obj: `tuple`:
-           returns a list of tuples of any vitals values found. Each tuple will
-           have the following information
-           name (str): name of the vital sign - BP, Temp, etc
-           date_and_time (str): date and time vital sign was recorded
-           value (str): value of the vital sign
-           
-    """
-    cur = conn.cursor()
-    sql = """SELECT FlowsheetDisplayName, RECORDED_TIME, FlowsheetValue
-            FROM Flowsheets
-            WHERE STUDYID = {}
-            AND FlowsheetDisplayName = {}""".format(subject_id, flowsheet_name)
-
-    cur.execute(sql)
-    data = cur.fetchall()
-    ##    if data:
-    ##        for item in data:
-    ##            print("found lab value")
-    ##            print(subject_id, item)
-    return data
-
-
-def lab(subject_id, conn, labcompname):
-    """Gets a lab value from the Lab table
-    Args:
-        subject_id (str): id of the subject
-        conn: (:obj: `database connectoin`): connection to the database that
-            contains the patient data
-        labcomname (str): the lab component you are searching for: Hematocrit
-
-    Returns:
-        :obj: `list` of :obj: `tuple`:
-           returns a list of tuples of any lab values found. Each tuple will
-           have the following information
-           lab_result (str): result of the lab
-           date_and_time (str): date and time lab was collected
-           lab_name (str): name of the lab - Complete Blood Count
-           component_name (str): component tested - Hematocrit
-    """
-
-    cur = conn.cursor()
-    sql = """SELECT ORD_VALUE, SPECIMN_TAKEN_TIME, RESULT_TIME, PROC_NAME, LabComponentName FROM LAB
-          WHERE STUDYID = {}
-          AND LabComponentName = {}""".format(subject_id, labcompname)
-    cur.execute(sql)
-    data = cur.fetchall()
-    ##    if data:
-    ##        for item in data:
-    ##            print("found lab value")
-    ##            print(subject_id, item)
-    return data
-
-
-def lab2(subject_id, conn, labcompnames):
-    """Gets a lab value from the lab table. Used when searchig for multiple lab
-    types.
-    Args:
-        subject_id (str): id of the subject
-        conn: (:obj: `database connectoin`): connection to the database that
-            contains the patient data
-        labcomname (str): the lab components you are searching for: PH, BUN
-
-    Returns:
-        :obj: `list` of :obj: `tuple`:
-           returns a list of tuples of any lab values found. Each tuple will
-           have the following information
-           lab_result (str): result of the lab
-           date_and_time (str): date and time lab was collected
-           lab_name (str): name of the lab - Complete Blood Count
-           component_name (str): component tested - Hematocrit
-    """
-
-    cur = conn.cursor()
-    sql = """SELECT ORD_VALUE, SPECIMN_TAKEN_TIME, RESULT_TIME, PROC_NAME, LabComponentName FROM LAB
-          WHERE STUDYID = {}
-          AND ({})""".format(subject_id, labcompnames)
-    cur.execute(sql)
-    data = cur.fetchall()
-    ##    if data:
-    ##        for item in data:
-    ##            print("found lab value")
-    ##            print(subject_id, item)
-    return data
-
+import json
+from collections import defaultdict
+
+# Statements the data pull runs, with ? placeholders for the values bound
+# when they run. The statement text never changes so sqlite3 reuses the
+# prepared statement from its cache instead of compiling a new one per call.
+STATEMENTS = {
+    'lab3': """SELECT ORD_VALUE, SPECIMN_TAKEN_TIME, RESULT_TIME, PROC_Name, LabComponentName FROM LAB
+          WHERE STUDYID = ?
+          AND PROC_NAME LIKE ?
+          ORDER BY rowid""",
+    # Enrollment has one visit per subject so visits are not told apart by CSN
+    'adt_subject': """SELECT STUDYID, NULL, ADT_ARRIVAL_TIME, ED_DEPARTURE_TIME, HOSP_ADMSN_TIME, EDDisposition
+          FROM DEMOGRAPHICS
+          WHERE STUDYID = ?
+          ORDER BY rowid""",
+    'adt_cohort': """SELECT STUDYID, NULL, ADT_ARRIVAL_TIME, ED_DEPARTURE_TIME, HOSP_ADMSN_TIME, EDDisposition
+          FROM DEMOGRAPHICS
+          WHERE STUDYID IN (SELECT STUDYID FROM STUDY_IDS_TO_PULL WHERE DataPullComplete = 'No')
+          ORDER BY rowid""",
+}
+
+# Tables whose rows of a subject are hashed into its fingerprint for the result
+# cache, so its cached output is only used while none of them changed
+FINGERPRINT_TABLES = ['DEMOGRAPHICS', 'Flowsheets', 'LAB', 'Medication', 'MedAdminName', 'Procedures', 'Diagnosis']
+# Increase whenever the extractors build different output from the same rows
+# so every cached output is pulled again. The queries, limits and REDCap
+# headers are hashed into the fingerprint as well.
+FINGERPRINT_VERSION = 1
+
+# Most results of each LAB category read up to discharge the extractors read,
+# None for all of them. Categories are set by CATEGORY_RULES in tablebuilder
+LAB_LIMITS = {
+    'flu_pcr': 4,
+    'other_resp_virus': None,
+}
+
+# Most discharge medications (Medication, Outpatient) of each class the
+# extractors read
+DISCHARGE_MEDICATION_LIMITS = {
+    'ANTIVIRALS': 2,
+    'ANTIBIOTICS': 2,
+}
+
+# Most ED medications (MedAdminName) of each class the extractors read, only
+# ones given by these routes are counted
+ED_MEDICATION_LIMITS = {
+    'ANTIVIRALS': 2,
+    'ANTIBIOTICS': 4,
+}
+ED_MEDICATION_ROUTES = ['IV', 'Intravenous', 'Oral', 'PO', 'IM', 'Intramuscular']
+
+# Parameters of the LAB, Medication and MedAdminName queries
+BOUND_PARAMETERS = {
+    'lab_limits': json.dumps(LAB_LIMITS),
+    'discharge_medication_limits': json.dumps(DISCHARGE_MEDICATION_LIMITS),
+    'ed_medication_limits': json.dumps(ED_MEDICATION_LIMITS),
+    'ed_medication_routes': json.dumps(ED_MEDICATION_ROUTES),
+}
+
+# Query for each table the data pull reads that gets all of a subject's rows
+# from it. Every row starts with its rowid so rows keep the order of the table.
+# Only the O2 Device rows are read from Flowsheets, the other vitals come from
+# FIRST_OBSERVATION_SQL. LAB, Medication and MedAdminName only return the rows
+# counted up to discharge, no more than each group's limit, plus the first row
+# of each group so the extractors can tell a group was found at all. Those
+# rows start with their rowid, group and a flag that is 1 if the row counts.
+SUBJECT_TABLE_SQL = {
+    'Flowsheets': """SELECT rowid, FlowsheetDisplayName, RECORDED_TIME, FlowsheetValue
+          FROM Flowsheets
+          WHERE STUDYID = :subject_id
+          AND FlowsheetDisplayName = 'O2 Device'
+          ORDER BY rowid""",
+    'LAB': """SELECT table_rowid, row_group, counted,
+          ORD_VALUE, SPECIMN_TAKEN_TIME, RESULT_TIME, PROC_NAME, LabComponentName
+          FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY row_group ORDER BY table_rowid) AS group_row,
+                SUM(counted) OVER (PARTITION BY row_group ORDER BY table_rowid) AS counted_row
+                FROM (SELECT t.rowid AS table_rowid, t.category AS row_group, l.value AS row_limit,
+                      t.SPECIMN_TAKEN_TIME <= :discharge_time AS counted,
+                      t.ORD_VALUE, t.SPECIMN_TAKEN_TIME, t.RESULT_TIME, t.PROC_NAME, t.LabComponentName
+                      FROM LAB t
+                      JOIN json_each(:lab_limits) l ON l.key = t.category
+                      WHERE t.STUDYID = :subject_id))
+          WHERE group_row = 1 OR (counted AND (row_limit IS NULL OR counted_row <= row_limit))
+          ORDER BY table_rowid""",
+    'Medication': """SELECT table_rowid, row_group, counted,
+          MedIndexName, TimeOrdered, MedRoute, THERACLASS, OrderingMode
+          FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY row_group ORDER BY table_rowid) AS group_row,
+                SUM(counted) OVER (PARTITION BY row_group ORDER BY table_rowid) AS counted_row
+                FROM (SELECT t.rowid AS table_rowid, t.THERACLASS AS row_group, l.value AS row_limit,
+                      t.TimeOrdered <= :discharge_time AS counted,
+                      t.MedIndexName, t.TimeOrdered, t.MedRoute, t.THERACLASS, t.OrderingMode
+                      FROM Medication t
+                      JOIN json_each(:discharge_medication_limits) l ON l.key = t.THERACLASS
+                      WHERE t.STUDYID = :subject_id
+                      AND t.OrderingMode = 'Outpatient'))
+          WHERE group_row = 1 OR (counted AND (row_limit IS NULL OR counted_row <= row_limit))
+          ORDER BY table_rowid""",
+    'MedAdminName': """SELECT table_rowid, row_group, counted,
+          MedIndexName, TimeActionTaken, MedRoute, THERACLASS
+          FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY row_group ORDER BY table_rowid) AS group_row,
+                SUM(counted) OVER (PARTITION BY row_group ORDER BY table_rowid) AS counted_row
+                FROM (SELECT t.rowid AS table_rowid, t.THERACLASS AS row_group, l.value AS row_limit,
+                      t.TimeActionTaken <= :discharge_time AND
+                      t.MedRoute IN (SELECT value FROM json_each(:ed_medication_routes)) AS counted,
+                      t.MedIndexName, t.TimeActionTaken, t.MedRoute, t.THERACLASS
+                      FROM MedAdminName t
+                      JOIN json_each(:ed_medication_limits) l ON l.key = t.THERACLASS
+                      WHERE t.STUDYID = :subject_id))
+          WHERE group_row = 1 OR (counted AND (row_limit IS NULL OR counted_row <= row_limit))
+          ORDER BY table_rowid""",
+    'Procedures': """SELECT rowid, PROC_NAME, ORDER_TIME, OrderStatus
+          FROM Procedures
+          WHERE STUDYID = :subject_id
+          AND OrderStatus = 'Completed'
+          AND category = 'chest_imaging'
+          ORDER BY rowid""",
+    'Diagnosis': """SELECT rowid, EpicInternalDiagnosisName
+          FROM Diagnosis
+          WHERE STUDYID = :subject_id
+          ORDER BY rowid""",
+}
+
+# Query for each table that gets the rows of every subject in STUDY_IDS_TO_PULL
+# whose data pull is not complete. Rows are grouped by linking log row, then
+# ordered like SUBJECT_TABLE_SQL, with the linking log rowid in front.
+COHORT_TABLE_SQL = {
+    'Flowsheets': """SELECT p.rowid, t.rowid, t.FlowsheetDisplayName, t.RECORDED_TIME, t.FlowsheetValue
+          FROM STUDY_IDS_TO_PULL p
+          JOIN Flowsheets t ON t.STUDYID = p.STUDYID
+          WHERE p.DataPullComplete = 'No'
+          AND t.FlowsheetDisplayName = 'O2 Device'
+          ORDER BY p.rowid, t.rowid""",
+    'LAB': """SELECT log_rowid, table_rowid, row_group, counted,
+          ORD_VALUE, SPECIMN_TAKEN_TIME, RESULT_TIME, PROC_NAME, LabComponentName
+          FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY log_rowid, row_group ORDER BY table_rowid) AS group_row,
+                SUM(counted) OVER (PARTITION BY log_rowid, row_group ORDER BY table_rowid) AS counted_row
+                FROM (SELECT p.rowid AS log_rowid, t.rowid AS table_rowid, t.category AS row_group,
+                      l.value AS row_limit, t.SPECIMN_TAKEN_TIME <= d.DischargeTime AS counted,
+                      t.ORD_VALUE, t.SPECIMN_TAKEN_TIME, t.RESULT_TIME, t.PROC_NAME, t.LabComponentName
+                      FROM STUDY_IDS_TO_PULL p
+                      JOIN DischargeTimes d ON d.LogRowid = p.rowid
+                      JOIN LAB t ON t.STUDYID = p.STUDYID
+                      JOIN json_each(:lab_limits) l ON l.key = t.category
+                      WHERE p.DataPullComplete = 'No'))
+          WHERE group_row = 1 OR (counted AND (row_limit IS NULL OR counted_row <= row_limit))
+          ORDER BY log_rowid, table_rowid""",
+    'Medication': """SELECT log_rowid, table_rowid, row_group, counted,
+          MedIndexName, TimeOrdered, MedRoute, THERACLASS, OrderingMode
+          FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY log_rowid, row_group ORDER BY table_rowid) AS group_row,
+                SUM(counted) OVER (PARTITION BY log_rowid, row_group ORDER BY table_rowid) AS counted_row
+                FROM (SELECT p.rowid AS log_rowid, t.rowid AS table_rowid, t.THERACLASS AS row_group,
+                      l.value AS row_limit, t.TimeOrdered <= d.DischargeTime AS counted,
+                      t.MedIndexName, t.TimeOrdered, t.MedRoute, t.THERACLASS, t.OrderingMode
+                      FROM STUDY_IDS_TO_PULL p
+                      JOIN DischargeTimes d ON d.LogRowid = p.rowid
+                      JOIN Medication t ON t.STUDYID = p.STUDYID
+                      JOIN json_each(:discharge_medication_limits) l ON l.key = t.THERACLASS
+                      WHERE p.DataPullComplete = 'No'
+                      AND t.OrderingMode = 'Outpatient'))
+          WHERE group_row = 1 OR (counted AND (row_limit IS NULL OR counted_row <= row_limit))
+          ORDER BY log_rowid, table_rowid""",
+    'MedAdminName': """SELECT log_rowid, table_rowid, row_group, counted,
+          MedIndexName, TimeActionTaken, MedRoute, THERACLASS
+          FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY log_rowid, row_group ORDER BY table_rowid) AS group_row,
+                SUM(counted) OVER (PARTITION BY log_rowid, row_group ORDER BY table_rowid) AS counted_row
+                FROM (SELECT p.rowid AS log_rowid, t.rowid AS table_rowid, t.THERACLASS AS row_group,
+                      l.value AS row_limit, t.TimeActionTaken <= d.DischargeTime AND
+                      t.MedRoute IN (SELECT value FROM json_each(:ed_medication_routes)) AS counted,
+                      t.MedIndexName, t.TimeActionTaken, t.MedRoute, t.THERACLASS
+                      FROM STUDY_IDS_TO_PULL p
+                      JOIN DischargeTimes d ON d.LogRowid = p.rowid
+                      JOIN MedAdminName t ON t.STUDYID = p.STUDYID
+                      JOIN json_each(:ed_medication_limits) l ON l.key = t.THERACLASS
+                      WHERE p.DataPullComplete = 'No'))
+          WHERE group_row = 1 OR (counted AND (row_limit IS NULL OR counted_row <= row_limit))
+          ORDER BY log_rowid, table_rowid""",
+    'Procedures': """SELECT p.rowid, t.rowid, t.PROC_NAME, t.ORDER_TIME, t.OrderStatus
+          FROM STUDY_IDS_TO_PULL p
+          JOIN Procedures t ON t.STUDYID = p.STUDYID
+          WHERE p.DataPullComplete = 'No'
+          AND t.OrderStatus = 'Completed'
+          AND t.category = 'chest_imaging'
+          ORDER BY p.rowid, t.rowid""",
+    'Diagnosis': """SELECT p.rowid, t.rowid, t.EpicInternalDiagnosisName
+          FROM STUDY_IDS_TO_PULL p
+          JOIN Diagnosis t ON t.STUDYID = p.STUDYID
+          WHERE p.DataPullComplete = 'No'
+          ORDER BY p.rowid, t.rowid""",
+}
+
+# Flowsheet names of the vitals whose first recorded value is used
+FIRST_VITALS = ['Temp', 'Resp', 'BP', 'Pulse', 'SpO2']
+
+# LAB categories whose first result is used
+FIRST_LABS = ['ph', 'bun', 'sodium', 'glucose', 'hematocrit']
+
+# Queries that get only the earliest row of each measure of a subject, or of
+# every subject in STUDY_IDS_TO_PULL whose data pull is not complete. ?1 is a JSON object
+# of the flowsheet names or LAB categories to search for and the measure each
+# belongs to. Times are stored as YYYY-MM-DD HH:MM:SS so they sort in time
+# order, ties go to the first row.
+FIRST_OBSERVATION_SQL = {
+    'subject_vitals': """SELECT STUDYID, measure, FlowsheetDisplayName, RECORDED_TIME, FlowsheetValue
+          FROM (SELECT t.STUDYID, m.value AS measure,
+                t.FlowsheetDisplayName, t.RECORDED_TIME, t.FlowsheetValue,
+                ROW_NUMBER() OVER (PARTITION BY t.STUDYID, m.value
+                ORDER BY t.RECORDED_TIME, t.rowid) AS observation
+                FROM Flowsheets t
+                JOIN json_each(?1) m ON m.key = t.FlowsheetDisplayName
+                WHERE t.STUDYID = ?2)
+          WHERE observation = 1""",
+    'subject_labs': """SELECT STUDYID, measure,
+          ORD_VALUE, SPECIMN_TAKEN_TIME, RESULT_TIME, PROC_NAME, LabComponentName
+          FROM (SELECT t.STUDYID, m.value AS measure,
+                t.ORD_VALUE, t.SPECIMN_TAKEN_TIME, t.RESULT_TIME, t.PROC_NAME, t.LabComponentName,
+                ROW_NUMBER() OVER (PARTITION BY t.STUDYID, m.value
+                ORDER BY t.SPECIMN_TAKEN_TIME, t.rowid) AS observation
+                FROM LAB t
+                JOIN json_each(?1) m ON m.key = t.category
+                WHERE t.STUDYID = ?2)
+          WHERE observation = 1""",
+    'cohort_vitals': """SELECT STUDYID, measure, FlowsheetDisplayName, RECORDED_TIME, FlowsheetValue
+          FROM (SELECT p.STUDYID, m.value AS measure,
+                t.FlowsheetDisplayName, t.RECORDED_TIME, t.FlowsheetValue,
+                ROW_NUMBER() OVER (PARTITION BY p.rowid, m.value
+                ORDER BY t.RECORDED_TIME, t.rowid) AS observation
+                FROM STUDY_IDS_TO_PULL p
+                JOIN Flowsheets t ON t.STUDYID = p.STUDYID
+                JOIN json_each(?1) m ON m.key = t.FlowsheetDisplayName
+                WHERE p.DataPullComplete = 'No')
+          WHERE observation = 1""",
+    'cohort_labs': """SELECT STUDYID, measure,
+          ORD_VALUE, SPECIMN_TAKEN_TIME, RESULT_TIME, PROC_NAME, LabComponentName
+          FROM (SELECT p.STUDYID, m.value AS measure,
+                t.ORD_VALUE, t.SPECIMN_TAKEN_TIME, t.RESULT_TIME, t.PROC_NAME, t.LabComponentName,
+                ROW_NUMBER() OVER (PARTITION BY p.rowid, m.value
+                ORDER BY t.SPECIMN_TAKEN_TIME, t.rowid) AS observation
+                FROM STUDY_IDS_TO_PULL p
+                JOIN LAB t ON t.STUDYID = p.STUDYID
+                JOIN json_each(?1) m ON m.key = t.category
+                WHERE p.DataPullComplete = 'No')
+          WHERE observation = 1""",
+}
 
 def lab3(subject_id, conn, searchtext):
     """Gets a lab value from the labs table. Used when searching for labs by a
@@ -175,10 +262,7 @@ def lab3(subject_id, conn, searchtext):
            component_name (str): component tested - Hematocrit
     """
     cur = conn.cursor()
-    sql = """SELECT ORD_VALUE, SPECIMN_TAKEN_TIME, RESULT_TIME, PROC_Name, LabComponentName FROM LAB
-          WHERE STUDYID = {}
-          AND PROC_NAME LIKE {}""".format(subject_id, searchtext)
-    cur.execute(sql)
+    cur.execute(STATEMENTS['lab3'], (subject_id, searchtext))
     data = cur.fetchall()
     ##    if data:
     ##        for item in data:
@@ -187,143 +271,76 @@ def lab3(subject_id, conn, searchtext):
     return data
 
 
-def medication(subject_id, conn, theraclass, orderingmode):
-    """Gets medication information from the medication table
-    Args:
-        subject_id (str): the id of the subject
-        conn: (:obj: `database connection`): connection to the database that
-            contains the data
-        theraclass (str): the class of the medication - ANTIVAL, ATIBIOTIC, etc
-        orderingmode (str): discharge medication or ordered while in hospital
-
-    Returns:
-        :obj: `list` of :obj: `tuple`:
-           returns a list of tuples of any medications found. Each tuple will
-           have the following information
-           name (str): medication name
-           date_and_time (str): date and time lab was collected
-           route (str): medication admin route - oral ,IV, IM
-           theraclass (str): the class of the medication - ANTIVAL, ATIBIOTIC
-               , etc
-           orderingmode (str): tells if discharge medication or ordered while in
-               hospital
-    """
-    cur = conn.cursor()
-    sql = """SELECT MedIndexName, TimeOrdered, MedRoute, THERACLASS,
-          OrderingMode FROM Medication
-          WHERE STUDYID = {} AND THERACLASS = {}
-          AND OrderingMode = {}""".format(
-        subject_id, theraclass, orderingmode)
-    cur.execute(sql)
-    data = cur.fetchall()
-    ##    if data:
-    ##        for item in data:
-    ##            print("found medication")
-    ##            print(subject_id, item)
-    return data
-
-
-def medication2(subject_id, conn, theraclass):
-    """Gets medication information for meds givven in hospital from the medication table
+def adt_rows(conn, subject_id=None):
+    """Gets the arrival, departure, admission and disposition columns of the
+    demographics table in one query, for every visit of one subject or of
+    every subject in STUDY_IDS_TO_PULL whose data pull is not complete
     Args:
-        subject_id (str): the id of the subject
-        conn: (:obj: `database connection`): connection to the database that
-            contains the data
-        theraclass (str): the class of the medication - ANTIVAL, ATIBIOTIC, etc
+        conn (:obj: `database connection`): connection to the database that
+            contains the patient data
+        subject_id (str): id of the subject to get, defaults to the whole
+            cohort
 
     Returns:
-        :obj: `list` of :obj: `tuple`:
-           returns a list of tuples of any medications found. Each tuple will
-           have the following information
-           name (str): medication name
-           date_and_time (str): date and time lab was collected
-           route (str): medication admin route - oral ,IV, IM
+        :obj: `list` of :obj: `tuple`: STUDYID, CSN, arrival time, departure
+            time, admission time and disposition of each visit in table order
     """
     cur = conn.cursor()
-    sql = """SELECT MedIndexName, TimeActionTaken, MedRoute
-          FROM MedAdminName
-          WHERE STUDYID = {} AND THERACLASS = {}""".format(
-        subject_id, theraclass)
-    cur.execute(sql)
-    data = cur.fetchall()
-    ##    if data:
-    ##        for item in data:
-    ##            print("found medication")
-    ##            print(subject_id, item)
-    return data
+    if subject_id is None:
+        cur.execute(STATEMENTS['adt_cohort'])
+    else:
+        cur.execute(STATEMENTS['adt_subject'], (subject_id,))
+    return cur.fetchall()
 
 
-def chest_imaging(subject_id, conn):
-    """Gets imaging information from the procedures table
+def first_observations(conn, subject_id=None):
+    """Gets the first recorded value of each vital in FIRST_VITALS and the
+    first result of each lab in FIRST_LABS, for one subject or for every
+    subject in STUDY_IDS_TO_PULL whose data pull is not complete. SQLite picks
+    the earliest row of each measure so only that row is read.
     Args:
-        subject_id (str): the id of the subject whose data you are searching for
         conn (:obj: `database connection`): connection to the database that
             contains the patient data
+        subject_id (str): id of the subject to get, defaults to the whole
+            cohort
+
     Returns:
-        :obj: `list` of :obj: `tuples`:
-        returns alist of tuples of any imaging found with the follwing data
-        name (str): name of the imaging
-        date_time (str): time imaging was ordered
-        status (str): if imaging was completed or cancelled
+        :obj: `dict`: for each STUDYID, a :obj: `dict` of the first row of
+            each measure found. Vitals rows are name, date and time, and
+            value, lab rows are result, collect time, result time, lab name
+            and component name
     """
-
+    measures = {'vitals': {name: name for name in FIRST_VITALS},
+                'labs': {category: category for category in FIRST_LABS}}
+    observations = defaultdict(dict)
     cur = conn.cursor()
-    sql = r"""SELECT PROC_NAME, ORDER_TIME, OrderStatus FROM Procedures
-          WHERE STUDYID = {} AND (PROC_NAME LIKE '%CT%'
-          OR PROC_NAME LIKE'%XR%')
-          AND OrderStatus = 'Completed'""".format(subject_id)
-    cur.execute(sql)
-    data = cur.fetchall()
-    ##    if data:
-    ##        for item in data:
-    ##            print("found chest imaging")
-    ##            print(subject_id, item)
-    return data
-
-
-def final_diagnoses(subject_id, conn):
-    """Gets diagnosis information from the Diagnosis table
+    for kind, names in measures.items():
+        if subject_id is None:
+            cur.execute(FIRST_OBSERVATION_SQL['cohort_' + kind], (json.dumps(names),))
+        else:
+            cur.execute(FIRST_OBSERVATION_SQL['subject_' + kind], (json.dumps(names), subject_id))
+        for row in cur:
+            observations[row[0]][row[1]] = row[2:]
+    return dict(observations)
+
+
+def subject_rows(subject_id, conn, discharge_time):
+    """Gets all of a subject's rows from each table the data pull reads, with
+    one query per table
     Args:
         subject_id (str): the id of the subject whose data you are searching for
         conn (:obj: `database connection`): connection to the database that
             contains the patient data
+        discharge_time (str): the subject's discharge time, rows after it are
+            not counted
+
     Returns:
-        :obj: `list` of :obj: `tuples`:
-        returns alist of tuples of any diagnosis found with the follwing data
-        name (str): name of the diagnosis
+        :obj: `dict`: list of row tuples for each table in SUBJECT_TABLE_SQL
     """
-
+    parameters = dict(BOUND_PARAMETERS, subject_id=subject_id, discharge_time=discharge_time)
     cur = conn.cursor()
-    sql = """SELECT EpicInternalDiagnosisName FROM Diagnosis
-          WHERE STUDYID = {}""".format(subject_id)
-    cur.execute(sql)
-    data = cur.fetchall()
-    ##    if data:
-    ##        for item in data:
-    ##            print("found diagnoses")
-    ##            print(subject_id, item)
-    return data
-
-
-def main():
-    conn = sqlite3.connect(r"\\win.ad.jhu.edu\cloud\sddesktop$\CEIRS\CEIRS.db")
-    # Get subject IDs
-    cur = conn.cursor()
-    sql = """SELECT DISTINCT STUDYID FROM DEMOGRAPHICS"""
-    cur.execute(sql)
-    subject_ids = cur.fetchall()
-    for subject_id in subject_ids:
-        subject_id = "'{}'".format(subject_id[0])
-        ##        print(arrival_date_time(subject_id, conn))
-        ##        print(discharge_date_time(subject_id, conn))
-        ##        print(lab(subject_id, conn, "'PH SPECIMEN'"))
-        ##        print(medication(subject_id, conn, "'ANTIBIOTICS'","'Inpatient'"))
-        ##        print(chest_imaging(subject_id, conn))
-        ##        print(final_diagnoses(subject_id, conn))
-        print(vitals(subject_id, conn, "'O2 Device'"), "o2 device")
-
-    conn.close()
-
-
-if __name__ == "__main__":
-    main()
+    table_rows = dict()
+    for table_title, sql in SUBJECT_TABLE_SQL.items():
+        cur.execute(sql, parameters)
+        table_rows[table_title] = cur.fetchall()
+    return table_rows
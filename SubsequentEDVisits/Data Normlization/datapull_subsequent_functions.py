@@ -1,19 +1,15 @@
-import datapull_subsequent_sql as ed
-from datapull_subsequent_classes import ADT, Vitals, Lab, Medication, Medication2, Imaging
+from Common.datapullclasses import Vitals, Lab, Medication, Medication2, Imaging
 from collections import defaultdict
-from datetime import datetime
 
 
-def get_arrival_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn):
+def get_arrival_info(coordinator, redcap_label, redcap_raw, bundle):
     """Stores subjects arrival info in dictionaies to use for file writing
     Args:
         coordinator (:obj: `OrderedDefaultDict`): collection of coordinator readable data
             to write to file
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
 
     Returns:
         :obj: `OrderedDefaultDict`):
@@ -21,7 +17,7 @@ def get_arrival_info(coordinator, redcap_label, redcap_raw, subject_id, csn, con
         contain data to write to file
     """
 
-    arrival_info = ADT(*ed.arrival_date_time(subject_id, csn, conn))
+    arrival_info = bundle.arrival_info
     coordinator['Arrival Date'] = arrival_info.date
     coordinator['Arrival Time'] = arrival_info.time
     redcap_label['edsubshart_arrivaldate'] = arrival_info.date
@@ -32,23 +28,21 @@ def get_arrival_info(coordinator, redcap_label, redcap_raw, subject_id, csn, con
     return coordinator, redcap_label, redcap_raw
 
 
-def get_discharge_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn):
+def get_discharge_info(coordinator, redcap_label, redcap_raw, bundle):
     """Stores subjects discharge info in dictionaies to use for file writing
     Args:
         coordinator (:obj: `OrderedDefaultDict`): collection of coordinator readable data
             to write to file
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
 
     Returns:
         :obj: `OrderedDefaultDict`):
         returns two ordered default dictionaries - coordinator and redcap_label that
         contain data to write to file
     """
-    discharge_info = ADT(*ed.discharge_date_time(subject_id, csn, conn))
+    discharge_info = bundle.discharge_info
     coordinator['Discharge Date'] = discharge_info.date
     coordinator['Discharge Time'] = discharge_info.time
     redcap_label['edsubshart_departtime'] = discharge_info.time[:5]
@@ -59,23 +53,21 @@ def get_discharge_info(coordinator, redcap_label, redcap_raw, subject_id, csn, c
     return coordinator, redcap_label, redcap_raw
 
 
-def get_dispo_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn):
+def get_dispo_info(coordinator, redcap_label, redcap_raw, bundle):
     """Stores subjects disposition info in dictionaies to use for file writing
     Args:
         coordinator (:obj: `OrderedDefaultDict`): collection of coordinator readable data
             to write to file
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
 
     Returns:
         :obj: `OrderedDefaultDict`):
         returns two ordered default dictionaries - coordinator and redcap_label that
         contain data to write to file
     """
-    dispo_info = ADT(*ed.arrival_date_time(subject_id, csn, conn))
+    dispo_info = bundle.arrival_info
     coordinator['Disposition'] = dispo_info.dispo
     if dispo_info.dispo == "Discharge":
         redcap_label['edsubshart_dispo'] = dispo_info.dispo
@@ -104,29 +96,24 @@ def get_dispo_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn)
     return coordinator, redcap_label, redcap_raw
 
 
-def get_vitals_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn):
+def get_vitals_info(coordinator, redcap_label, redcap_raw, bundle):
     """Stores subjects vitals info in dictionaies to use for file writing
     Args:
         coordinator (:obj: `OrderedDefaultDict`): collection of coordinator readable data
             to write to file
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
 
     Returns:
         :obj: `OrderedDefaultDict`):
         returns two ordered default dictionaries - coordinator and redcap_label that
         contain data to write to file
     """
-    # Function to find minimums
-    min_lab = lambda x: datetime.strptime(x[1], '%Y-%m-%d %H:%M:%S')
-
     # Temp
-    temp = ed.vitals(subject_id, csn, conn, "'Temp'")
+    temp = bundle.first_observation('Temp')
     if temp:
-        temp = min(temp, key=min_lab)[2]
+        temp = temp[2]
         coordinator['temp'] = temp
         redcap_label['edsubshart_temperature'] = temp
         redcap_raw['edsubshart_temperature'] = temp
@@ -135,9 +122,9 @@ def get_vitals_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn
         redcap_label['edsubshart_temperature'] = 'Not Recorded'
         redcap_raw['edsubshart_temperature'] = '999'
     # Resp
-    resp = ed.vitals(subject_id, csn, conn, "'Resp'")
+    resp = bundle.first_observation('Resp')
     if resp:
-        resp = min(resp, key=min_lab)[2]
+        resp = resp[2]
         coordinator['resp'] = resp
         redcap_label['edsubshart_respiratoryrate'] = resp
         redcap_raw['edsubshart_respiratoryrate'] = resp
@@ -146,9 +133,9 @@ def get_vitals_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn
         redcap_label['edsubshart_respiratoryrate'] = 'Not Recorded'
         redcap_raw['edsubshart_respiratoryrate'] = '999'
     # Blood Pressure
-    bp = ed.vitals(subject_id, csn, conn, "'BP'")
+    bp = bundle.first_observation('BP')
     if bp:
-        bp = min(bp, key=min_lab)[2]
+        bp = bp[2]
         bp = bp.split("/")[0]
         coordinator['bp'] = bp
         redcap_label['edsubshart_systolicbloodpressure'] = bp
@@ -158,9 +145,9 @@ def get_vitals_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn
         redcap_label['edsubshart_systolicbloodpressure'] = 'Not Recorded'
         redcap_raw['edsubshart_systolicbloodpressure'] = '999'
     # Pulse
-    pulse = ed.vitals(subject_id, csn, conn, "'Pulse'")
+    pulse = bundle.first_observation('Pulse')
     if pulse:
-        pulse = min(pulse, key=min_lab)[2]
+        pulse = pulse[2]
         coordinator['pulse'] = pulse
         redcap_label['edsubshart_pulse'] = pulse
         redcap_raw['edsubshart_pulse'] = pulse
@@ -169,9 +156,9 @@ def get_vitals_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn
         redcap_label['edsubshart_pulse'] = 'Not Recorded'
         redcap_raw['edsubshart_pulse'] = '999'
     # O2 SAT
-    oxygen_sat = ed.vitals(subject_id, csn, conn, "'SpO2'")
+    oxygen_sat = bundle.first_observation('SpO2')
     if oxygen_sat:
-        oxygen_sat = min(oxygen_sat, key=min_lab)[2]
+        oxygen_sat = oxygen_sat[2]
         coordinator['Oxgyen Saturation'] = oxygen_sat
         redcap_label['edsubshart_o2sat'] = oxygen_sat
         redcap_raw['edsubshart_o2sat'] = oxygen_sat
@@ -183,16 +170,14 @@ def get_vitals_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn
     return coordinator, redcap_label, redcap_raw
 
 
-def get_oxygen_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn):
+def get_oxygen_info(coordinator, redcap_label, redcap_raw, bundle):
     """Stores subjects oxygen info in dictionaies to use for file writing
     Args:
         coordinator (:obj: `OrderedDefaultDict`): collection of coordinator readable data
             to write to file
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
 
     Returns:
         :obj: `OrderedDefaultDict`):
@@ -200,7 +185,7 @@ def get_oxygen_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn
         contain data to write to file
     """
     # Find relevant O2 devices
-    oxygen_info = ed.vitals(subject_id, csn, conn, "'O2 Device'")
+    oxygen_info = bundle.vitals('O2 Device')
     # Find all oxygen values
     oxygen_type_codes = {'Nasal cannula': "1",
                          'High flow nasal cannula': '1',
@@ -239,16 +224,14 @@ def get_oxygen_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn
     return coordinator, redcap_label, redcap_raw
 
 
-def get_lab_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn):
+def get_lab_info(coordinator, redcap_label, redcap_raw, bundle):
     """Stores subjects arrival info in dictionaies to use for file writing
     Args:
         coordinator (:obj: `OrderedDefaultDict`): collection of coordinator readable data
             to write to file
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
         data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
 
     Returns:
         :obj: `OrderedDefaultDict`):
@@ -256,12 +239,10 @@ def get_lab_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn):
         contain data to write to file
     """
 
-    # Function to find minimums
-    min_lab = lambda x: datetime.strptime(x[1], '%Y-%m-%d %H:%M:%S')
     # PH
-    ph = ed.lab(subject_id, csn, conn, "'PH SPECIMEN'")
-    if ph and min(ph, key=min_lab)[0] != 'see below':
-        ph = min(ph, key=min_lab)[0]
+    ph = bundle.first_observation('ph')
+    if ph and ph[0] != 'see below':
+        ph = ph[0]
         coordinator['ph'] = ph
         redcap_label['edsubshart_ph'] = ph
         redcap_raw['edsubshart_ph'] = ph
@@ -270,11 +251,9 @@ def get_lab_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn):
         redcap_label['edsubshart_ph'] = 'Not Done'
         redcap_raw['edsubshart_ph'] = '999'
     # BUN
-    bun_compnames = """LabComponentName = 'BLOOD UREA NITROGEN'
-                    OR LabComponentName = 'UREA NITROGEN'"""
-    bun = ed.lab2(subject_id, csn, conn, bun_compnames)
-    if bun and min(bun, key=min_lab)[0] != 'see below':
-        bun = min(bun, key=min_lab)[0]
+    bun = bundle.first_observation('bun')
+    if bun and bun[0] != 'see below':
+        bun = bun[0]
         coordinator['bun'] = bun
         redcap_label['edsubshart_bun'] = bun
         redcap_raw['edsubshart_bun'] = bun
@@ -283,9 +262,9 @@ def get_lab_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn):
         redcap_label['edsubshart_bun'] = 'Not Done'
         redcap_raw['edsubshart_bun'] = '999'
     # Sodium
-    sodium = ed.lab(subject_id, csn, conn, "'SODIUM'")
-    if sodium and min(sodium, key=min_lab)[0] != 'see below':
-        sodium = min(sodium, key=min_lab)[0]
+    sodium = bundle.first_observation('sodium')
+    if sodium and sodium[0] != 'see below':
+        sodium = sodium[0]
         coordinator['sodium'] = sodium
         redcap_label['edsubshart_sodium'] = sodium
         redcap_raw['edsubshart_sodium'] = sodium
@@ -294,9 +273,9 @@ def get_lab_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn):
         redcap_label['edsubshart_sodium'] = 'Not Done'
         redcap_raw['edsubshart_sodium'] = '999'
     # Glucose
-    glucose = ed.lab(subject_id, csn, conn, "'GLUCOSE'")
-    if glucose and min(glucose, key=min_lab)[0] != 'see below':
-        glucose = min(glucose, key=min_lab)[0]
+    glucose = bundle.first_observation('glucose')
+    if glucose and glucose[0] != 'see below':
+        glucose = glucose[0]
         coordinator['glucose'] = glucose
         redcap_label['edsubshart_glucose'] = glucose
         redcap_raw['edsubshart_glucose'] = glucose
@@ -305,9 +284,9 @@ def get_lab_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn):
         redcap_label['edsubshart_glucose'] = 'Not Done'
         redcap_raw['edsubshart_glucose'] = '999'
     # Hematocrit
-    hematocrit = ed.lab(subject_id, csn, conn, "'HEMATOCRIT'")
-    if hematocrit and min(hematocrit, key=min_lab)[0] != 'see below':
-        hematocrit = min(hematocrit, key=min_lab)[0]
+    hematocrit = bundle.first_observation('hematocrit')
+    if hematocrit and hematocrit[0] != 'see below':
+        hematocrit = hematocrit[0]
         coordinator['hematocrit'] = hematocrit
         redcap_label['edsubshart_hematocrit'] = hematocrit
         redcap_raw['edsubshart_hematocrit'] = hematocrit
@@ -318,16 +297,14 @@ def get_lab_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn):
     return coordinator, redcap_label, redcap_raw
 
 
-def get_flutesting_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn, dc_time):
+def get_flutesting_info(coordinator, redcap_label, redcap_raw, bundle, dc_time):
     """Stores subjects flu testing info in dictionaies to use for file writing
     Args:
         coordinator (:obj: `OrderedDefaultDict`): collection of coordinator readable data
             to write to file
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
             data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
         dc_time (str): subjects discharge time
 
     Returns:
@@ -336,52 +313,47 @@ def get_flutesting_info(coordinator, redcap_label, redcap_raw, subject_id, csn,
         contain data to write to file
     """
     # Influenza Testing
-    influenza_compnames = """LabComponentName = 'INFLUENZA A NAT'
-                  OR LabComponentName = 'INFLUENZA B NAT'
-                  OR LabComponentName = 'INFLUENZA A PCR'
-                  OR LabComponentName = 'INFLUENZA B PCR'"""
-    influneza_tests = ed.lab2(subject_id, csn, conn, influenza_compnames)
+    influneza_tests = bundle.labs('flu_pcr')
     influenza_testing = defaultdict(str)
-    if influneza_tests:
+    if bundle.found('LAB', 'flu_pcr'):
         influenza_count = 0
         for test_result in influneza_tests:
             influenza_lab = Lab(*test_result)
-            if influenza_lab.check_time(dc_time) is True:
-                influenza_count += 1
-                if influenza_count < 5:
-                    # Find first test for patien
-                    redcap_label['edsubshart_flutest'] = 'Yes'
-                    redcap_raw['edsubshart_flutest'] = '1'
-                    # Record Number of Influenza Test Done
-                    redcap_label['edsubshart_numberflutests'] = influenza_count
-                    redcap_raw['edsubshart_numberflutests'] = influenza_count
-                if influenza_count >= 5:
-                    break
-                result = influenza_lab.value
-                test_name = influenza_lab.labname
-                result_type = influenza_lab.componentname
-                collect_time = influenza_lab.collect_date_time
-                result_time = influenza_lab.result_date_time
-                if result in ('No RNA Detected', 'No DNA Detected'):
-                    result = 'negative'
-                if result in ('DNA Detected', 'RNA Detected'):
-                    result = "{} {}".format(result_type, result)
-                result_id = "{}|{}|{}".format(test_name, collect_time, result_time)
-                # Negative Results
-                if result == 'negative':
-                    if not influenza_testing.get(result_id):
-                        influenza_testing[result_id] = result
-                        continue
-                    if influenza_testing[result_id] != 'negative':
-                        continue
-                # Positive Results
-                if result:
-                    if influenza_testing.get(result_id) == 'negative':
-                        influenza_testing[result_id] = result
-                        continue
-                    else:
-                        influenza_testing[result_id] += "{}".format(result)
-                        continue
+            influenza_count += 1
+            if influenza_count < 5:
+                # Find first test for patien
+                redcap_label['edsubshart_flutest'] = 'Yes'
+                redcap_raw['edsubshart_flutest'] = '1'
+                # Record Number of Influenza Test Done
+                redcap_label['edsubshart_numberflutests'] = influenza_count
+                redcap_raw['edsubshart_numberflutests'] = influenza_count
+            if influenza_count >= 5:
+                break
+            result = influenza_lab.value
+            test_name = influenza_lab.labname
+            result_type = influenza_lab.componentname
+            collect_time = influenza_lab.collect_date_time
+            result_time = influenza_lab.result_date_time
+            if result in ('No RNA Detected', 'No DNA Detected'):
+                result = 'negative'
+            if result in ('DNA Detected', 'RNA Detected'):
+                result = "{} {}".format(result_type, result)
+            result_id = "{}|{}|{}".format(test_name, collect_time, result_time)
+            # Negative Results
+            if result == 'negative':
+                if not influenza_testing.get(result_id):
+                    influenza_testing[result_id] = result
+                    continue
+                if influenza_testing[result_id] != 'negative':
+                    continue
+            # Positive Results
+            if result:
+                if influenza_testing.get(result_id) == 'negative':
+                    influenza_testing[result_id] = result
+                    continue
+                else:
+                    influenza_testing[result_id] += "{}".format(result)
+                    continue
 
         # Write Influenza Results to file
         influenza_count = 0
@@ -431,7 +403,7 @@ def get_flutesting_info(coordinator, redcap_label, redcap_raw, subject_id, csn,
     return coordinator, redcap_label, redcap_raw
 
 
-def get_othervir_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn, dc_time):
+def get_othervir_info(coordinator, redcap_label, redcap_raw, bundle, dc_time):
     """Stores subjects other virus info in dictionaies to use for file
     writing
     
@@ -440,9 +412,7 @@ def get_othervir_info(coordinator, redcap_label, redcap_raw, subject_id, csn, co
             to write to file
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
             data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
         dc_time (str): subjects discharge time
 
     Returns:
@@ -451,48 +421,36 @@ def get_othervir_info(coordinator, redcap_label, redcap_raw, subject_id, csn, co
         contain data to write to file
     """
     # Other Virus Testing
-    othervirus_compnames = """LabComponentName = 'PARAINFLUENZAE 3 NAT'
-                  OR LabComponentName = 'ADENOVIRUS NAT'
-                  OR LabComponentName = 'RHINOVIRUS NAT'
-                  OR LabComponentName = 'PARAINFLUENZAE 2 NAT'
-                  OR LabComponentName = 'METAPNEUMO NAT'
-                  OR LabComponentName = 'RSV NAT'
-                  OR LabComponentName = 'ADENOVIRUS PCR'
-                  OR LabComponentName = 'RHINOVIRUS PCR'
-                  OR LabComponentName = 'PARAINFLUENZAE 2 PCR'
-                  OR LabComponentName = 'METAPNEUMOVIRUS PCR'
-                  OR LabComponentName = 'RSV PCR'"""
-    other_virus_tests = ed.lab2(subject_id, csn, conn, othervirus_compnames)
-    if other_virus_tests:
+    other_virus_tests = bundle.labs('other_resp_virus')
+    if bundle.found('LAB', 'other_resp_virus'):
         othervirus_testing = defaultdict(str)
         for test_result in other_virus_tests:
             othervirus_lab = Lab(*test_result)
-            if othervirus_lab.check_time(dc_time) is True:
-                redcap_label['edsubshart_otherrespviruses'] = 'Yes'
-                redcap_raw['edsubshart_otherrespviruses'] = '1'
-                result = othervirus_lab.value
-                result_time = othervirus_lab.collect_date_time
-                result_type = othervirus_lab.componentname
-                if result in ('No RNA Detected', 'No DNA Detected'):
-                    result = 'negative'
-                if result in ('DNA Detected', 'RNA Detected'):
-                    result = result_type + " {}".format(result)
-                result_id = "{}|{}".format(result_type, result_time)
-                # Negative Results
-                if result == 'negative':
-                    if not othervirus_testing.get(result_id):
-                        othervirus_testing[result_id] = result
-                        continue
-                    if othervirus_testing[result_id] != 'negative':
-                        continue
-                # Positive Results
-                if result:
-                    if othervirus_testing.get(result_id) == 'negative':
-                        othervirus_testing[result_id] = result
-                        continue
-                    else:
-                        othervirus_testing[result_id] += " {}".format(result)
-                        continue
+            redcap_label['edsubshart_otherrespviruses'] = 'Yes'
+            redcap_raw['edsubshart_otherrespviruses'] = '1'
+            result = othervirus_lab.value
+            result_time = othervirus_lab.collect_date_time
+            result_type = othervirus_lab.componentname
+            if result in ('No RNA Detected', 'No DNA Detected'):
+                result = 'negative'
+            if result in ('DNA Detected', 'RNA Detected'):
+                result = result_type + " {}".format(result)
+            result_id = "{}|{}".format(result_type, result_time)
+            # Negative Results
+            if result == 'negative':
+                if not othervirus_testing.get(result_id):
+                    othervirus_testing[result_id] = result
+                    continue
+                if othervirus_testing[result_id] != 'negative':
+                    continue
+            # Positive Results
+            if result:
+                if othervirus_testing.get(result_id) == 'negative':
+                    othervirus_testing[result_id] = result
+                    continue
+                else:
+                    othervirus_testing[result_id] += " {}".format(result)
+                    continue
 
         # Write Other Virus Tested Results to file
         for othervirus_result_name, othervirus_result in othervirus_testing.items():
@@ -525,7 +483,7 @@ def get_othervir_info(coordinator, redcap_label, redcap_raw, subject_id, csn, co
     return coordinator, redcap_label, redcap_raw
 
 
-def get_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn, dc_time):
+def get_antiviral_info(coordinator, redcap_label, redcap_raw, bundle, dc_time):
     """Stores subjects antiviral info in dictionaies to use for file
     writing
     
@@ -534,9 +492,7 @@ def get_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, csn, c
             to write to file
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
             data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
         dc_time (str): subjects discharge time
 
     Returns:
@@ -546,9 +502,8 @@ def get_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, csn, c
     """
     # ED Antivirals
     ed_antiviral_count = 0
-    ed_antivirals = ed.medication2(
-        subject_id, csn, conn, "'ANTIVIRALS'")
-    if ed_antivirals:
+    ed_antivirals = bundle.medication2('ANTIVIRALS')
+    if bundle.found('MedAdminName', 'ANTIVIRALS'):
         med_route_codes = {'IV': '3',
                            'Intravenous': '3',
                            'Oral': '1',
@@ -561,7 +516,7 @@ def get_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, csn, c
             antiviral_lab = Medication2(*antiviral)
             med_route = antiviral_lab.route
             # Skip meds without proper routes and give after dishcarge from the ED
-            if antiviral_lab.check_time(dc_time) is True and med_route_codes.get(med_route):
+            if med_route_codes.get(med_route):
                 ed_antiviral_count += 1
                 if ed_antiviral_count < 3:
                     redcap_label['edsubshart_antiviral'] = 'Yes'
@@ -593,7 +548,7 @@ def get_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, csn, c
     return coordinator, redcap_label, redcap_raw
 
 
-def get_dc_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn, dc_time, dispo):
+def get_dc_antiviral_info(coordinator, redcap_label, redcap_raw, bundle, dc_time, dispo):
     """Stores subjects discharge antiviral info in dictionaies to use for file
     writing
     
@@ -602,9 +557,7 @@ def get_dc_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, csn
             to write to file
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
             data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
         dc_time (str): subjects discharge time
         dispo (str): subjects final disposition
 
@@ -620,28 +573,26 @@ def get_dc_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, csn
 
     # Discharge Antivirals
     discharge_antiviral_count = 0
-    discharge_antivirals = ed.medication(
-        subject_id, csn, conn, "'ANTIVIRALS'", "'Outpatient'")
-    if discharge_antivirals:
+    discharge_antivirals = bundle.medication('ANTIVIRALS')
+    if bundle.found('Medication', 'ANTIVIRALS'):
 
         for antiviral in discharge_antivirals:
             dc_antiviral_lab = Medication(*antiviral)
-            if dc_antiviral_lab.check_time(dc_time) is True:
-                discharge_antiviral_count += 1
-                if discharge_antiviral_count < 3:
-                    redcap_label['edsubshart_antiviraldischarge'] = 'Yes'
-                    redcap_raw['edsubshart_antiviraldischarge'] = '1'
-                    # Record number of Dishcarged Antivirals
-                    redcap_label['edsubshart_numberantiviralsdischarge'] = discharge_antiviral_count
-                    redcap_raw['edsubshart_numberantiviralsdischarge'] = discharge_antiviral_count
-                if discharge_antiviral_count >= 3:
-                    break
-                med_name = dc_antiviral_lab.name.split(" ")[0]
-                med_route = dc_antiviral_lab.route
-                coordinator["Discharge Antiviral #{}".format(discharge_antiviral_count)] = "{} {}".format(
-                    med_name, med_route)
-                redcap_label['edsubshart_antiviraldischarge{}'.format(discharge_antiviral_count)] = med_name
-                redcap_raw['edsubshart_antiviraldischarge{}'.format(discharge_antiviral_count)] = med_name
+            discharge_antiviral_count += 1
+            if discharge_antiviral_count < 3:
+                redcap_label['edsubshart_antiviraldischarge'] = 'Yes'
+                redcap_raw['edsubshart_antiviraldischarge'] = '1'
+                # Record number of Dishcarged Antivirals
+                redcap_label['edsubshart_numberantiviralsdischarge'] = discharge_antiviral_count
+                redcap_raw['edsubshart_numberantiviralsdischarge'] = discharge_antiviral_count
+            if discharge_antiviral_count >= 3:
+                break
+            med_name = dc_antiviral_lab.name.split(" ")[0]
+            med_route = dc_antiviral_lab.route
+            coordinator["Discharge Antiviral #{}".format(discharge_antiviral_count)] = "{} {}".format(
+                med_name, med_route)
+            redcap_label['edsubshart_antiviraldischarge{}'.format(discharge_antiviral_count)] = med_name
+            redcap_raw['edsubshart_antiviraldischarge{}'.format(discharge_antiviral_count)] = med_name
 
     else:
         coordinator['Discharged Antiviral'] = 'No antivirals given at Discharge'
@@ -651,7 +602,7 @@ def get_dc_antiviral_info(coordinator, redcap_label, redcap_raw, subject_id, csn
     return coordinator, redcap_label, redcap_raw
 
 
-def get_antibiotic_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn, dc_time):
+def get_antibiotic_info(coordinator, redcap_label, redcap_raw, bundle, dc_time):
     """Stores subjects antibiotic info in dictionaies to use for file
     writing
     
@@ -660,9 +611,7 @@ def get_antibiotic_info(coordinator, redcap_label, redcap_raw, subject_id, csn,
             to write to file
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
             data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
         dc_time (str): subjects discharge time
 
     Returns:
@@ -672,9 +621,8 @@ def get_antibiotic_info(coordinator, redcap_label, redcap_raw, subject_id, csn,
     """
     # ED Antibiotics
     ed_antibiotics_count = 0
-    ed_antibiotics = ed.medication2(
-        subject_id, csn, conn, "'ANTIBIOTICS'")
-    if ed_antibiotics:
+    ed_antibiotics = bundle.medication2('ANTIBIOTICS')
+    if bundle.found('MedAdminName', 'ANTIBIOTICS'):
         med_route_codes = {'IV': '3',
                            'Intravenous': '3',
                            'Oral': '1',
@@ -686,7 +634,7 @@ def get_antibiotic_info(coordinator, redcap_label, redcap_raw, subject_id, csn,
         for antibiotic in ed_antibiotics:
             abx_med = Medication2(*antibiotic)
             med_route = abx_med.route
-            if abx_med.check_time(dc_time) is True and med_route_codes.get(med_route):
+            if med_route_codes.get(med_route):
                 # Record number of ED Antibiotics
                 ed_antibiotics_count += 1
                 if ed_antibiotics_count < 5:
@@ -720,7 +668,7 @@ def get_antibiotic_info(coordinator, redcap_label, redcap_raw, subject_id, csn,
     return coordinator, redcap_label, redcap_raw
 
 
-def get_dc_abx_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn, dc_time, dispo):
+def get_dc_abx_info(coordinator, redcap_label, redcap_raw, bundle, dc_time, dispo):
     """Stores subjects discharge antibiotic info in dictionaies to use for file
     writing
     
@@ -729,9 +677,7 @@ def get_dc_abx_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn
             to write to file
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
             data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
         dc_time (str): subjects discharge time
         dispo (str): subjects final disposition
 
@@ -746,32 +692,29 @@ def get_dc_abx_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn
         return coordinator, redcap_label, redcap_raw
     # Discharge Antibiotics
     discharge_antibiotics_count = 0
-    discharge_antibiotics = ed.medication(
-        subject_id, csn, conn, "'ANTIBIOTICS'", "'Outpatient'")
+    discharge_antibiotics = bundle.medication('ANTIBIOTICS')
     if dispo != "Discharge":
         redcap_label['edsubshart_antibioticdischarge'] = 'NA subject not discharged'
         redcap_raw['edsubshart_antibioticdischarge'] = '98'
         return coordinator, redcap_label, redcap_raw
     # Discharge Antibiotics
     discharge_antibiotics_count = 0
-    discharge_antibiotics = ed.medication(
-        subject_id, csn, conn, "'ANTIBIOTICS'", "'Outpatient'")
-    if discharge_antibiotics:
+    discharge_antibiotics = bundle.medication('ANTIBIOTICS')
+    if bundle.found('Medication', 'ANTIBIOTICS'):
         redcap_label['edsubshart_antibioticdischarge'] = 'Yes'
         redcap_raw['edsubshart_antibioticdischarge'] = '1'
         for antibiotic in discharge_antibiotics:
             dc_abx_med = Medication(*antibiotic)
-            if dc_abx_med.check_time(dc_time) is True:
-                discharge_antibiotics_count += 1
-                if discharge_antibiotics_count > 2:
-                    break
-                med_name = dc_abx_med.name.split(" ")[0]
-                time_ordered = dc_abx_med.date_time
-                med_route = dc_abx_med.route
-                coordinator["Discharge Antibiotics #{}".format(discharge_antibiotics_count)] = "{} {} {}".format(
-                    med_name, med_route, time_ordered)
-                redcap_label['edsubshart_antibioticdischarge{}_name'.format(discharge_antibiotics_count)] = med_name
-                redcap_raw['edsubshart_antibioticdischarge{}_name'.format(discharge_antibiotics_count)] = med_name
+            discharge_antibiotics_count += 1
+            if discharge_antibiotics_count > 2:
+                break
+            med_name = dc_abx_med.name.split(" ")[0]
+            time_ordered = dc_abx_med.date_time
+            med_route = dc_abx_med.route
+            coordinator["Discharge Antibiotics #{}".format(discharge_antibiotics_count)] = "{} {} {}".format(
+                med_name, med_route, time_ordered)
+            redcap_label['edsubshart_antibioticdischarge{}_name'.format(discharge_antibiotics_count)] = med_name
+            redcap_raw['edsubshart_antibioticdischarge{}_name'.format(discharge_antibiotics_count)] = med_name
         # Record number of Discharge Abx
         redcap_label['edsubshart_numberantibioticsdischarge'] = discharge_antibiotics_count
         redcap_raw['edsubshart_numberantibioticsdischarge'] = discharge_antibiotics_count
@@ -783,7 +726,7 @@ def get_dc_abx_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn
     return coordinator, redcap_label, redcap_raw
 
 
-def get_imaging_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn):
+def get_imaging_info(coordinator, redcap_label, redcap_raw, bundle):
     """Stores subjects imaging info in dictionaies to use for file
     writing
     
@@ -792,9 +735,7 @@ def get_imaging_info(coordinator, redcap_label, redcap_raw, subject_id, csn, con
             to write to file
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
             data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
 
     Returns:
         :obj: `OrderedDefaultDict`):
@@ -802,7 +743,7 @@ def get_imaging_info(coordinator, redcap_label, redcap_raw, subject_id, csn, con
         contain data to write to file
     """
     # Chest Imaging
-    chest_xray_ct = ed.chest_imaging(subject_id, csn, conn)
+    chest_xray_ct = bundle.chest_imaging()
     if chest_xray_ct:
         chest_xray_ct = [Imaging(*item) for item in chest_xray_ct]
         coordinator["Chest Imaging"] = chest_xray_ct[0].name
@@ -815,7 +756,7 @@ def get_imaging_info(coordinator, redcap_label, redcap_raw, subject_id, csn, con
     return coordinator, redcap_label, redcap_raw
 
 
-def get_diagnosis_info(coordinator, redcap_label, redcap_raw, subject_id, csn, conn):
+def get_diagnosis_info(coordinator, redcap_label, redcap_raw, bundle):
     """Stores subjects diagnosis info in dictionaies to use for file
     writing
     
@@ -824,9 +765,7 @@ def get_diagnosis_info(coordinator, redcap_label, redcap_raw, subject_id, csn, c
         to write to file
         redcap_label (:obj: `OrderedDefaultDict`): collection of redcap_label readable
             data to write to file
-        subject_id (str): id of subject
-        conn (:obj: `database connection`): connection to the database that
-            contains the patient data
+        bundle (:obj: `SubjectBundle`): the subject's rows from each table
 
     Returns:
         :obj: `OrderedDefaultDict`):
@@ -843,7 +782,7 @@ def get_diagnosis_info(coordinator, redcap_label, redcap_raw, subject_id, csn, c
 
     # Final Diagnoses
     diagnosis_count = 0
-    diagnoses = ed.final_diagnoses(subject_id, csn, conn)
+    diagnoses = bundle.final_diagnoses()
     coordinator['Diagnoses'] = diagnoses
     for diagnosis in diagnoses:
         diagnosis_count += 1
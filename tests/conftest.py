@@ -0,0 +1,311 @@
+import csv
+import importlib.util
+import os
+import random
+import shutil
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DATA_PATH = os.path.join(REPO_PATH, 'tests', 'data')
+sys.path.insert(0, REPO_PATH)
+
+# Folder, module names, table suffix, linking log and REDCap headers file of each form
+FORMS = {
+    'enrollment': {
+        'path': os.path.join(REPO_PATH, 'EnrollmentEDVisits', 'Data Normlization'),
+        'table_suffix': '',
+        'createtables': 'createtables',
+        'datapull_sql': 'datapull_sql',
+        'runner': 'rundatapull_ed_enrollment',
+        'visit_log_file': 'Prospective_Linking_Log.csv',
+        'headers_file': 'ed_enrollment_headers.csv',
+    },
+    'subsequent': {
+        'path': os.path.join(REPO_PATH, 'SubsequentEDVisits', 'Data Normlization'),
+        'table_suffix': '_ActiveLaterVisits',
+        'createtables': 'createtables_subsequent',
+        'datapull_sql': 'datapull_subsequent_sql',
+        'runner': 'rundatapull_subsequent_ed',
+        'visit_log_file': 'Prospective_Subsequent_ED_Visits_Linking_Log.csv',
+        'headers_file': 'ed_subsequent_visit_headers.csv',
+    },
+}
+
+# Runs a form's data pull
+DATA_PULL_DRIVER = """
+import os
+import {runner} as runner
+from Common import rundatapull
+if os.environ.get('TEST_FLUSH_ROWS'):
+    rundatapull.REDCAP_FLUSH_ROWS = int(os.environ['TEST_FLUSH_ROWS'])
+if os.environ.get('TEST_STOP_AFTER'):
+    pull = runner.FORM.edvisit
+    pulled = list()
+
+    def edvisit(*args, **kwargs):
+        if len(pulled) == int(os.environ['TEST_STOP_AFTER']):
+            raise KeyboardInterrupt
+        pulled.append(args[0])
+        return pull(*args, **kwargs)
+    runner.FORM.edvisit = edvisit
+runner.main()
+"""
+
+MEDICATIONS = [('101', 'Oseltamivir 75 MG capsule', 'Oral', 'ANTIVIRALS'),
+               ('102', 'Ceftriaxone 1 g injection', 'Intravenous', 'ANTIBIOTICS'),
+               ('103', 'Ampicillin-Sulbactam 3 g', 'IM', 'PENICILLINS'),
+               ('104', 'Azithromycin 500 mg tablet', 'Oral', 'MACROLIDES'),
+               ('105', 'Peramivir 600 mg', 'Oral', 'MISC'),
+               ('106', 'Vancomycin, 1 g', '', 'ANTIBIOTICS'),
+               ('107', "Levofloxacin's 750", 'PO', 'ANTIBIOTICS'),
+               ('108', 'Acetaminophen', 'Oral', 'ANALGESICS')]
+LAB_COMPONENTS = ['PH SPECIMEN', 'BLOOD UREA NITROGEN', 'UREA NITROGEN', 'SODIUM', 'GLUCOSE', 'HEMATOCRIT',
+                  'INFLUENZA A NAT', 'INFLUENZA B NAT', 'INFLUENZA A PCR', 'INFLUENZA B PCR', 'RSV NAT',
+                  'RHINOVIRUS NAT', 'ADENOVIRUS PCR', 'METAPNEUMO NAT', 'PARAINFLUENZAE 3 NAT']
+
+
+def pytest_addoption(parser):
+    parser.addoption('--run-slow', action='store_true', default=False,
+                     help="run the tests marked slow, which load multi-million row files")
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', "slow: takes minutes and writes large files, run with --run-slow")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--run-slow'):
+        return
+    skip_slow = pytest.mark.skip(reason="slow test, run with --run-slow")
+    for item in items:
+        if 'slow' in item.keywords:
+            item.add_marker(skip_slow)
+
+
+def load_module(form, module_name):
+    """Imports a module from a form's folder by path, since both forms have
+    modules of the same name
+
+    Args:
+        form (str): key of the form in FORMS
+        module_name (str): name of the module without .py
+
+    Returns:
+        :obj: `module`: the imported module
+    """
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(FORMS[form]['path'],
+                                                                            module_name + '.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_profile(form):
+    """Imports the PROFILE of a form's createtables module
+
+    Args:
+        form (str): key of the form in FORMS
+
+    Returns:
+        :obj: `tablebuilder.FormProfile`: the form's profile
+    """
+    return load_module(form, FORMS[form]['createtables']).PROFILE
+
+
+def write_rows(file_path, table_fields, rows, delimiter='\t'):
+    """Writes a header and rows the way Matt's text files are laid out
+
+    Args:
+        file_path (str): path of the file to write
+        table_fields (list): column names
+        rows (iterable): rows of values
+        delimiter (str): column delimiter
+    """
+    with open(file_path, 'w', newline='') as text_file:
+        writer = csv.writer(text_file, delimiter=delimiter, lineterminator='\n')
+        writer.writerow(table_fields)
+        writer.writerows(rows)
+
+
+def synthetic_tables(form, subjects, seed=7):
+    """Makes random rows for every text file and the linking log of a form.
+    Every third subject of the subsequent visit form has two visits, every
+    fourth subject is already complete in the linking log and every seventh
+    has no ED departure time.
+
+    Args:
+        form (str): key of the form in FORMS
+        subjects (int): number of subjects to make
+        seed (int): seed of the random values
+
+    Returns:
+        :obj: `dict`: column names and rows of each table by table title
+            without the form's table suffix, and of the linking log as
+            'log'
+    """
+    subsequent = form == 'subsequent'
+    randomizer = random.Random(seed)
+    tables = {
+        'DEMOGRAPHICS': (['STUDYID', 'CSN', 'ADT_ARRIVAL_TIME', 'ED_DEPARTURE_TIME', 'HOSP_ADMSN_TIME',
+                          'EDDisposition'], []),
+        'Flowsheets': (['STUDYID', 'CSN', 'FlowsheetDisplayName', 'RECORDED_TIME', 'FlowsheetValue'], []),
+        'LAB': (['STUDYID', 'CSN', 'PROC_NAME', 'LabComponentName', 'ORD_VALUE', 'SPECIMN_TAKEN_TIME',
+                 'RESULT_TIME'], []),
+        'Medication': (['STUDYID', 'CSN', 'MEDICATION_ID', 'MedIndexName', 'MedRoute', 'THERACLASS',
+                        'OrderingMode', 'TimeOrdered'], []),
+        'MEDADMINS': (['studyid', 'order_med_id', 'medication_id', 'TimeActionTaken', 'ActionTaken',
+                       'MAR_ORIG_DUE_TM', 'SCHEDULED_TIME', 'Dose', 'AdminSite', 'INFUSION_RATE',
+                       'InfusionRateUnit', 'DurationToInfuse', 'Duration_Infuse_Unit'] + (['csn'] if subsequent
+                                                                                          else []), []),
+        'Procedures': (['STUDYID', 'CSN', 'PROC_NAME', 'ORDER_TIME', 'OrderStatus'], []),
+        'Diagnosis': (['STUDYID', 'CSN', 'EpicInternalDiagnosisName'], []),
+        'log': (['STUDYID', 'CSN', 'VISITNUMBER', 'DataPullComplete'] if subsequent
+                else ['STUDYID', 'DataPullComplete'], []),
+    }
+
+    def add(table_title, row):
+        tables[table_title][1].append(row)
+
+    for subject_number in range(subjects):
+        subject_id = 'CEIRS{:04d}'.format(subject_number)
+        data_pull_complete = 'No' if subject_number % 4 else 'Yes'
+        visits = 2 if subsequent and subject_number % 3 == 0 else 1
+        for visit_number in range(visits):
+            csn = str(9000000 + subject_number * 10 + visit_number)
+            arrival = datetime(2017, 1, 1) + timedelta(days=subject_number, hours=visit_number * 30)
+
+            def timestamp(minutes):
+                return (arrival + timedelta(minutes=minutes)).strftime('%Y-%m-%d %H:%M:%S')
+
+            add('DEMOGRAPHICS', [subject_id, csn, timestamp(0), timestamp(300) if subject_number % 7 else '',
+                                 timestamp(320), randomizer.choice(['Discharge', 'Admit', 'Hospitalized Observation',
+                                                                    'Eloped', 'Screened and Left'])])
+            for name in ['Temp', 'Resp', 'BP', 'Pulse', 'SpO2', 'O2 Device']:
+                for _ in range(randomizer.randint(0 if subject_number % 5 == 0 else 1, 4)):
+                    if name == 'BP':
+                        value = '{}/{}'.format(randomizer.randint(90, 160), randomizer.randint(50, 99))
+                    elif name == 'O2 Device':
+                        value = randomizer.choice(['Nasal cannula', 'None (Room air)', 'Non-rebreather mask'])
+                    elif name == 'Temp':
+                        value = randomizer.choice(['98.6', '99.1', '101.3', '97.80'])
+                    else:
+                        value = str(randomizer.randint(10, 100))
+                    add('Flowsheets', [subject_id, csn, name, timestamp(randomizer.choice([5, 10, 50, 400])), value])
+            for component in LAB_COMPONENTS:
+                for _ in range(randomizer.randint(0, 3)):
+                    collected = randomizer.choice([20, 60, 200, 600])
+                    if 'NAT' in component or 'PCR' in component:
+                        value = randomizer.choice(['No RNA Detected', 'RNA Detected', 'No DNA Detected'])
+                        proc_name = 'INFLUENZA PCR' if 'INFL' in component else 'RESP VIRUS PANEL'
+                    else:
+                        value = randomizer.choice(['see below', '7.35', '140', '12', '1,200'])
+                        proc_name = 'BASIC METABOLIC PANEL'
+                    add('LAB', [subject_id, csn, proc_name, component, value, timestamp(collected),
+                                timestamp(collected + 45)])
+            for med_id, med_name, med_route, med_class in randomizer.sample(MEDICATIONS, 5):
+                add('Medication', [subject_id, csn, med_id, med_name, med_route, med_class,
+                                   randomizer.choice(['Inpatient', 'Outpatient']),
+                                   timestamp(randomizer.choice([30, 90, 500]))])
+                for _ in range(randomizer.randint(0, 3)):
+                    add('MEDADMINS', [subject_id, '55' + csn, med_id, timestamp(randomizer.choice([40, 100, 600])),
+                                      randomizer.choice(['Given', 'Canceled Entry', 'Missed', 'New Bag']), '', '',
+                                      randomizer.choice(['1', '0', '', '2.5']), 'Left Arm', '', '', '', '']
+                        + ([csn] if subsequent else []))
+            for _ in range(randomizer.randint(0, 3)):
+                add('Procedures', [subject_id, csn,
+                                   randomizer.choice(['XR CHEST 2 VIEWS', 'CT HEAD', 'US ABDOMEN', 'ECG 12 LEAD']),
+                                   timestamp(randomizer.choice([15, 120])),
+                                   randomizer.choice(['Completed', 'Canceled'])])
+            for _ in range(randomizer.randint(0, 5)):
+                add('Diagnosis', [subject_id, csn, randomizer.choice(['Influenza due to other virus', 'Pneumonia',
+                                                                      'Viral syndrome', 'Cough', 'Stroke'])])
+            if subsequent:
+                add('log', [subject_id, csn, str(visit_number + 1), data_pull_complete])
+        if not subsequent:
+            add('log', [subject_id, data_pull_complete])
+    return tables
+
+
+def write_form_files(form_path, form, tables):
+    """Lays out a form's folder the way the data pull expects to find it:
+    the text files and linking log under Linking_Log_For_Matt, the REDCap
+    headers in Patient_Data and an empty Data Normlization folder to run from
+
+    Args:
+        form_path (str): folder to write the form's files in
+        form (str): key of the form in FORMS
+        tables (dict): tables from synthetic_tables
+    """
+    linking_log_path = os.path.join(form_path, 'Linking_Log_For_Matt')
+    text_files_path = os.path.join(linking_log_path, 'Matt_Place_Text_Files_Here')
+    patient_data_path = os.path.join(form_path, 'Patient_Data')
+    for folder in (text_files_path, patient_data_path, os.path.join(form_path, 'Data Normlization')):
+        os.makedirs(folder, exist_ok=True)
+    for table_title, (table_fields, rows) in tables.items():
+        if table_title == 'log':
+            write_rows(os.path.join(linking_log_path, FORMS[form]['visit_log_file']), table_fields, rows, ',')
+        else:
+            write_rows(os.path.join(text_files_path, table_title + FORMS[form]['table_suffix'] + '.txt'),
+                       table_fields, rows)
+    shutil.copy(os.path.join(TEST_DATA_PATH, FORMS[form]['headers_file']), patient_data_path)
+
+
+def run_data_pull(form_path, form, *args, stop_after=None, flush_rows=None):
+    """Runs a form's data pull in a new process from the form's Data
+    Normlization folder, the way it is run by hand
+
+    Args:
+        form_path (str): folder written by write_form_files
+        form (str): key of the form in FORMS
+        *args: command line arguments of the data pull
+        stop_after (int): number of visits to pull before the run is stopped
+            with KeyboardInterrupt, runs to the end when None
+        flush_rows (int): REDCAP_FLUSH_ROWS of the run
+
+    Returns:
+        :obj: `subprocess.CompletedProcess`: exit code and output of the run
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([FORMS[form]['path'], REPO_PATH]))
+    if stop_after is not None:
+        env['TEST_STOP_AFTER'] = str(stop_after)
+    if flush_rows is not None:
+        env['TEST_FLUSH_ROWS'] = str(flush_rows)
+    return subprocess.run([sys.executable, '-c', DATA_PULL_DRIVER.format(runner=FORMS[form]['runner'])] + list(args),
+                          cwd=os.path.join(form_path, 'Data Normlization'), env=env, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, universal_newlines=True, timeout=600)
+
+
+def pull_outputs(form_path):
+    """Reads the coordinator files and REDCap files a data pull wrote
+
+    Args:
+        form_path (str): folder written by write_form_files
+
+    Returns:
+        :obj: `dict`: contents of each file in Patient_Data by file name,
+            leaving out the REDCap headers
+    """
+    patient_data_path = os.path.join(form_path, 'Patient_Data')
+    outputs = dict()
+    for filename in sorted(os.listdir(patient_data_path)):
+        if filename.endswith('_headers.csv'):
+            continue
+        with open(os.path.join(patient_data_path, filename), 'r', newline='') as output_file:
+            outputs[filename] = output_file.read()
+    return outputs
+
+
+def pulled_count(run):
+    """Counts the subjects a data pull wrote coordinator files for
+
+    Args:
+        run (:obj: `subprocess.CompletedProcess`): the run from run_data_pull
+
+    Returns:
+        int: number of coordinator files written
+    """
+    return run.stdout.count("Writing coordinator Data File for Subject")
@@ -0,0 +1,480 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from concurrent.futures.process import BrokenProcessPool
+from operator import itemgetter
+
+import pytest
+
+from Common import rundatapull, tablebuilder
+from Common.datapullclasses import ADTCache, SubjectBundle
+from conftest import (FORMS, load_module, load_profile, pull_outputs, pulled_count, run_data_pull, synthetic_tables,
+                      write_form_files, write_rows)
+
+# Subjects in the synthetic files of each test
+SUBJECTS = 24
+
+
+@pytest.fixture(params=sorted(FORMS))
+def loaded_form(request, tmp_path, monkeypatch):
+    """Loads a form's synthetic files into a database and returns the form,
+    the connection and the form's datapull sql module"""
+    form = request.param
+    write_form_files(str(tmp_path), form, synthetic_tables(form, SUBJECTS))
+    monkeypatch.chdir(tmp_path)
+    conn = sqlite3.connect(str(tmp_path / 'CEIRS.db'))
+    tablebuilder.create_tables(conn, load_profile(form))
+    return form, conn, load_module(form, FORMS[form]['datapull_sql'])
+
+
+@pytest.fixture(params=sorted(FORMS))
+def form(request):
+    return request.param
+
+
+def form_folder(tmp_path, form, name, tables):
+    """Writes a form's synthetic files into a new folder
+
+    Args:
+        tmp_path (:obj: `pathlib.Path`): temporary folder of the test
+        form (str): key of the form in FORMS
+        name (str): name of the folder
+        tables (dict): tables from synthetic_tables
+
+    Returns:
+        str: path of the folder
+    """
+    form_path = str(tmp_path / name)
+    write_form_files(form_path, form, tables)
+    return form_path
+
+
+def pending_count(tables):
+    return sum(1 for row in tables['log'][1] if row[-1] == 'No')
+
+
+def completed_run(form_path, form, *args, **kwargs):
+    run = run_data_pull(form_path, form, *args, **kwargs)
+    assert run.returncode == 0, run.stderr
+    return run
+
+
+def visits(form, conn, pending=False):
+    """Gets the subject id, and CSN for the subsequent visit form, of the
+    visits in the linking log
+
+    Args:
+        form (str): key of the form in FORMS
+        conn (:obj: `database connection`): connection to the form's database
+        pending (bool): only get the visits whose data pull is not complete
+
+    Returns:
+        :obj: `list` of tuple: the key of each visit
+    """
+    profile = load_profile(form)
+    columns = ", ".join(profile.visit_key)
+    return conn.execute("""SELECT {} FROM {} WHERE DataPullComplete IN ('No', ?)""".format(
+        columns, profile.visit_log_table), ['No' if pending else 'Yes']).fetchall()
+
+
+def reused_count(run):
+    return int(re.search(r"Reusing the cached output of (\d+) of", run.stdout).group(1))
+
+
+def fingerprinted_tables(run):
+    return re.findall(r"Fingerprinted the rows of \d+ subjects in (\w+)", run.stdout)
+
+
+def database_hash(form_path):
+    with open(os.path.join(form_path, 'CEIRS.db'), 'rb') as database_file:
+        return hashlib.sha1(database_file.read()).hexdigest()
+
+
+# Queries the datapull sql modules ran for each visit before SubjectBundle
+# read every table once, filled in with the form's table suffix and visit
+# filter. The visit's key values are bound before the other parameters.
+PER_QUERY_SQL = {
+    'adt': """SELECT {column}, EDDisposition FROM DEMOGRAPHICS{suffix}
+          WHERE {visit_filter}
+          ORDER BY rowid""",
+    'vitals': """SELECT FlowsheetDisplayName, RECORDED_TIME, FlowsheetValue FROM Flowsheets{suffix}
+          WHERE {visit_filter} AND FlowsheetDisplayName = ?
+          ORDER BY rowid""",
+    'lab2': """SELECT ORD_VALUE, SPECIMN_TAKEN_TIME, RESULT_TIME, PROC_NAME, LabComponentName FROM LAB{suffix}
+          WHERE {visit_filter} AND LabComponentName IN (SELECT value FROM json_each(?))
+          ORDER BY rowid""",
+    'medication': """SELECT MedIndexName, TimeOrdered, MedRoute, THERACLASS, OrderingMode FROM Medication{suffix}
+          WHERE {visit_filter} AND THERACLASS = ? AND OrderingMode = ?
+          ORDER BY rowid""",
+    'medication2': """SELECT MedIndexName, TimeActionTaken, MedRoute FROM MedAdminName{suffix}
+          WHERE {visit_filter} AND THERACLASS = ?
+          ORDER BY rowid""",
+    'chest_imaging': """SELECT PROC_NAME, ORDER_TIME, OrderStatus FROM Procedures{suffix}
+          WHERE {visit_filter} AND category = 'chest_imaging' AND OrderStatus = 'Completed'
+          ORDER BY rowid""",
+    'final_diagnoses': """SELECT EpicInternalDiagnosisName FROM Diagnosis{suffix}
+          WHERE {visit_filter}
+          ORDER BY rowid""",
+}
+
+
+def per_query_rows(form, conn, visit, query, *parameters, column=None):
+    """Runs one of PER_QUERY_SQL for a visit
+
+    Args:
+        form (str): key of the form in FORMS
+        conn (:obj: `database connection`): connection to the form's database
+        visit (tuple): values of the profile's visit_key
+        query (str): key of the query in PER_QUERY_SQL
+        *parameters: values bound after the visit's key values
+        column (str): DEMOGRAPHICS column the adt query reads
+
+    Returns:
+        :obj: `list` of tuple: the rows the query returns
+    """
+    visit_key = load_profile(form).visit_key[:len(visit)]
+    visit_filter = " AND ".join("{} = ?".format(key_column) for key_column in visit_key)
+    sql = PER_QUERY_SQL[query].format(suffix=FORMS[form]['table_suffix'], visit_filter=visit_filter, column=column)
+    return conn.execute(sql, tuple(visit) + parameters).fetchall()
+
+
+def per_query_adt(form, conn, visit, status):
+    """Gets the date, time, status and disposition of a visit's arrival or
+    discharge. A discharge without a departure time falls back to the hospital
+    admission time of the subject's first visit.
+    """
+    column = 'ADT_ARRIVAL_TIME' if status == 'arrival' else 'ED_DEPARTURE_TIME'
+    time_text, dispo = per_query_rows(form, conn, visit, 'adt', column=column)[0]
+    if not time_text and status == 'discharge':
+        time_text, dispo = per_query_rows(form, conn, visit[:1], 'adt', column='HOSP_ADMSN_TIME')[0]
+    return tuple(time_text.split(" ")) + (status, dispo)
+
+
+def test_subject_bundle_matches_the_per_query_functions(loaded_form):
+    form, conn, datapull_sql = loaded_form
+    # ADT times of every visit to pull, read in one query
+    adt_cache = ADTCache(datapull_sql.adt_rows(conn))
+    first_observations = datapull_sql.first_observations(conn)
+    # The rules of the LAB categories are the component names
+    lab_components = defaultdict(list)
+    for table_title, name_pattern, category in tablebuilder.CATEGORY_RULES:
+        if table_title == 'LAB':
+            lab_components[category].append(name_pattern)
+    for visit in visits(form, conn, pending=True):
+        subject_adt_cache = ADTCache(datapull_sql.adt_rows(conn, visit[0]))
+        arrival_info = subject_adt_cache.arrival(*visit)
+        discharge_info = subject_adt_cache.discharge(*visit)
+        for adt_info, cohort_adt_info, expected in [
+                (arrival_info, adt_cache.arrival(*visit), per_query_adt(form, conn, visit, 'arrival')),
+                (discharge_info, adt_cache.discharge(*visit), per_query_adt(form, conn, visit, 'discharge'))]:
+            assert (adt_info.date, adt_info.time, adt_info.status, adt_info.dispo) == expected
+            assert (cohort_adt_info.date, cohort_adt_info.time, cohort_adt_info.status,
+                    cohort_adt_info.dispo) == expected
+        # First observations are keyed like the linking log, the CSN as text
+        observations_key = visit[0] if len(visit) == 1 else (visit[0], str(visit[1]))
+        subject_observations = datapull_sql.first_observations(conn, *visit).get(observations_key, {})
+        assert first_observations.get(observations_key, {}) == subject_observations
+        discharge_time = "{} {}".format(discharge_info.date, discharge_info.time)
+        bundle = SubjectBundle(datapull_sql.subject_rows(*visit, conn, discharge_time), arrival_info,
+                               discharge_info, subject_observations)
+        assert bundle.vitals('O2 Device') == per_query_rows(form, conn, visit, 'vitals', 'O2 Device')
+        for flowsheet_name in datapull_sql.FIRST_VITALS:
+            rows = per_query_rows(form, conn, visit, 'vitals', flowsheet_name)
+            assert bundle.first_observation(flowsheet_name) == (min(rows, key=itemgetter(1)) if rows else None)
+        for category in datapull_sql.FIRST_LABS:
+            rows = per_query_rows(form, conn, visit, 'lab2', json.dumps(lab_components[category]))
+            assert bundle.first_observation(category) == (min(rows, key=itemgetter(1)) if rows else None)
+        # Labs and medications hold the rows up to discharge within each
+        # group's limit, found tells whether the group was recorded at all
+        for category, limit in datapull_sql.LAB_LIMITS.items():
+            rows = per_query_rows(form, conn, visit, 'lab2', json.dumps(lab_components[category]))
+            assert bundle.found('LAB', category) == bool(rows)
+            assert bundle.labs(category) == [row for row in rows if row[1] <= discharge_time][:limit]
+        for theraclass, limit in datapull_sql.DISCHARGE_MEDICATION_LIMITS.items():
+            rows = per_query_rows(form, conn, visit, 'medication', theraclass, 'Outpatient')
+            assert bundle.found('Medication', theraclass) == bool(rows)
+            assert bundle.medication(theraclass) == [row for row in rows if row[1] <= discharge_time][:limit]
+        for theraclass, limit in datapull_sql.ED_MEDICATION_LIMITS.items():
+            rows = per_query_rows(form, conn, visit, 'medication2', theraclass)
+            assert bundle.found('MedAdminName', theraclass) == bool(rows)
+            assert bundle.medication2(theraclass) == [
+                row for row in rows if row[1] <= discharge_time and row[2] in datapull_sql.ED_MEDICATION_ROUTES][:limit]
+        assert bundle.chest_imaging() == per_query_rows(form, conn, visit, 'chest_imaging')
+        assert bundle.final_diagnoses() == per_query_rows(form, conn, visit, 'final_diagnoses')
+
+
+def test_visits_start_with_the_record_and_repeat_instrument_fields(loaded_form, monkeypatch):
+    form, conn, datapull_sql = loaded_form
+    monkeypatch.syspath_prepend(FORMS[form]['path'])
+    pull_form = load_module(form, FORMS[form]['runner']).FORM
+    visit = conn.execute("""SELECT {} FROM {} WHERE DataPullComplete = 'No'""".format(
+        ", ".join(pull_form.visit_fields), pull_form.profile.visit_log_table)).fetchone()
+    coordinator, redcap_label, redcap_raw = pull_form.edvisit(*visit, conn)
+    repeat_fields = ['redcap_repeat_instrument', 'redcap_repeat_instance'] if pull_form.repeat_instrument else []
+    record_fields = ['ec_id'] + repeat_fields + list(pull_form.record_fields)
+    for redcap_data, value_index in ((redcap_label, 0), (redcap_raw, 1)):
+        assert list(redcap_data)[:len(record_fields)] == record_fields
+        assert redcap_data['ec_id'] == coordinator['Study ID'] == visit[0].lower()
+        for field, values in pull_form.record_fields.items():
+            assert redcap_data[field] == values[value_index]
+        if repeat_fields:
+            assert redcap_data['redcap_repeat_instance'] == visit[pull_form.visit_fields.index('VISITNUMBER')]
+
+
+def test_lab_searches_return_the_labs_whose_name_matches(loaded_form):
+    form, conn, datapull_sql = loaded_form
+    results = [datapull_sql.lab3(*visit, conn, '%PANEL%') for visit in visits(form, conn, pending=True)]
+    assert any(results)
+    for lab_rows in results:
+        assert all('PANEL' in row[3] for row in lab_rows)
+
+
+def test_cohort_queries_match_per_subject_queries(tmp_path, form):
+    tables = synthetic_tables(form, SUBJECTS)
+    per_subject_path = form_folder(tmp_path, form, 'per_subject', tables)
+    cohort_path = form_folder(tmp_path, form, 'cohort', tables)
+    assert pulled_count(completed_run(per_subject_path, form)) == pending_count(tables)
+    assert pulled_count(completed_run(cohort_path, form, '--cohort')) == pending_count(tables)
+    assert pull_outputs(cohort_path) == pull_outputs(per_subject_path)
+
+
+def test_resume_finishes_a_stopped_run(tmp_path, form):
+    tables = synthetic_tables(form, SUBJECTS)
+    full_path = form_folder(tmp_path, form, 'full', tables)
+    stopped_path = form_folder(tmp_path, form, 'stopped', tables)
+    completed_run(full_path, form)
+    assert run_data_pull(stopped_path, form, stop_after=7, flush_rows=3).returncode != 0
+    # The first six visits were checkpointed before the stop
+    resumed = completed_run(stopped_path, form, '--resume', flush_rows=3)
+    assert pulled_count(resumed) == pending_count(tables) - 6
+    assert pull_outputs(stopped_path) == pull_outputs(full_path)
+
+
+def pulled_status_count(form_path, form):
+    profile = load_profile(form)
+    conn = sqlite3.connect(os.path.join(form_path, 'CEIRS.db'))
+    pulled_count = conn.execute("""SELECT COUNT(*) FROM {} WHERE pulled_at IS NOT NULL""".format(
+        profile.pull_status_table)).fetchone()[0]
+    conn.close()
+    return pulled_count
+
+
+def test_incremental_only_pulls_new_visits(tmp_path, form):
+    tables = synthetic_tables(form, SUBJECTS)
+    full_path = form_folder(tmp_path, form, 'full', tables)
+    completed_run(full_path, form)
+    # The last subject is added to the linking log after the first run
+    last_subject = tables['log'][1][-1][0]
+    log_fields, log_rows = tables['log']
+    first_tables = dict(tables, log=(log_fields, [row for row in log_rows if row[0] != last_subject]))
+    incremental_path = form_folder(tmp_path, form, 'incremental', first_tables)
+    first_run = completed_run(incremental_path, form, '--incremental')
+    assert pulled_count(first_run) == pending_count(first_tables)
+    assert pulled_count(completed_run(incremental_path, form, '--incremental')) == 0
+    write_rows(os.path.join(incremental_path, 'Linking_Log_For_Matt', FORMS[form]['visit_log_file']), log_fields,
+               log_rows, ',')
+    new_run = completed_run(incremental_path, form, '--incremental')
+    assert pulled_count(new_run) == pending_count(tables) - pending_count(first_tables)
+    full_outputs = pull_outputs(full_path)
+    incremental_outputs = pull_outputs(incremental_path)
+    redcap_files = [filename for filename in full_outputs if filename.startswith('redcap_')]
+    assert len(redcap_files) == 2
+    # The REDCap files only hold the rows of the last run, the coordinator
+    # files of every run are kept
+    for filename in redcap_files:
+        incremental_rows = incremental_outputs.pop(filename).splitlines()
+        full_rows = full_outputs.pop(filename).splitlines()
+        assert incremental_rows[0] == full_rows[0]
+        assert len(incremental_rows) == 1 + pending_count(tables) - pending_count(first_tables)
+        assert set(incremental_rows[1:]) <= set(full_rows[1:])
+    assert incremental_outputs == full_outputs
+    assert pulled_status_count(incremental_path, form) == pending_count(tables)
+    # A run that is not incremental pulls what the linking log says again
+    assert pulled_count(completed_run(incremental_path, form)) == pending_count(tables)
+    assert pull_outputs(incremental_path) == pull_outputs(full_path)
+    assert pulled_count(completed_run(incremental_path, form, '--incremental')) == 0
+
+
+def test_incremental_resumes_a_run_stopped_between_checkpoints(tmp_path, form):
+    tables = synthetic_tables(form, SUBJECTS)
+    full_path = form_folder(tmp_path, form, 'full', tables)
+    stopped_path = form_folder(tmp_path, form, 'stopped', tables)
+    completed_run(full_path, form)
+    # The run stops after the first checkpoint of three visits and one more visit
+    assert run_data_pull(stopped_path, form, '--incremental', stop_after=4, flush_rows=3).returncode != 0
+    assert pulled_status_count(stopped_path, form) == 3
+    stopped_hash = database_hash(stopped_path)
+    refused = run_data_pull(stopped_path, form, '--incremental', flush_rows=3)
+    assert refused.returncode == 2
+    assert '--resume' in refused.stderr
+    assert database_hash(stopped_path) == stopped_hash
+    resumed = completed_run(stopped_path, form, '--incremental', '--resume', flush_rows=3)
+    assert pulled_count(resumed) == pending_count(tables) - 3
+    assert pull_outputs(stopped_path) == pull_outputs(full_path)
+    assert pulled_status_count(stopped_path, form) == pending_count(tables)
+
+
+def test_incremental_runs_after_a_stop_before_the_first_checkpoint(tmp_path, form):
+    tables = synthetic_tables(form, SUBJECTS)
+    stopped_path = form_folder(tmp_path, form, 'stopped', tables)
+    assert run_data_pull(stopped_path, form, '--incremental', stop_after=1, flush_rows=3).returncode != 0
+    assert pulled_count(completed_run(stopped_path, form, '--incremental', flush_rows=3)) == pending_count(tables)
+
+
+def test_cache_reuses_the_output_of_unchanged_subjects(tmp_path, form):
+    tables = synthetic_tables(form, SUBJECTS)
+    full_path = form_folder(tmp_path, form, 'full', tables)
+    cached_path = form_folder(tmp_path, form, 'cached', tables)
+    completed_run(full_path, form)
+    first_run = completed_run(cached_path, form, '--cache')
+    assert reused_count(first_run) == 0
+    fingerprint_tables = load_module(form, FORMS[form]['datapull_sql']).FINGERPRINT_TABLES
+    assert fingerprinted_tables(first_run) == fingerprint_tables
+    second_run = completed_run(cached_path, form, '--cache')
+    assert reused_count(second_run) == pending_count(tables)
+    # Tables that were not reloaded are not read again
+    assert fingerprinted_tables(second_run) == []
+    assert pull_outputs(cached_path) == pull_outputs(full_path)
+    # Change the temperatures of one subject
+    changed_subject = 'CEIRS0001'
+    flowsheet_fields, flowsheet_rows = tables['Flowsheets']
+    changed_rows = [row[:4] + ['103.1'] if row[0] == changed_subject and row[2] == 'Temp' else row
+                    for row in flowsheet_rows]
+    assert changed_rows != flowsheet_rows
+    for form_path in (full_path, cached_path):
+        write_rows(os.path.join(form_path, 'Linking_Log_For_Matt', 'Matt_Place_Text_Files_Here',
+                                'Flowsheets' + FORMS[form]['table_suffix'] + '.txt'), flowsheet_fields, changed_rows)
+    completed_run(full_path, form)
+    changed_run = completed_run(cached_path, form, '--cache')
+    assert reused_count(changed_run) == pending_count(tables) - sum(1 for row in tables['log'][1]
+                                                                    if row[0] == changed_subject and row[-1] == 'No')
+    assert fingerprinted_tables(changed_run) == ['Flowsheets' + FORMS[form]['table_suffix']]
+    assert pull_outputs(cached_path) == pull_outputs(full_path)
+
+
+def test_cache_is_not_used_once_the_queries_limits_or_headers_change(loaded_form, monkeypatch):
+    form, conn, datapull_sql = loaded_form
+    pull_form = rundatapull.PullForm(load_profile(form), datapull_sql, None, None, None, None, None, None, None, None)
+    headers = ['record_id', 'temperature']
+    version = rundatapull.output_version(pull_form, headers)
+    assert rundatapull.output_version(pull_form, headers) == version
+    assert rundatapull.output_version(pull_form, headers + ['pulse']) != version
+    monkeypatch.setitem(datapull_sql.BOUND_PARAMETERS, 'lab_limits', '{"flu_pcr": 5}')
+    assert rundatapull.output_version(pull_form, headers) != version
+    monkeypatch.undo()
+    table_title = next(iter(datapull_sql.SUBJECT_TABLE_SQL))
+    monkeypatch.setitem(datapull_sql.SUBJECT_TABLE_SQL, table_title,
+                        datapull_sql.SUBJECT_TABLE_SQL[table_title] + " LIMIT 1")
+    assert rundatapull.output_version(pull_form, headers) != version
+
+
+def test_in_memory_runs_only_write_the_database_back_when_tables_were_reloaded(tmp_path, form):
+    tables = synthetic_tables(form, SUBJECTS)
+    disk_path = form_folder(tmp_path, form, 'disk', tables)
+    memory_path = form_folder(tmp_path, form, 'memory', tables)
+    completed_run(disk_path, form)
+    # The first run loads every table in memory and writes them back
+    assert pulled_count(completed_run(memory_path, form, '--in-memory', '--write-back')) == pending_count(tables)
+    assert pull_outputs(memory_path) == pull_outputs(disk_path)
+    loaded_hash = database_hash(memory_path)
+    profile = load_profile(form)
+    conn = sqlite3.connect(os.path.join(memory_path, 'CEIRS.db'))
+    assert conn.execute("""SELECT COUNT(*) FROM {}""".format(profile.visit_log_table)).fetchone() == (
+        len(tables['log'][1]),)
+    conn.close()
+    # Nothing is reloaded the second time, so the file is not written to
+    assert pulled_count(completed_run(memory_path, form, '--in-memory', '--write-back')) == pending_count(tables)
+    assert database_hash(memory_path) == loaded_hash
+    assert pull_outputs(memory_path) == pull_outputs(disk_path)
+
+
+def test_ingest_workers_load_the_tables_of_the_data_pull(tmp_path, form):
+    tables = synthetic_tables(form, SUBJECTS)
+    serial_path = form_folder(tmp_path, form, 'serial', tables)
+    parallel_path = form_folder(tmp_path, form, 'parallel', tables)
+    completed_run(serial_path, form)
+    assert pulled_count(completed_run(parallel_path, form, '--ingest-workers', '2')) == pending_count(tables)
+    assert pull_outputs(parallel_path) == pull_outputs(serial_path)
+
+
+def test_worker_processes_match_one_process(tmp_path, form):
+    tables = synthetic_tables(form, SUBJECTS)
+    serial_path = form_folder(tmp_path, form, 'serial', tables)
+    workers_path = form_folder(tmp_path, form, 'workers', tables)
+    completed_run(serial_path, form)
+    run = completed_run(workers_path, form, '--workers', '3', '--chunk-size', '4')
+    assert pulled_count(run) == pending_count(tables)
+    assert pull_outputs(workers_path) == pull_outputs(serial_path)
+
+
+def stop_worker(subject_id, conn, table_rows, adt_cache, first_observations):
+    """Stands in for edvisit in a worker process that dies without raising"""
+    os._exit(1)
+
+
+def test_a_dead_worker_stops_the_pull(loaded_form, tmp_path):
+    form, conn, datapull_sql = loaded_form
+    pull_form = rundatapull.PullForm(load_profile(form), datapull_sql, None, stop_worker, ['STUDYID'], None, None, None,
+                                     None, None)
+    pending_visits = [visit[:1] for visit in visits(form, conn, pending=True)]
+    with pytest.raises(BrokenProcessPool):
+        list(rundatapull.extract_parallel(pull_form, str(tmp_path / 'CEIRS.db'), pending_visits,
+                                          ADTCache(datapull_sql.adt_rows(conn)), dict(), workers=2, chunk_size=4))
+
+
+def test_threads_match_one_process(tmp_path, form):
+    tables = synthetic_tables(form, SUBJECTS)
+    serial_path = form_folder(tmp_path, form, 'serial', tables)
+    threads_path = form_folder(tmp_path, form, 'threads', tables)
+    completed_run(serial_path, form)
+    assert pulled_count(completed_run(threads_path, form, '--threads', '3')) == pending_count(tables)
+    assert pull_outputs(threads_path) == pull_outputs(serial_path)
+
+
+def fail_visit(subject_id, conn, table_rows, adt_cache, first_observations):
+    """Stands in for edvisit and fails on the fifth subject"""
+    if subject_id.endswith('5'):
+        raise ValueError(subject_id)
+    return conn.execute("""SELECT ?""", [subject_id]).fetchone()
+
+
+def test_threads_stop_and_raise_the_error_of_a_visit(loaded_form, tmp_path):
+    form, conn, datapull_sql = loaded_form
+    pull_form = rundatapull.PullForm(load_profile(form), datapull_sql, None, fail_visit, ['STUDYID'], None, None, None,
+                                     None, None)
+    pending_visits = [visit[:1] for visit in visits(form, conn, pending=True)]
+    running_threads = threading.active_count()
+    with pytest.raises(ValueError, match='CEIRS0005'):
+        for visit, result in rundatapull.extract_threaded(pull_form, str(tmp_path / 'CEIRS.db'), pending_visits,
+                                                          ADTCache(datapull_sql.adt_rows(conn)), dict(), threads=3):
+            assert result == visit
+    assert threading.active_count() == running_threads
+
+
+def test_redcap_files_only_replace_the_finished_file_at_the_end(tmp_path):
+    file_path = str(tmp_path / 'redcap_raw_data.csv')
+    with open(file_path, 'w') as previous_file:
+        previous_file.write("ec_id\nceirs0001\n")
+    fieldnames = ['ec_id', 'edenrollchart_enrolledined']
+    redcap_file = rundatapull.RedcapFile(file_path, fieldnames)
+    for subject_number in range(2):
+        redcap_file.writerow({'ec_id': 'ceirs{:04d}'.format(subject_number)})
+    offset = redcap_file.flush()
+    redcap_file.writerow({'ec_id': 'ceirs0002'})
+    redcap_file.flush()
+    # The rows go to the temporary file and the previous file is left alone
+    with open(file_path, 'r') as finished_file:
+        assert finished_file.read() == "ec_id\nceirs0001\n"
+    # Resuming from the first flush drops the row written after it
+    redcap_file = rundatapull.RedcapFile(file_path, fieldnames, offset)
+    with open(redcap_file.temp_path, 'r') as temp_file:
+        assert temp_file.read() == "ec_id,edenrollchart_enrolledined\nceirs0000,\nceirs0001,\n"
+    redcap_file.writerow({'ec_id': 'ceirs0003'})
+    redcap_file.finish()
+    assert not os.path.exists(redcap_file.temp_path)
+    with open(file_path, 'r') as finished_file:
+        assert finished_file.read() == "ec_id,edenrollchart_enrolledined\nceirs0000,\nceirs0001,\nceirs0003,\n"
@@ -0,0 +1,437 @@
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing
+
+import pytest
+
+from Common import tablebuilder
+from conftest import FORMS, REPO_PATH, load_profile, synthetic_tables, write_form_files
+
+# Rows in the file of the bounded memory load and the most the peak resident
+# memory of the process may grow while loading it. The file is about 250 MB,
+# holding its rows would take several GB.
+LARGE_FILE_ROWS = 10000000
+LOAD_MEMORY_LIMIT = 64 * 1024 * 1024
+
+# Loads a text file with load_table in a new process and prints the row count
+# and how much the peak resident memory of the process grew during the load
+BOUNDED_LOAD_SCRIPT = """
+import csv
+import json
+import resource
+import sqlite3
+import sys
+from Common import tablebuilder
+
+file_path, database_path, forms_path = sys.argv[1], sys.argv[2], sys.argv[3]
+sys.path.insert(0, forms_path)
+from createtables import PROFILE
+conn = sqlite3.connect(database_path)
+# ru_maxrss is in kilobytes on Linux and bytes on macOS
+scale = 1 if sys.platform == 'darwin' else 1024
+start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+with open(file_path, 'r') as text_file:
+    csvreader = csv.reader(text_file, delimiter='\\t')
+    table_fields = ",".join(next(csvreader))
+    row_count = tablebuilder.load_table(conn, PROFILE, 'Flowsheets', table_fields, csvreader,
+                                        memory_ceiling=4 * 1024 * 1024)
+peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+print(json.dumps({'row_count': row_count, 'growth': peak_rss - start_rss}))
+"""
+
+
+@pytest.fixture(params=sorted(FORMS))
+def form_profile(request, tmp_path, monkeypatch):
+    """Writes a form's synthetic files and runs from the form's folder, where
+    create_tables looks for them"""
+    form = request.param
+    write_form_files(str(tmp_path), form, synthetic_tables(form, 12))
+    monkeypatch.chdir(tmp_path)
+    return load_profile(form)
+
+
+def table_rows(conn, table_title):
+    return conn.execute("""SELECT * FROM {} ORDER BY rowid""".format(table_title)).fetchall()
+
+
+def write_large_file(file_path, rows):
+    with open(file_path, 'w') as text_file:
+        text_file.write('STUDYID\tCSN\tFlowsheetDisplayName\tRECORDED_TIME\tFlowsheetValue\n')
+        for start in range(0, rows, 100000):
+            text_file.write(''.join('CEIRS{:06d}\t{}\tTemp\t2017-01-01 00:{:02d}:00\t98.6\n'.format(
+                row_number // 50, row_number, row_number % 60) for row_number in range(start, start + 100000)))
+
+
+@pytest.mark.slow
+def test_large_file_loads_in_bounded_memory(tmp_path):
+    pytest.importorskip('resource')
+    write_large_file(str(tmp_path / 'Flowsheets.txt'), LARGE_FILE_ROWS)
+    result = subprocess.run([sys.executable, '-c', BOUNDED_LOAD_SCRIPT, str(tmp_path / 'Flowsheets.txt'),
+                             str(tmp_path / 'CEIRS.db'), FORMS['enrollment']['path']],
+                            env=dict(os.environ, PYTHONPATH=REPO_PATH),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    load = json.loads(result.stdout.splitlines()[-1])
+    assert load['row_count'] == LARGE_FILE_ROWS
+    assert load['growth'] < LOAD_MEMORY_LIMIT
+    conn = sqlite3.connect(str(tmp_path / 'CEIRS.db'))
+    assert conn.execute("""SELECT COUNT(*) FROM Flowsheets""").fetchone() == (LARGE_FILE_ROWS,)
+
+
+def test_rows_are_inserted_one_batch_at_a_time():
+    conn = sqlite3.connect(':memory:')
+    inserted_counts = list()
+
+    def table_rows():
+        for row_number in range(35):
+            if row_number % 10 == 0 and row_number:
+                inserted_counts.append(conn.execute("""SELECT COUNT(*) FROM Flowsheets_STAGING""").fetchone()[0])
+            yield ['CEIRS0001', str(row_number), "Temp's", '2017-01-01 00:00:00', '1,200']
+
+    row_count = tablebuilder.load_table(conn, load_profile('enrollment'), 'Flowsheets',
+                                        'STUDYID,CSN,FlowsheetDisplayName,RECORDED_TIME,FlowsheetValue', table_rows(),
+                                        batch_size=10)
+    assert row_count == 35
+    assert inserted_counts == [10, 20, 30]
+    assert conn.execute("""SELECT FlowsheetDisplayName, FlowsheetValue FROM Flowsheets LIMIT 1""").fetchone() == (
+        'Temps', '1200')
+
+
+def test_memory_ceiling_flushes_before_batch_size():
+    conn = sqlite3.connect(':memory:')
+    inserted_counts = list()
+
+    def table_rows():
+        for row_number in range(6):
+            inserted_counts.append(conn.execute("""SELECT COUNT(*) FROM Notes_STAGING""").fetchone()[0])
+            yield [str(row_number), 'x' * 1000]
+
+    tablebuilder.load_table(conn, load_profile('enrollment'), 'Notes', 'ROW_NUMBER,NOTE', table_rows(), batch_size=100,
+                            memory_ceiling=2000)
+    # Two 1000 character rows reach the ceiling, so rows are inserted in twos
+    assert inserted_counts == [0, 0, 2, 2, 4, 4]
+
+
+def test_unchanged_files_are_not_reloaded(form_profile, tmp_path):
+    profile = form_profile
+    conn = sqlite3.connect(str(tmp_path / 'CEIRS.db'))
+    reloaded_tables = tablebuilder.create_tables(conn, profile)
+    assert set(reloaded_tables) == {title + profile.table_suffix
+                                    for title in ['DEMOGRAPHICS', 'Flowsheets', 'LAB', 'Medication', 'MEDADMINS',
+                                                  'Procedures', 'Diagnosis', 'MedAdminName']
+                                    } | {profile.visit_log_table}
+    assert tablebuilder.create_tables(conn, profile) == []
+    # Rewriting a file with the same contents only changes its modified time
+    text_files_path = tmp_path / 'Linking_Log_For_Matt' / 'Matt_Place_Text_Files_Here'
+    diagnosis_path = text_files_path / ('Diagnosis' + profile.table_suffix + '.txt')
+    diagnosis_text = diagnosis_path.read_text()
+    diagnosis_path.write_text(diagnosis_text)
+    os.utime(str(diagnosis_path), (1, 1))
+    assert tablebuilder.create_tables(conn, profile) == []
+    diagnosis_path.write_text(diagnosis_text + "CEIRS0001\t9000010\tFever\n")
+    assert tablebuilder.create_tables(conn, profile) == ['Diagnosis' + profile.table_suffix]
+    assert table_rows(conn, 'Diagnosis' + profile.table_suffix)[-1][:3] == ('CEIRS0001', '9000010', 'Fever')
+    # MedAdminName is rebuilt with the tables it is made from
+    medication_path = text_files_path / ('MEDADMINS' + profile.table_suffix + '.txt')
+    medication_path.write_text(medication_path.read_text() + medication_path.read_text().splitlines()[1] + "\n")
+    assert tablebuilder.create_tables(conn, profile) == ['MEDADMINS' + profile.table_suffix,
+                                                         'MedAdminName' + profile.table_suffix]
+
+
+def test_indexes_start_with_the_visit_key(form_profile, tmp_path):
+    profile = form_profile
+    conn = sqlite3.connect(str(tmp_path / 'CEIRS.db'))
+    tablebuilder.create_tables(conn, profile)
+    table_title = 'Flowsheets' + profile.table_suffix
+    index_columns = [row[2] for row in conn.execute("""PRAGMA index_info(idx_{}_{})""".format(
+        table_title, "_".join(profile.visit_key + ['FlowsheetDisplayName'])))]
+    assert index_columns == profile.visit_key + ['FlowsheetDisplayName']
+    visit_filter = " AND ".join("{} = ?".format(column) for column in profile.visit_key)
+    query_plan = conn.execute("""EXPLAIN QUERY PLAN SELECT * FROM {} WHERE {} AND FlowsheetDisplayName = ?""".format(
+        table_title, visit_filter), ['CEIRS0001'] * len(profile.visit_key) + ['Temp']).fetchall()
+    assert 'USING INDEX' in query_plan[0][3]
+
+
+def test_failed_reload_keeps_the_previous_table(form_profile, tmp_path):
+    profile = form_profile
+    database_path = str(tmp_path / 'CEIRS.db')
+    conn = sqlite3.connect(database_path)
+    tablebuilder.create_tables(conn, profile, local_database=True)
+    table_title = 'LAB' + profile.table_suffix
+    previous_rows = table_rows(conn, table_title)
+    reader = sqlite3.connect(database_path)
+    table_fields = "STUDYID,CSN,PROC_NAME,LabComponentName,ORD_VALUE,SPECIMN_TAKEN_TIME,RESULT_TIME"
+    reader_rows = list()
+
+    def failing_rows():
+        for row_number in range(25):
+            yield ['CEIRS0001', '9000010', 'PANEL', 'SODIUM', str(row_number), '2017-01-01 00:00:00', '']
+        # Another connection reads the table while the reload is written
+        reader_rows.extend(table_rows(reader, table_title))
+        raise ValueError("stopped partway through the file")
+
+    with pytest.raises(ValueError):
+        tablebuilder.load_table(conn, profile, table_title, table_fields, failing_rows(), batch_size=10)
+    conn.rollback()
+    assert reader_rows == previous_rows
+    assert table_rows(conn, table_title) == previous_rows
+
+    def new_rows():
+        for row_number in range(25):
+            yield ['CEIRS0001', '9000010', 'PANEL', 'SODIUM', str(row_number), '2017-01-01 00:00:00', '']
+
+    tablebuilder.load_table(conn, profile, table_title, table_fields, new_rows(), batch_size=10,
+                            column_types=['TEXT'] * 7)
+    assert [row[4] for row in table_rows(conn, table_title)] == [str(row_number) for row_number in range(25)]
+    assert not tablebuilder.table_exists(conn, table_title + tablebuilder.STAGING_SUFFIX)
+    index_names = [row[1] for row in conn.execute("""PRAGMA index_list({})""".format(table_title))]
+    assert {"idx_{}_{}".format(table_title, "_".join(index_columns))
+            for index_columns in profile.table_indexes[table_title]} <= set(index_names)
+
+
+def test_journal_mode_is_only_wal_on_a_local_database(form_profile, tmp_path):
+    profile = form_profile
+    conn = sqlite3.connect(str(tmp_path / 'CEIRS.db'))
+    assert not tablebuilder.on_network_share(conn)
+    tablebuilder.create_tables(conn, profile, local_database=False)
+    assert conn.execute("""PRAGMA journal_mode""").fetchone()[0] == 'delete'
+    tablebuilder.create_tables(conn, profile)
+    assert conn.execute("""PRAGMA journal_mode""").fetchone()[0] == 'wal'
+    # The connection settings used while loading are put back
+    assert conn.execute("""PRAGMA synchronous""").fetchone()[0] == 2
+
+
+def test_connection_settings_are_put_back_when_a_load_fails(form_profile, tmp_path, monkeypatch):
+    def failing_load(*args, **kwargs):
+        raise ValueError("stopped partway through the file")
+
+    monkeypatch.setattr(tablebuilder, 'load_table', failing_load)
+    conn = sqlite3.connect(str(tmp_path / 'CEIRS.db'))
+    with pytest.raises(ValueError):
+        tablebuilder.create_tables(conn, form_profile)
+    assert conn.execute("""PRAGMA synchronous""").fetchone()[0] == 2
+    assert conn.execute("""PRAGMA temp_store""").fetchone()[0] == 0
+
+
+def test_column_types_are_inferred_from_values_that_read_back_exactly():
+    sample_rows = [['1', '98.6', '1', '2017-01-01 00:05:00', '007', 'Temp', ''],
+                   ['12', '101.3', '2.5', '2017-01-02 13:45:10', '8', 'Resp', ''],
+                   ['', '97.5', '', '', '9', 'BP', '']]
+    assert tablebuilder.infer_column_types(sample_rows, 7) == ['INTEGER', 'REAL', 'NUMERIC', 'TEXT', 'TEXT', 'TEXT',
+                                                               'TEXT']
+    assert tablebuilder.infer_column_types([['97.80']], 1) == ['TEXT']
+
+
+def test_typed_tables_keep_the_source_text_next_to_the_shadow_columns():
+    conn = sqlite3.connect(':memory:')
+    table_fields = "STUDYID,Dose,RECORDED_TIME"
+    tablebuilder.load_table(conn, load_profile('enrollment'), 'Readings', table_fields,
+                            [['CEIRS0001', '1', '2017-01-01 00:00:10'], ['CEIRS0002', '007', ''],
+                             ['CEIRS0003', '0', '2017-01-02 00:00:00']],
+                            column_types=['TEXT', 'INTEGER', 'TEXT'])
+    assert table_rows(conn, 'Readings') == [('CEIRS0001', '1', '2017-01-01 00:00:10', 1),
+                                            ('CEIRS0002', '007', '', 7),
+                                            ('CEIRS0003', '0', '2017-01-02 00:00:00', 0)]
+    assert tablebuilder.table_column_types(conn, 'Readings') == [('STUDYID', 'TEXT'), ('Dose', 'INTEGER'),
+                                                                 ('RECORDED_TIME', 'TEXT')]
+    # Times compare and sort in time order as text
+    assert conn.execute("""SELECT MIN(RECORDED_TIME) FROM Readings
+          WHERE RECORDED_TIME > '' AND RECORDED_TIME <= '2017-01-01 23:59:59'""").fetchone() == (
+        '2017-01-01 00:00:10',)
+
+
+def medication_admins_in_python(conn, profile):
+    """Builds the MedAdminName rows the way create_tables did before the join
+    moved into SQLite"""
+    medication_info = dict()
+    for med_id, med_name, med_route, med_class in conn.execute(
+            """SELECT DISTINCT MEDICATION_ID, MedIndexName, MedRoute, THERACLASS FROM {}""".format(
+                'Medication' + profile.table_suffix)):
+        if med_route != "":
+            medication_info[med_id] = {'name': med_name, 'route': med_route, 'class': med_class}
+    medication_admin_columns = [name for name, column_type
+                                in tablebuilder.table_column_types(conn, 'MEDADMINS' + profile.table_suffix)]
+    rows = list()
+    for medication_admin in conn.execute("""SELECT {} FROM {} ORDER BY rowid""".format(
+            ", ".join(medication_admin_columns), 'MEDADMINS' + profile.table_suffix)):
+        if medication_admin[2] not in medication_info:
+            continue
+        med_name = medication_info[medication_admin[2]]['name']
+        med_route = medication_info[medication_admin[2]]['route']
+        med_class = medication_info[medication_admin[2]]['class']
+        if med_name.lower().find('ampicillin-sulbactam') != -1 or med_name.lower().find('azithromycin') != -1:
+            med_class = 'ANTIBIOTICS'
+            med_route = 'IV'
+        if med_name.lower().find('peramivir') != -1:
+            med_class = 'ANTIVIRALS'
+            med_route = 'IV'
+        if medication_admin[4] not in ("Canceled Entry", "Missed", "Refused") and medication_admin[7] not in ("", "0"):
+            rows.append(tuple(medication_admin) + (med_name, med_route, med_class))
+    return rows
+
+
+def test_medication_admin_table_applies_the_override_rules(form_profile, tmp_path):
+    profile = form_profile
+    conn = sqlite3.connect(str(tmp_path / 'CEIRS.db'))
+    tablebuilder.create_tables(conn, profile)
+    field_count = len(profile.medication_admin_name_fields.split(","))
+    medication_admins = [row[:field_count] for row in table_rows(conn, 'MedAdminName' + profile.table_suffix)]
+    assert medication_admins == medication_admins_in_python(conn, profile)
+    assert {(row[-3], row[-2], row[-1]) for row in medication_admins if 'Peramivir' in row[-3]} == {
+        ('Peramivir 600 mg', 'IV', 'ANTIVIRALS')}
+    assert {(row[-2], row[-1]) for row in medication_admins if 'Ampicillin' in row[-3]} == {('IV', 'ANTIBIOTICS')}
+    assert not [row for row in medication_admins if 'Vancomycin' in row[-3] or row[7] in ('', '0')]
+
+
+def test_medication_admin_table_is_rebuilt_when_the_override_rules_change(form_profile, tmp_path, monkeypatch):
+    profile = form_profile
+    conn = sqlite3.connect(str(tmp_path / 'CEIRS.db'))
+    tablebuilder.create_tables(conn, profile)
+    assert tablebuilder.create_tables(conn, profile) == []
+    overrides = [override for override in tablebuilder.MEDICATION_OVERRIDES if override[0] != '%peramivir%']
+    monkeypatch.setattr(tablebuilder, 'MEDICATION_OVERRIDES', overrides)
+    assert tablebuilder.create_tables(conn, profile) == ['MedAdminName' + profile.table_suffix]
+    field_count = len(profile.medication_admin_name_fields.split(","))
+    medication_admins = [row[:field_count] for row in table_rows(conn, 'MedAdminName' + profile.table_suffix)]
+    assert {(row[-3], row[-2], row[-1]) for row in medication_admins if 'Peramivir' in row[-3]} == {
+        ('Peramivir 600 mg', 'Oral', 'MISC')}
+    assert tablebuilder.create_tables(conn, profile) == []
+
+
+def test_parallel_load_matches_the_serial_load(form_profile, tmp_path):
+    profile = form_profile
+    serial_conn = sqlite3.connect(str(tmp_path / 'serial.db'))
+    parallel_conn = sqlite3.connect(str(tmp_path / 'parallel.db'))
+    serial_tables = tablebuilder.create_tables(serial_conn, profile)
+    parallel_tables = tablebuilder.create_tables(parallel_conn, profile, batch_size=7, workers=3)
+    assert sorted(parallel_tables) == sorted(serial_tables)
+    for table_title in serial_tables:
+        assert table_rows(parallel_conn, table_title) == table_rows(serial_conn, table_title)
+        assert (tablebuilder.table_column_types(parallel_conn, table_title)
+                == tablebuilder.table_column_types(serial_conn, table_title))
+    assert tablebuilder.create_tables(parallel_conn, profile, workers=3) == []
+
+
+def test_parallel_load_raises_the_error_of_a_worker(form_profile, tmp_path):
+    profile = form_profile
+    text_files_path = tmp_path / 'Linking_Log_For_Matt' / 'Matt_Place_Text_Files_Here'
+    (text_files_path / ('Empty' + profile.table_suffix + '.txt')).write_text('')
+    conn = sqlite3.connect(str(tmp_path / 'CEIRS.db'))
+    with pytest.raises(RuntimeError, match='Could not load table Empty'):
+        tablebuilder.create_tables(conn, profile, workers=2)
+
+
+def kill_ingest_worker(task):
+    """Stands in for parse_text_file in a worker process that dies without
+    reporting"""
+    os._exit(1)
+
+
+def test_parallel_load_stops_when_a_worker_dies(form_profile, tmp_path, monkeypatch):
+    monkeypatch.setattr(tablebuilder, 'parse_text_file', kill_ingest_worker)
+    conn = sqlite3.connect(str(tmp_path / 'CEIRS.db'))
+    with pytest.raises(BrokenProcessPool):
+        tablebuilder.create_tables(conn, form_profile, workers=2)
+
+
+def categories_in_python(conn, profile, table_title):
+    """Gets the category of each row of a table by matching its name against
+    the profile's category_rules one rule at a time"""
+    name_column = profile.category_sources[table_title]
+    rules = [(re.compile('^' + re.escape(name_pattern).replace('%', '.*') + '$', re.IGNORECASE), category)
+             for rule_table, name_pattern, category in profile.category_rules if rule_table == table_title]
+    categories = list()
+    for (name,) in conn.execute("""SELECT {} FROM {} ORDER BY rowid""".format(name_column, table_title)):
+        matches = [category for pattern, category in rules if name is not None and pattern.match(name)]
+        categories.append(matches[-1] if matches else None)
+    return categories
+
+
+def test_rows_are_classified_by_the_category_rules(form_profile, tmp_path, monkeypatch):
+    profile = form_profile
+    conn = sqlite3.connect(str(tmp_path / 'CEIRS.db'))
+    tablebuilder.create_tables(conn, profile)
+    for table_title in profile.category_sources:
+        categories = [row[0] for row in conn.execute("""SELECT category FROM {} ORDER BY rowid""".format(
+            table_title))]
+        assert categories == categories_in_python(conn, profile, table_title)
+        assert any(categories)
+    # Changed rules reclassify the tables without reloading them
+    procedures_table = 'Procedures' + profile.table_suffix
+    monkeypatch.setattr(tablebuilder, 'CATEGORY_RULES', [rule for rule in tablebuilder.CATEGORY_RULES
+                                                         if rule[1] != '%XR%'])
+    assert tablebuilder.create_tables(conn, profile) == []
+    categories = [row[0] for row in conn.execute("""SELECT category FROM {} ORDER BY rowid""".format(
+        procedures_table))]
+    assert categories == categories_in_python(conn, profile, procedures_table)
+    assert 'chest_imaging' in categories
+    assert not conn.execute("""SELECT 1 FROM {} WHERE category IS NOT NULL AND PROC_NAME LIKE '%XR%'""".format(
+        procedures_table)).fetchall()
+
+
+def test_each_form_keeps_its_own_rules_in_a_shared_database(tmp_path):
+    profiles = [load_profile(form) for form in sorted(FORMS)]
+    conn = sqlite3.connect(str(tmp_path / 'CEIRS.db'))
+    for create_rules in (tablebuilder.create_category_rules, tablebuilder.create_medication_overrides):
+        assert [create_rules(conn, profile) for profile in profiles] == [True, True]
+        # Saving one form's rules leaves the other's unchanged
+        assert [create_rules(conn, profile) for profile in profiles] == [False, False]
+    for profile in profiles:
+        assert conn.execute("""SELECT TableTitle, name_pattern, category FROM {} ORDER BY priority""".format(
+            profile.category_rules_table)).fetchall() == profile.category_rules
+
+
+def test_check_requirements_names_what_is_missing(monkeypatch):
+    tablebuilder.check_requirements()
+    monkeypatch.setattr(tablebuilder, 'MINIMUM_SQLITE_VERSION', (99, 0, 0))
+    with pytest.raises(SystemExit, match=r'SQLite 99\.0\.0 or later, found {}'.format(sqlite3.sqlite_version)):
+        tablebuilder.check_requirements()
+
+
+def test_only_file_databases_get_a_journal_mode(form_profile, tmp_path):
+    file_conn = sqlite3.connect(str(tmp_path / 'CEIRS.db'))
+    memory_conn = tablebuilder.memory_snapshot(file_conn)
+    assert not tablebuilder.in_memory(file_conn)
+    assert tablebuilder.in_memory(memory_conn)
+    tablebuilder.create_tables(memory_conn, form_profile, local_database=True)
+    assert memory_conn.execute("""PRAGMA journal_mode""").fetchone() == ('memory',)
+    tablebuilder.create_tables(file_conn, form_profile, local_database=True)
+    assert file_conn.execute("""PRAGMA journal_mode""").fetchone() == ('wal',)
+
+
+def test_replica_is_only_copied_when_the_shared_database_changes(tmp_path):
+    shared_path, replica_path = str(tmp_path / 'shared.db'), str(tmp_path / 'replica.db')
+    with sqlite3.connect(shared_path) as shared_conn:
+        shared_conn.execute("""CREATE TABLE visits (STUDYID TEXT)""")
+    shared_conn.close()
+    assert not tablebuilder.replica_current(shared_path, replica_path)
+    tablebuilder.refresh_replica(shared_path, replica_path)
+    assert tablebuilder.replica_current(shared_path, replica_path)
+    # Changes made to the replica are kept while the shared database is unchanged
+    with sqlite3.connect(replica_path) as replica_conn:
+        replica_conn.execute("""INSERT INTO visits VALUES ('CEIRS-1')""")
+    replica_conn.close()
+    tablebuilder.refresh_replica(shared_path, replica_path)
+    with sqlite3.connect(replica_path) as replica_conn:
+        assert replica_conn.execute("""SELECT * FROM visits""").fetchall() == [('CEIRS-1',)]
+    replica_conn.close()
+    # Publishing copies the replica back and records the shared database it
+    # made, the shared database keeps its journal mode
+    with closing(sqlite3.connect(replica_path)) as replica_conn:
+        replica_conn.execute("""PRAGMA journal_mode = WAL""")
+    tablebuilder.publish_replica(replica_path, shared_path)
+    assert tablebuilder.replica_current(shared_path, replica_path)
+    with sqlite3.connect(shared_path) as shared_conn:
+        assert shared_conn.execute("""PRAGMA journal_mode""").fetchone() == ('delete',)
+        assert shared_conn.execute("""SELECT * FROM visits""").fetchall() == [('CEIRS-1',)]
+        shared_conn.execute("""INSERT INTO visits VALUES ('CEIRS-2')""")
+    shared_conn.close()
+    assert not tablebuilder.replica_current(shared_path, replica_path)
+    tablebuilder.refresh_replica(shared_path, replica_path)
+    with sqlite3.connect(replica_path) as replica_conn:
+        assert len(replica_conn.execute("""SELECT * FROM visits""").fetchall()) == 2
+    replica_conn.close()